@@ -0,0 +1,47 @@
+# benchmarks/bench_lote.py
+"""
+Vazão do modo em lote (src/lote.py): gera --pastas pastas sintéticas de --rows vendas cada e
+roda o lote com cada número de processos em --workers, cada rodada em pastas de saída e
+bancos (SQLite) novos. Mostra tempo total, vendas por segundo e ganho sobre 1 processo; o
+ganho esperado acompanha o número de núcleos livres.
+
+    python benchmarks/bench_lote.py --pastas 8 --rows 200000 --workers 1 2 4 8
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(AQUI, '..', 'src')))
+sys.path.insert(0, AQUI)
+
+from gerador import gerar_arquivos
+from lote import rodar_lote
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--pastas', type=int, default=4)
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    # o cache de estágios faria a segunda rodada pular tudo; cada rodada usa saídas novas de qualquer forma
+    os.environ.setdefault('CACHE_MODE', 'off')
+    logging.getLogger().setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory() as trabalho:
+        for i in range(args.pastas):
+            gerar_arquivos(os.path.join(trabalho, 'dados', f'loja_{i:02d}'), args.rows, seed=i)
+        base = None
+        for workers in args.workers:
+            resumo = rodar_lote([os.path.join(trabalho, 'dados', '*')], os.path.join(trabalho, f'saida_{workers}'), workers)
+            total = resumo['duracao_s']
+            base = base or total
+            print(f"{workers:>3} processos: {total:7.2f}s  {args.pastas * args.rows / total:>10,.0f} vendas/s  "
+                  f"ganho {base / total:4.2f}x  ({resumo['falhas']} falhas)")
+
+
+if __name__ == '__main__':
+    main()
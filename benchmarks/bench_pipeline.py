@@ -0,0 +1,205 @@
+# benchmarks/bench_pipeline.py
+"""
+Suíte de benchmark do pipeline em escala, com dados sintéticos (benchmarks/gerador.py).
+
+Mede tempo e pico de memória (RSS) de cada estágio — read_raw, transform_data,
+save_parquet, build_pdf e insert_dataframe (SQLite local no lugar do MySQL) — e acrescenta
+os resultados em um arquivo JSONL, comparando com a última medição da mesma escala para
+deixar regressões visíveis entre versões.
+Com --chunksize mede o modo streaming (leitura + transform + parquet em blocos).
+Com --arquivos N as vendas ficam em N arquivos, lidos em paralelo por --workers processos.
+
+    python benchmarks/bench_pipeline.py --rows 1000000
+    python benchmarks/bench_pipeline.py --rows 1000000 10000000 50000000 --chunksize 1000000
+    python benchmarks/bench_pipeline.py --rows 1000000 --etapas read_raw transform_data
+    python benchmarks/bench_pipeline.py --rows 10000000 --arquivos 30 --workers 8 --etapas read_raw
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+from sqlalchemy import create_engine
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(AQUI, '..', 'src')))
+sys.path.insert(0, AQUI)
+
+from gerador import gerar_arquivos
+from extract import read_raw
+from transform import transform_data, transform_data_stream
+from report import save_parquet, build_pdf, ParquetAppender
+from inserirbanco import insert_dataframe
+from instrument import MedidorRecursos
+
+ETAPAS = ['read_raw', 'transform_data', 'save_parquet', 'build_pdf', 'insert_dataframe']
+RESULTADOS = os.path.join(AQUI, 'resultados.jsonl')
+
+
+def _versao():
+    """Revisão git do código medido (com '+' se houver alterações não commitadas)."""
+    try:
+        rev = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=AQUI, capture_output=True, text=True, check=True).stdout.strip()
+        sujo = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=AQUI, capture_output=True, text=True).stdout.strip()
+        return rev + ('+' if sujo else '')
+    except (OSError, subprocess.CalledProcessError):
+        return 'desconhecida'
+
+
+def _etapas_memoria(pasta, trabalho, etapas, leitura):
+    """Pipeline com vendas inteiro em memória; gera (etapa, função) na ordem."""
+    estado = {}
+    engine = create_engine(f"sqlite:///{os.path.join(trabalho, 'bench.db')}")
+
+    def ler():
+        estado['emp'], estado['prod'], estado['vendas'] = read_raw(pasta, **leitura)
+        return len(estado['vendas'])
+
+    def transformar():
+        estado['resumo_dict'] = transform_data(estado['emp'], estado['prod'], estado.pop('vendas'))
+        return len(estado['resumo_dict']['resumo'])
+
+    def parquet():
+        save_parquet(estado['resumo_dict']['resumo'], os.path.join(trabalho, 'resumo-vendas.parquet'))
+        return len(estado['resumo_dict']['resumo'])
+
+    def pdf():
+        build_pdf(estado['resumo_dict'], os.path.join(trabalho, 'relatorio.pdf'))
+        return len(estado['resumo_dict']['resumo'])
+
+    def inserir():
+        insert_dataframe(estado['resumo_dict']['resumo'], 'resumo_vendas', engine)
+        return len(estado['resumo_dict']['resumo'])
+
+    funcoes = dict(zip(ETAPAS, [ler, transformar, parquet, pdf, inserir]))
+    # as etapas dependem das anteriores: roda as necessárias mesmo sem medi-las
+    ultima = max(ETAPAS.index(e) for e in etapas)
+    for etapa in ETAPAS[:ultima + 1]:
+        yield etapa, funcoes[etapa], etapa in etapas
+    engine.dispose()
+
+
+def _etapas_streaming(pasta, trabalho, etapas, chunksize, leitura):
+    """Modo streaming: leitura + transform + parquet em blocos formam uma etapa só."""
+    estado = {}
+    parquet_path = os.path.join(trabalho, 'resumo-vendas.parquet')
+    engine = create_engine(f"sqlite:///{os.path.join(trabalho, 'bench.db')}")
+
+    def transformar():
+        emp, prod, chunks = read_raw(pasta, chunksize=chunksize, **leitura)
+        appender = ParquetAppender(parquet_path)
+        try:
+            estado['resumo_dict'] = transform_data_stream(emp, prod, chunks, on_chunk=appender)
+        finally:
+            appender.close()
+        return appender.rows
+
+    def pdf():
+        build_pdf(estado['resumo_dict'], os.path.join(trabalho, 'relatorio.pdf'))
+        return int(estado['resumo_dict']['kpis']['n_transacoes'].iloc[0])
+
+    def inserir():
+        # carga do resumo em blocos lidos do parquet (sem o resumo inteiro em memória)
+        import pyarrow.parquet as pq
+        linhas = 0
+        for i, lote in enumerate(pq.ParquetFile(parquet_path).iter_batches(batch_size=chunksize)):
+            df = lote.to_pandas()
+            insert_dataframe(df, 'resumo_vendas', engine, if_exists='replace' if i == 0 else 'append')
+            linhas += len(df)
+        return linhas
+
+    funcoes = {'transform_data_stream': transformar, 'build_pdf': pdf, 'insert_dataframe': inserir}
+    pedidas = ['transform_data_stream' if e in ('read_raw', 'transform_data', 'save_parquet') else e for e in etapas]
+    ordem = list(funcoes)
+    ultima = max(ordem.index(e) for e in pedidas)
+    for etapa in ordem[:ultima + 1]:
+        yield etapa, funcoes[etapa], etapa in pedidas
+    engine.dispose()
+
+
+def _anteriores(path):
+    """Última medição registrada para cada (linhas, modo, etapa)."""
+    ultimos = {}
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            for linha in f:
+                if linha.strip():
+                    r = json.loads(linha)
+                    ultimos[(r['linhas'], r['modo'], r['etapa'])] = r
+    return ultimos
+
+
+def _variacao(atual, anterior):
+    if not anterior:
+        return '-'
+    return f"{(atual / anterior - 1) * 100:+.0f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000_000], help='escalas (linhas de vendas)')
+    parser.add_argument('--etapas', nargs='+', choices=ETAPAS, default=ETAPAS)
+    parser.add_argument('--chunksize', type=int, default=0, help='> 0: modo streaming com blocos deste tamanho')
+    parser.add_argument('--arquivos', type=int, default=1, help='> 1: vendas divididas em N arquivos')
+    parser.add_argument('--workers', type=int, default=0, help='processos de leitura dos arquivos de vendas (0 = um por núcleo)')
+    parser.add_argument('--dados', default=os.path.join(tempfile.gettempdir(), 'bus2_bench'),
+                        help='pasta dos CSVs gerados (reaproveitados entre execuções)')
+    parser.add_argument('--regerar', action='store_true', help='gera os CSVs de novo mesmo se já existirem')
+    parser.add_argument('--resultados', default=RESULTADOS, help='arquivo JSONL onde os resultados são acrescentados')
+    args = parser.parse_args()
+
+    # os módulos do pipeline logam cada carga em INFO; aqui só avisos
+    logging.getLogger().setLevel(logging.WARNING)
+    modo = f'streaming:{args.chunksize}' if args.chunksize else 'memoria'
+    if args.arquivos > 1:
+        modo += f'|arquivos:{args.arquivos}|workers:{args.workers or os.cpu_count()}'
+    leitura = {'vendas': 'vendas', 'workers': args.workers or None} if args.arquivos > 1 else {}
+    versao = _versao()
+    anteriores = _anteriores(args.resultados)
+
+    print(f"versão {versao} | modo {modo}")
+    print(f"{'linhas':>12} {'etapa':<22} {'segundos':>9} {'Δ tempo':>8} {'pico MB':>9} {'Δ pico':>7} {'linhas/s':>11}")
+    for n in args.rows:
+        pasta = os.path.join(args.dados, f'vendas_{n}' + (f'_{args.arquivos}arq' if args.arquivos > 1 else ''))
+        if args.regerar or not os.path.exists(os.path.join(pasta, 'vendas.csv' if args.arquivos == 1 else 'vendas')):
+            gerar_arquivos(pasta, n, arquivos=args.arquivos)
+        with tempfile.TemporaryDirectory() as trabalho:
+            if args.chunksize:
+                etapas = _etapas_streaming(pasta, trabalho, args.etapas, args.chunksize, leitura)
+            else:
+                etapas = _etapas_memoria(pasta, trabalho, args.etapas, leitura)
+            for etapa, funcao, medir in etapas:
+                with MedidorRecursos(intervalo=0.01) as medida:
+                    linhas = funcao()
+                if not medir:
+                    continue
+                resultado = {
+                    'quando': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                    'versao': versao,
+                    'python': platform.python_version(),
+                    'pandas': pd.__version__,
+                    'linhas': n,
+                    'modo': modo,
+                    'etapa': etapa,
+                    'segundos': round(medida.segundos, 3),
+                    'cpu_s': round(medida.cpu + medida.cpu_filhos, 3),
+                    'pico_rss_mb': round(medida.pico / 1024**2, 1),
+                    'delta_rss_mb': round((medida.pico - medida.inicio) / 1024**2, 1),
+                    'linhas_por_s': round(linhas / medida.segundos) if medida.segundos else None,
+                }
+                anterior = anteriores.get((n, modo, etapa), {})
+                print(f"{n:>12,} {etapa:<22} {resultado['segundos']:>9.2f} {_variacao(resultado['segundos'], anterior.get('segundos')):>8} "
+                      f"{resultado['pico_rss_mb']:>9.0f} {_variacao(resultado['pico_rss_mb'], anterior.get('pico_rss_mb')):>7} "
+                      f"{resultado['linhas_por_s'] or 0:>11,}")
+                with open(args.resultados, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(resultado, ensure_ascii=False) + '\n')
+
+
+if __name__ == '__main__':
+    main()
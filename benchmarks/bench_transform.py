@@ -0,0 +1,72 @@
+# benchmarks/bench_transform.py
+"""
+Micro-benchmarks do transform, conferindo também que as saídas são iguais:
+- enriquecimento: dois merges contra o índice das dimensões (IndiceDimensao, take posicional)
+- agregação de KPIs: caminho genérico (um groupby por KPI com nomes/categoria nas chaves
+  + merge + sort) contra o caminho fundido por chave inteira (_agregar_parcial_por_id + nlargest)
+
+    python benchmarks/bench_transform.py --rows 1000000 10000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from gerador import gerar_dimensoes, gerar_vendas
+from schema import aplicar_schema
+import transform as T
+
+
+def _cronometrar(func, repeticoes):
+    melhor = float('inf')
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        resultado = func()
+        melhor = min(melhor, time.perf_counter() - t0)
+    return melhor, resultado
+
+
+def _normalizar(df):
+    df = df.reset_index(drop=True).copy()
+    for c in df.columns:
+        if isinstance(df[c].dtype, pd.CategoricalDtype) or df[c].dtype == object:
+            df[c] = df[c].astype(str)
+        else:
+            df[c] = df[c].astype('float64')
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000_000, 10_000_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    emp, prod = gerar_dimensoes()
+    emp, prod = T._preparar_dimensoes(aplicar_schema(emp, 'empregados'), aplicar_schema(prod, 'produtos'))
+
+    print(f"{'linhas':>12} {'etapa':>14} {'antes (s)':>10} {'depois (s)':>11} {'ganho':>7}")
+    for n in args.rows:
+        vendas = T._coagir_numericos(aplicar_schema(gerar_vendas(n), 'vendas'))
+        indices = T._indices_dimensoes(emp, prod)
+        t_merge, df = _cronometrar(lambda: T._enriquecer(vendas, emp, prod), args.repeat)
+        t_idx, df_idx = _cronometrar(lambda: T._enriquecer(vendas, emp, prod, indices), args.repeat)
+        pd.testing.assert_frame_equal(df, df_idx)
+        print(f"{n:>12,} {'enriquecer':>14} {t_merge:>10.3f} {t_idx:>11.3f} {t_merge / t_idx:>6.1f}x")
+        del vendas, df_idx
+
+        t_old, old = _cronometrar(lambda: T._combinar_parciais([T._agregar_parcial(df)]), args.repeat)
+        t_new, new = _cronometrar(lambda: T._combinar_parciais_por_id([T._agregar_parcial_por_id(df)], emp, prod), args.repeat)
+        for chave in old:
+            pd.testing.assert_frame_equal(_normalizar(old[chave]), _normalizar(new[chave]), check_exact=False)
+        print(f"{n:>12,} {'agregar':>14} {t_old:>10.3f} {t_new:>11.3f} {t_old / t_new:>6.1f}x")
+        del df
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+# benchmarks/check_instrumentacao.py
+"""
+Verificação da instrumentação das etapas (src/instrument.py) com o agendador sequencial e
+em paralelo (PIPELINE_WORKERS).
+
+Roda o pipeline sobre os CSVs de teste com PROFILE_STAGES=all, cada configuração em um
+processo próprio e em pastas e bancos (SQLite) novos, e lê o manifesto da execução: toda
+etapa de topo que rodou precisa ter pico de RSS e um cProfile gravado, também quando roda
+em uma thread do agendador. Termina com código 1 se faltar algum.
+
+    python benchmarks/check_instrumentacao.py
+    python benchmarks/check_instrumentacao.py --workers 1 4 --chunksize 0 300
+"""
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+RAIZ = os.path.abspath(os.path.join(AQUI, '..'))
+SRC = os.path.join(RAIZ, 'src')
+
+
+def manifesto(trabalho, workers, chunksize):
+    """Roda o pipeline em um processo próprio e retorna o manifesto da execução."""
+    saida = os.path.join(trabalho, f'saida_{workers}_{chunksize}')
+    ambiente = dict(os.environ, CACHE_MODE='off', PROFILE_STAGES='all', PIPELINE_WORKERS=str(workers),
+                    VENDAS_CHUNKSIZE=str(chunksize), DB_URL_RAW=f"sqlite:///{saida}_raw.db",
+                    DB_URL_DW=f"sqlite:///{saida}_dw.db")
+    comando = [sys.executable, '-c', f"import sys; sys.path.insert(0, {SRC!r}); import main; main.main(None, {saida!r})"]
+    subprocess.run(comando, env=ambiente, check=True, capture_output=True)
+    with open(max(glob.glob(os.path.join(saida, 'runs', '*.json')), key=os.path.getmtime), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--chunksize', type=int, nargs='+', default=[0, 300])
+    args = parser.parse_args()
+
+    falhas = []
+    with tempfile.TemporaryDirectory() as trabalho:
+        for workers in args.workers:
+            for chunksize in args.chunksize:
+                etapas = [e for e in manifesto(trabalho, workers, chunksize)['etapas']
+                          if '/' not in e['etapa'] and e['status'] == 'ok']
+                sem = [e['etapa'] for e in etapas
+                       if e.get('rss_pico_mb') is None or not e.get('perfil') or not os.path.exists(e['perfil'])]
+                print(f"PIPELINE_WORKERS={workers} VENDAS_CHUNKSIZE={chunksize}: {len(etapas)} etapas de topo, "
+                      f"{len(etapas) - len(sem)} com pico de RSS e perfil")
+                if sem:
+                    falhas.append(f"PIPELINE_WORKERS={workers} VENDAS_CHUNKSIZE={chunksize}: sem pico de RSS ou perfil em {sem}")
+    if falhas:
+        print('FALHA:\n  ' + '\n  '.join(falhas))
+        sys.exit(1)
+    print('OK: todas as etapas de topo com pico de RSS e perfil.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+# benchmarks/check_load_data.py
+"""
+Verificação do CSV da carga LOAD DATA do MySQL (inserirbanco._carga_load_data), sem MySQL.
+
+Grava pelo mesmo caminho da carga um frame com os casos difíceis (barras invertidas em
+colunas object, string e categóricas, '\\N' literal, aspas, vírgulas e quebras de linha no
+texto, nulos e bool) e o lê de volta como o LOAD DATA do MySQL lê (FIELDS TERMINATED BY ','
+OPTIONALLY ENCLOSED BY '"' ESCAPED BY '\\', LINES TERMINATED BY '\\n'). Termina com código 1
+se algum valor voltar diferente do original.
+
+    python benchmarks/check_load_data.py
+"""
+import io
+import os
+import sys
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(AQUI, '..', 'src')))
+
+import pandas as pd
+
+from inserirbanco import _escrever_csv_load_data
+
+# Sequências de escape do LOAD DATA (ESCAPED BY '\\')
+ESCAPES = {'0': '\0', 'b': '\b', 'n': '\n', 'r': '\r', 't': '\t', 'Z': '\x1a'}
+
+
+def ler_como_mysql(texto):
+    """Linhas do CSV como o LOAD DATA as interpreta (None = NULL)."""
+    linhas, campos, campo = [], [], []
+    i, entre_aspas, comecou_aspas, escapado_nulo = 0, False, False, False
+    while i < len(texto):
+        c = texto[i]
+        if c == '\\' and i + 1 < len(texto):
+            proximo = texto[i + 1]
+            if proximo == 'N' and not campo and not comecou_aspas:
+                escapado_nulo = True
+            else:
+                campo.append(ESCAPES.get(proximo, proximo))
+            i += 2
+            continue
+        if entre_aspas:
+            if c == '"' and texto[i + 1:i + 2] == '"':
+                campo.append('"')
+                i += 2
+                continue
+            if c == '"':
+                entre_aspas = False
+            else:
+                campo.append(c)
+        elif c == '"' and not campo:
+            entre_aspas = comecou_aspas = True
+        elif c in ',\n':
+            campos.append(None if escapado_nulo else ''.join(campo))
+            campo, comecou_aspas, escapado_nulo = [], False, False
+            if c == '\n':
+                linhas.append(campos)
+                campos = []
+        else:
+            campo.append(c)
+        i += 1
+    return linhas
+
+
+def main():
+    textos = ['x\\y', '\\N', 'a\\nb', 'aspas "dentro"', 'vírgula, aqui', 'quebra\nde linha', 'fim\\', None]
+    df = pd.DataFrame({
+        'objeto': pd.Series(textos, dtype=object),
+        'string': pd.Series(textos, dtype='string'),
+        'categoria': pd.Series(textos, dtype='category'),
+        'atual': [True, False] * 4,
+        'ativo': pd.Series([True, None] * 4, dtype='boolean'),
+        'valor': [1.5, None, 3.0, 4.25, None, 6.0, 7.0, 8.0],
+    })
+    esperado = {
+        'objeto': textos, 'string': textos, 'categoria': textos,
+        'atual': ['1', '0'] * 4,
+        'ativo': ['1', None] * 4,
+        'valor': ['1.5', None, '3.0', '4.25', None, '6.0', '7.0', '8.0'],
+    }
+    arquivo = io.StringIO()
+    _escrever_csv_load_data(df, arquivo)
+    lidas = ler_como_mysql(arquivo.getvalue())
+
+    falhas = []
+    if len(lidas) != len(df):
+        falhas.append(f"{len(lidas)} linhas lidas, {len(df)} gravadas")
+    for n, linha in enumerate(lidas):
+        for coluna, valor in zip(df.columns, linha):
+            if valor != esperado[coluna][n]:
+                falhas.append(f"linha {n}, {coluna}: lido {valor!r}, esperado {esperado[coluna][n]!r}")
+    if falhas:
+        print('FALHA:\n  ' + '\n  '.join(falhas))
+        sys.exit(1)
+    print(f"OK: {len(df)} linhas x {len(df.columns)} colunas lidas de volta como gravadas.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+# benchmarks/check_memoria.py
+"""
+Verificação de regressão de pico de memória do pipeline em memória.
+
+Para cada modo (copy-on-write ligado/desligado) roda, em um processo próprio, read_raw,
+transform_data, save_parquet e insert_dataframe (SQLite) sobre os CSVs sintéticos e mede o
+pico de RSS acima do início de cada etapa, em múltiplos do tamanho de vendas em memória
+(memory_usage(deep=True) logo após a leitura). Termina com código 1 se alguma etapa do modo
+padrão (copy-on-write ligado) passar do seu limite em LIMITES, ou se nas etapas de
+GANHO_COW o copy-on-write não reduzir o pico em relação ao modo sem ele (a razão de ligá-lo
+em main.py), para uso antes de um merge. As duas verificações valem a partir de
+ESCALA_MINIMA linhas; abaixo disso os números são só mostrados.
+
+    python benchmarks/check_memoria.py --rows 1000000
+    python benchmarks/check_memoria.py --rows 1000000 --src /tmp/outra-versao/src   # compara versões
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.abspath(os.path.join(AQUI, '..', 'src'))
+ETAPAS = ['transform_data', 'save_parquet', 'insert_dataframe']
+# Pico máximo por etapa em múltiplos de vendas, medido em 1M linhas: 5.0x, 0.84x e 7.1x
+# (insert_dataframe é dominado pelas tuplas que o to_sql monta para o driver). Valem a partir
+# de 1M linhas: abaixo disso o custo fixo das bibliotecas (pyarrow, sqlalchemy) domina.
+LIMITES = {'transform_data': 5.5, 'save_parquet': 1.2, 'insert_dataframe': 8.0}
+# Etapas em que o copy-on-write precisa baixar o pico (folga para o ruído da medição, em
+# múltiplos de vendas). insert_dataframe não entra: o to_sql copia as linhas de qualquer jeito
+GANHO_COW = {'transform_data': 0.05, 'save_parquet': 0.05}
+ESCALA_MINIMA = 1_000_000
+
+
+def medir(pasta, src, copy_on_write):
+    """Executado no processo filho: mede as etapas e imprime o resultado em JSON."""
+    sys.path.insert(0, src)
+    import logging
+    import pandas as pd
+    from sqlalchemy import create_engine
+    if copy_on_write:
+        pd.set_option('mode.copy_on_write', True)
+    from extract import read_raw
+    from transform import transform_data
+    from report import save_parquet
+    from inserirbanco import insert_dataframe
+    from instrument import MedidorRecursos
+
+    logging.getLogger().setLevel(logging.WARNING)
+    emp, prod, vendas = read_raw(pasta)
+    tamanho = int(vendas.memory_usage(deep=True).sum())
+    resultado = {'vendas_mb': round(tamanho / 1024**2, 1)}
+    with tempfile.TemporaryDirectory() as trabalho:
+        engine = create_engine(f"sqlite:///{os.path.join(trabalho, 'check.db')}")
+        funcoes = {
+            'transform_data': lambda: transform_data(emp, prod, vendas),
+            'save_parquet': lambda: save_parquet(estado['resumo'], os.path.join(trabalho, 'resumo.parquet')),
+            'insert_dataframe': lambda: insert_dataframe(estado['resumo'], 'resumo_vendas', engine),
+        }
+        estado = {}
+        for etapa in ETAPAS:
+            with MedidorRecursos(intervalo=0.005) as medida:
+                saida = funcoes[etapa]()
+            if etapa == 'transform_data':
+                estado['resumo'] = saida['resumo']
+                del saida
+            resultado[etapa] = round((medida.pico - medida.inicio) / tamanho, 2)
+        engine.dispose()
+    print(json.dumps(resultado))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000, help='linhas de vendas')
+    parser.add_argument('--dados', default=os.path.join(tempfile.gettempdir(), 'bus2_bench'),
+                        help='pasta dos CSVs gerados (a mesma de bench_pipeline.py)')
+    parser.add_argument('--src', default=SRC, help='pasta src/ do código medido')
+    parser.add_argument('--limite', type=float, help='limite único para todas as etapas (padrão: LIMITES)')
+    parser.add_argument('--filho', nargs=2, metavar=('PASTA', 'COW'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.filho:
+        medir(args.filho[0], os.path.abspath(args.src), args.filho[1] == '1')
+        return
+
+    sys.path.insert(0, AQUI)
+    from gerador import gerar_arquivos
+    pasta = os.path.join(args.dados, f'vendas_{args.rows}')
+    if not os.path.exists(os.path.join(pasta, 'vendas.csv')):
+        gerar_arquivos(pasta, args.rows)
+
+    limites = {e: args.limite or LIMITES[e] for e in ETAPAS}
+    picos = {}
+    print(f"{'copy_on_write':<14} {'vendas MB':>10} " + ' '.join(f'{e:>17}' for e in ETAPAS))
+    for cow in ('1', '0'):
+        saida = subprocess.run([sys.executable, __file__, '--src', args.src, '--filho', pasta, cow],
+                               capture_output=True, text=True, check=True).stdout
+        r = picos[cow] = json.loads(saida.strip().splitlines()[-1])
+        print(f"{'sim' if cow == '1' else 'não':<14} {r['vendas_mb']:>10.0f} " + ' '.join(f"{r[e]:>16.2f}x" for e in ETAPAS))
+    print(f"{'diferença':<14} {'':>10} " + ' '.join(f"{picos['1'][e] - picos['0'][e]:>+16.2f}x" for e in ETAPAS))
+    if args.rows < ESCALA_MINIMA:
+        print(f"Abaixo de {ESCALA_MINIMA} linhas: limites e ganho do copy-on-write não verificados.")
+        return
+    falhas = [f"{e}: {picos['1'][e]:.2f}x > {limites[e]}x" for e in ETAPAS if picos['1'][e] > limites[e]]
+    falhas += [f"{e}: copy-on-write {picos['1'][e]:.2f}x não fica abaixo de {picos['0'][e]:.2f}x sem ele"
+               for e, folga in GANHO_COW.items() if picos['1'][e] > picos['0'][e] + folga]
+    if falhas:
+        print('Pico de memória acima do limite ou sem o ganho do copy-on-write:\n  ' + '\n  '.join(falhas))
+        sys.exit(1)
+    print('OK: picos dentro dos limites ' + ', '.join(f'{e} {limites[e]}x' for e in ETAPAS)
+          + '; copy-on-write reduz ' + ', '.join(GANHO_COW))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+# benchmarks/check_parquet_incremental.py
+"""
+Verificação da carga incremental com o Parquet particionado (CARGA_MODO=incremental,
+PARQUET_LAYOUT=particionado).
+
+Roda o pipeline sobre CSVs sintéticos, acrescenta ao vendas.csv vendas novas em um mês já
+publicado e roda de novo; depois roda uma terceira vez sem nada novo. O dataset precisa ter,
+por partição, as mesmas linhas de uma carga completa dos CSVs finais em uma pasta nova (as
+vendas novas se juntam às já publicadas, sem substituir o mês nem se repetir). Cada execução
+é um processo próprio (as opções são lidas do ambiente na importação), em bancos SQLite
+novos; em modo em memória e streaming. Termina com código 1 se alguma contagem divergir.
+
+    python benchmarks/check_parquet_incremental.py --rows 5000
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.abspath(os.path.join(AQUI, '..', 'src'))
+sys.path.insert(0, AQUI)
+
+import pandas as pd
+
+from gerador import gerar_arquivos, gerar_vendas
+
+
+def rodar(pasta, saida, bancos, carga, chunksize):
+    """Pipeline completo de `pasta` em um processo próprio; sai com erro se o pipeline falhar."""
+    ambiente = dict(os.environ, CACHE_MODE='off', PARQUET_LAYOUT='particionado', CARGA_MODO=carga,
+                    VENDAS_CHUNKSIZE=str(chunksize), DB_URL_RAW=f"sqlite:///{os.path.join(bancos, 'raw.db')}",
+                    DB_URL_DW=f"sqlite:///{os.path.join(bancos, 'dw.db')}")
+    comando = [sys.executable, '-c', f"import sys; sys.path.insert(0, {SRC!r}); import main; main.main({pasta!r}, {saida!r})"]
+    subprocess.run(comando, env=ambiente, check=True, capture_output=True)
+
+
+def linhas_por_particao(saida):
+    """Linhas de cada partição 'ano=AAAA/mes=MM' do dataset resumo-vendas."""
+    df = pd.read_parquet(os.path.join(saida, 'resumo-vendas'), columns=['id_venda', 'ano', 'mes'])
+    return df.groupby([df['ano'].astype(str), df['mes'].astype(str)], observed=True).size().to_dict()
+
+
+def conferir(trabalho, rows, novas, chunksize):
+    """Falhas (lista de textos) da sequência inicial -> vendas novas -> sem novidade."""
+    pasta = os.path.join(trabalho, f'dados_{chunksize}')
+    caminhos = gerar_arquivos(pasta, rows)
+    saida, bancos = os.path.join(trabalho, f'saida_{chunksize}'), os.path.join(trabalho, f'bancos_{chunksize}')
+    os.makedirs(bancos)
+    rodar(pasta, saida, bancos, 'incremental', chunksize)
+    antes = linhas_por_particao(saida)
+
+    # vendas novas (ids acima dos existentes) em março, mês já publicado
+    extras = gerar_vendas(novas, seed=7, inicio='2023-03-10', dias=5, id_inicial=10 * rows + 1)
+    extras.to_csv(caminhos['vendas'], mode='a', header=False, index=False)
+    rodar(pasta, saida, bancos, 'incremental', chunksize)
+    depois = linhas_por_particao(saida)
+    rodar(pasta, saida, bancos, 'incremental', chunksize)
+    repetida = linhas_por_particao(saida)
+
+    completa, bancos_completa = os.path.join(trabalho, f'completa_{chunksize}'), os.path.join(trabalho, f'bancos_completa_{chunksize}')
+    os.makedirs(bancos_completa)
+    rodar(pasta, completa, bancos_completa, 'completa', chunksize)
+    esperado = linhas_por_particao(completa)
+
+    print(f"chunksize {chunksize}: {sum(antes.values())} -> {sum(depois.values())} linhas "
+          f"(+{novas} novas), sem novidade {sum(repetida.values())}, carga completa {sum(esperado.values())}")
+    falhas = []
+    if depois != esperado:
+        falhas.append(f"chunksize {chunksize}: partições após as vendas novas {depois} != carga completa {esperado}")
+    if repetida != depois:
+        falhas.append(f"chunksize {chunksize}: execução sem vendas novas mudou as partições ({depois} -> {repetida})")
+    return falhas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--novas', type=int, default=20)
+    args = parser.parse_args()
+
+    falhas = []
+    with tempfile.TemporaryDirectory() as trabalho:
+        for chunksize in (0, 1000):
+            falhas += conferir(trabalho, args.rows, args.novas, chunksize)
+    if falhas:
+        print('FALHA:\n  ' + '\n  '.join(falhas))
+        sys.exit(1)
+    print('OK: as vendas novas se juntam às partições publicadas.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+# benchmarks/check_troca_dw.py
+"""
+Verificação da publicação das cargas do DW por staging + troca (modelo_dw.DW_PUBLICACAO).
+
+Carrega fVendas sintética em um SQLite e a recarrega (replace) algumas vezes enquanto outro
+processo conta as linhas da tabela em loop. Com a troca o leitor deve ver sempre a tabela
+completa, sem erros nem esperas longas; termina com código 1 se viu outra contagem ou erro.
+--modo direta mostra, como referência, o comportamento sem staging. O engine vem de
+config.py (SQLite em WAL; SQLITE_WAL=0 mostra as esperas do journal padrão, em que a
+gravação da staging trava o arquivo inteiro).
+
+    python benchmarks/check_troca_dw.py --rows 200000
+    python benchmarks/check_troca_dw.py --rows 200000 --modo direta
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.abspath(os.path.join(AQUI, '..', 'src'))
+
+
+def ler(caminho, segundos):
+    """Executado no processo leitor: conta fVendas em loop e imprime as contagens em JSON."""
+    import sqlite3
+    conn = sqlite3.connect(caminho, timeout=60)
+    contagens, erros, maior_espera = {}, 0, 0.0
+    fim = time.time() + segundos
+    while time.time() < fim:
+        inicio = time.perf_counter()
+        try:
+            n = conn.execute('SELECT COUNT(*) FROM fVendas').fetchone()[0]
+            contagens[n] = contagens.get(n, 0) + 1
+        except sqlite3.Error:
+            erros += 1
+        maior_espera = max(maior_espera, time.perf_counter() - inicio)
+    print(json.dumps({'contagens': contagens, 'erros': erros, 'maior_espera_s': round(maior_espera, 3)}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--cargas', type=int, default=3)
+    parser.add_argument('--modo', choices=['troca', 'direta'], default='troca')
+    parser.add_argument('--leitor', nargs=2, metavar=('DB', 'SEGUNDOS'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.leitor:
+        return ler(args.leitor[0], float(args.leitor[1]))
+
+    os.environ['DW_PUBLICACAO'] = args.modo
+    sys.path.insert(0, SRC)
+    sys.path.insert(0, os.path.dirname(SRC))
+    sys.path.insert(0, AQUI)
+    import logging
+    from config import set_engine
+    from gerador import gerar_vendas
+    from inserirbanco import insert_dataframe
+
+    logging.getLogger().setLevel(logging.WARNING)
+    vendas = gerar_vendas(args.rows)
+    with tempfile.TemporaryDirectory() as trabalho:
+        caminho = os.path.join(trabalho, 'dw.db')
+        engine = set_engine('dw', f'sqlite:///{caminho}')
+        inicio = time.perf_counter()
+        insert_dataframe(vendas, 'fVendas', engine)
+        duracao = time.perf_counter() - inicio
+        leitor = subprocess.Popen([sys.executable, __file__, '--leitor', caminho, str(duracao * (args.cargas + 1))],
+                                  stdout=subprocess.PIPE, text=True)
+        tempos = []
+        for _ in range(args.cargas):
+            inicio = time.perf_counter()
+            insert_dataframe(vendas, 'fVendas', engine)
+            tempos.append(time.perf_counter() - inicio)
+        resultado = json.loads(leitor.communicate()[0])
+        engine.dispose()
+
+    print(f"modo {args.modo}: carga de {args.rows} linhas em {sum(tempos) / len(tempos):.2f}s (média de {args.cargas})")
+    print(f"leitor: {sum(resultado['contagens'].values())} consultas, contagens {resultado['contagens']}, "
+          f"{resultado['erros']} erros, maior espera {resultado['maior_espera_s']}s")
+    incompleto = set(resultado['contagens']) - {str(args.rows)} or resultado['erros']
+    if incompleto and args.modo == 'troca':
+        print("FALHA: o leitor viu a tabela vazia, incompleta ou ausente.")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+# benchmarks/gerador.py
+"""
+Gerador de dados sintéticos no formato dos CSVs da Bus2 (empregados, produtos, vendas).
+- gerar_dimensoes / gerar_vendas: DataFrames limpos em memória (micro-benchmarks)
+- gerar_arquivos: pasta com os três CSVs em escala (1M, 10M, 50M vendas), gravados em
+  blocos e com a mesma sujeira dos arquivos de teste (ver SUJEIRA)
+
+    python benchmarks/gerador.py --rows 10000000 --out /tmp/bus2_10m
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+CARGOS = ['Vendedor', 'Gerente', 'Assistente', 'Supervisor']
+CATEGORIAS = ['Livros', 'Roupas', 'Casa', 'Esporte', 'Eletrônicos', 'Brinquedos']
+
+# Proporções de sujeira observadas em arquivos_teste_dados_bus2
+SUJEIRA = {
+    'dim_duplicados': 0.07,        # linhas repetidas em empregados/produtos
+    'emp_nulos': 0.10,             # nome / cargo / idade vazios (cada um)
+    'prod_nome_nulo': 0.08,
+    'prod_preco_nulo': 0.14,
+    'prod_categoria_nula': 0.07,
+    'vendas_duplicadas': 0.025,    # vendas repetidas (mesma linha inteira)
+    'vendas_data_nula': 0.10,
+    'vendas_valor_nulo': 0.075,    # valor_unitario e valor_total vazios juntos
+    'vendas_numero_invalido': 0.005,  # textos em colunas numéricas ('n/a', '12,50', ...)
+    'vendas_qt_negativa': 0.002,
+    'vendas_id_desconhecido': 0.001,  # ids sem correspondência nas dimensões
+}
+NUMEROS_INVALIDOS = np.array(['n/a', '-', '12,50', '1.234,56', 'NaN?', 'erro'], dtype=object)
+
+
+def gerar_dimensoes(n_emp=100, n_prod=200, seed=42):
+    """Empregados e produtos com ids densos 1..n, como nos CSVs originais."""
+    rng = np.random.default_rng(seed)
+    emp = pd.DataFrame({
+        'id_empregado': np.arange(1, n_emp + 1),
+        'nome': [f'Funcionario {i}' for i in range(1, n_emp + 1)],
+        'cargo': rng.choice(CARGOS, n_emp),
+        'idade': rng.integers(18, 65, n_emp).astype('float64'),
+    })
+    prod = pd.DataFrame({
+        'id_produto': np.arange(1, n_prod + 1),
+        'nome': [f'Produto {i}' for i in range(1, n_prod + 1)],
+        'preco': np.round(rng.uniform(5, 1500, n_prod), 2),
+        'categoria': rng.choice(CATEGORIAS, n_prod),
+    })
+    return emp, prod
+
+
+def gerar_vendas(n_vendas, n_emp=100, n_prod=200, seed=42, inicio='2023-01-01', dias=180, id_inicial=1):
+    """Vendas com o mesmo layout de vendas.csv ('data' já como datetime)."""
+    rng = np.random.default_rng(seed)
+    qt = rng.integers(1, 10, n_vendas)
+    vu = np.round(rng.uniform(5, 1500, n_vendas), 2)
+    return pd.DataFrame({
+        'id_venda': np.arange(id_inicial, id_inicial + n_vendas),
+        'data': pd.Timestamp(inicio) + pd.to_timedelta(rng.integers(0, dias, n_vendas), unit='D'),
+        'id_produto': rng.integers(1, n_prod + 1, n_vendas),
+        'id_empregado': rng.integers(1, n_emp + 1, n_vendas),
+        'quantidade': qt,
+        'valor_unitario': vu,
+        'valor_total': np.round(qt * vu, 2),
+    })
+
+
+def _anular(df, coluna, fracao, rng):
+    df.loc[rng.random(len(df)) < fracao, coluna] = np.nan
+
+
+def _duplicar(df, fracao, rng):
+    """Acrescenta cópias de linhas sorteadas em posições aleatórias."""
+    repetidas = df.sample(frac=fracao, random_state=int(rng.integers(2**31)))
+    df = pd.concat([df, repetidas], ignore_index=True)
+    return df.iloc[rng.permutation(len(df))].reset_index(drop=True)
+
+
+def sujar_dimensoes(emp, prod, seed=42):
+    """Aplica a sujeira de SUJEIRA às dimensões (nulos e linhas duplicadas)."""
+    rng = np.random.default_rng(seed)
+    emp, prod = emp.copy(), prod.copy()
+    for coluna in ('nome', 'cargo', 'idade'):
+        _anular(emp, coluna, SUJEIRA['emp_nulos'], rng)
+    _anular(prod, 'nome', SUJEIRA['prod_nome_nulo'], rng)
+    _anular(prod, 'preco', SUJEIRA['prod_preco_nulo'], rng)
+    _anular(prod, 'categoria', SUJEIRA['prod_categoria_nula'], rng)
+    return _duplicar(emp, SUJEIRA['dim_duplicados'], rng), _duplicar(prod, SUJEIRA['dim_duplicados'], rng)
+
+
+def sujar_vendas(vendas, n_emp=100, n_prod=200, seed=42):
+    """
+    Aplica a sujeira de SUJEIRA a um bloco de vendas. As colunas numéricas e a data viram
+    texto (como chegam no CSV) para comportar valores inválidos.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(vendas)
+    vendas = vendas.copy()
+    vendas['data'] = vendas['data'].dt.strftime('%Y-%m-%d').where(rng.random(n) >= SUJEIRA['vendas_data_nula'])
+    negativa = rng.random(n) < SUJEIRA['vendas_qt_negativa']
+    vendas.loc[negativa, 'quantidade'] *= -1
+    desconhecido = rng.random(n) < SUJEIRA['vendas_id_desconhecido']
+    vendas.loc[desconhecido, 'id_produto'] = n_prod + 1 + rng.integers(0, 1000, int(desconhecido.sum()))
+    sem_valor = rng.random(n) < SUJEIRA['vendas_valor_nulo']
+    vendas.loc[sem_valor, ['valor_unitario', 'valor_total']] = np.nan
+    for coluna in ('quantidade', 'valor_unitario'):
+        invalido = rng.random(n) < SUJEIRA['vendas_numero_invalido']
+        if invalido.any():
+            vendas[coluna] = vendas[coluna].astype(object)
+            vendas.loc[invalido, coluna] = rng.choice(NUMEROS_INVALIDOS, int(invalido.sum()))
+    return _duplicar(vendas, SUJEIRA['vendas_duplicadas'], rng)
+
+
+def gerar_arquivos(pasta, n_vendas, n_emp=100, n_prod=200, seed=42, bloco=1_000_000, sujo=True, arquivos=1):
+    """
+    Grava empregados.csv, produtos.csv e vendas.csv em `pasta` (~n_vendas linhas de vendas,
+    mais as duplicadas). As vendas são geradas e gravadas em blocos de `bloco` linhas, então
+    a memória não depende de n_vendas. Com arquivos > 1 as vendas são divididas em
+    vendas/vendas_0001.csv, ... (um arquivo por dia/loja, ler com VENDAS_ARQUIVOS=vendas).
+    Retorna o dict nome -> caminho.
+    """
+    os.makedirs(pasta, exist_ok=True)
+    emp, prod = gerar_dimensoes(n_emp, n_prod, seed)
+    if sujo:
+        emp, prod = sujar_dimensoes(emp, prod, seed)
+    caminhos = {nome: os.path.join(pasta, f'{nome}.csv') for nome in ('empregados', 'produtos', 'vendas')}
+    emp.to_csv(caminhos['empregados'], index=False)
+    prod.to_csv(caminhos['produtos'], index=False)
+    if arquivos > 1:
+        caminhos['vendas'] = os.path.join(pasta, 'vendas')
+        os.makedirs(caminhos['vendas'], exist_ok=True)
+        bloco = -(-n_vendas // arquivos)
+
+    gravadas = 0
+    for i, inicio in enumerate(range(0, n_vendas, bloco)):
+        n = min(bloco, n_vendas - inicio)
+        vendas = gerar_vendas(n, n_emp, n_prod, seed=seed + i, id_inicial=inicio + 1)
+        if sujo:
+            vendas = sujar_vendas(vendas, n_emp, n_prod, seed=seed + i)
+        if arquivos > 1:
+            vendas.to_csv(os.path.join(caminhos['vendas'], f'vendas_{i + 1:04d}.csv'), index=False)
+        else:
+            vendas.to_csv(caminhos['vendas'], index=False, mode='w' if i == 0 else 'a', header=(i == 0))
+        gravadas += len(vendas)
+    print(f"Gerado em {pasta}: {len(emp)} empregados, {len(prod)} produtos, {gravadas} vendas")
+    return caminhos
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Gera CSVs sintéticos no formato da Bus2')
+    parser.add_argument('--rows', type=int, default=1_000_000, help='linhas de vendas (antes das duplicadas)')
+    parser.add_argument('--out', required=True, help='pasta de saída')
+    parser.add_argument('--empregados', type=int, default=100)
+    parser.add_argument('--produtos', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--limpo', action='store_true', help='sem a sujeira dos arquivos de teste')
+    parser.add_argument('--arquivos', type=int, default=1, help='> 1: vendas divididas em vários arquivos em <out>/vendas/')
+    args = parser.parse_args()
+    t0 = time.perf_counter()
+    gerar_arquivos(args.out, args.rows, args.empregados, args.produtos, args.seed, sujo=not args.limpo, arquivos=args.arquivos)
+    print(f"{time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
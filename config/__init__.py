@@ -1 +1,9 @@
-from .config import cursor,ENGINE,cnx, ENGINEDW
\ No newline at end of file
+from .config import get_engine, set_engine, dispose_engines
+
+
+def __getattr__(name):
+    # ENGINE / ENGINEDW são criados sob demanda (ver config.get_engine)
+    if name in ('ENGINE', 'ENGINEDW'):
+        from . import config as _config
+        return getattr(_config, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
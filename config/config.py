@@ -1,22 +1,99 @@
-import pymysql
 from dotenv import load_dotenv
 import os
-from sqlalchemy import create_engine
+import threading
+from sqlalchemy import create_engine, event
 
 # Carregar variáveis de ambiente
 load_dotenv()
 
-# Configuração de SQLAlchemy para o ambiente de produção
-ENGINE= create_engine(f"mysql+pymysql://{os.getenv('USER_DB')}:{os.getenv('PASSWORDDB')}@{os.getenv('HOST')}:{int(os.getenv('PORTA'))}/{os.getenv('DATABASE')}")
-ENGINEDW = create_engine(f"mysql+pymysql://{os.getenv('USER_DB')}:{os.getenv('PASSWORDDB')}@{os.getenv('HOST')}:{int(os.getenv('PORTA'))}/{os.getenv('DATABASEDW')}")
+# Pool de conexões: precisa comportar as cargas paralelas (LOAD_WORKERS em inserirbanco)
+POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '8'))
+POOL_MAX_OVERFLOW = int(os.getenv('DB_POOL_MAX_OVERFLOW', '2'))
+# Recicla conexões antes do wait_timeout do MySQL derrubá-las (segundos)
+POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+# SQLite em modo WAL: consultas não esperam cargas em andamento (ex.: a staging do DW)
+SQLITE_WAL = os.getenv('SQLITE_WAL', '1') == '1'
 
-# Configuração pymysql para o ambiente de produção
-cnx = pymysql.connect(
-    host=os.getenv('HOST'),
-    user=os.getenv('USER_DB'),
-    password=os.getenv('PASSWORDDB'),
-    port=int(os.getenv('PORTA')),
-    database=os.getenv('DATABASE')
-)
+# Banco de cada engine: 'raw' (ENGINE) e 'dw' (ENGINEDW)
+_DATABASES = {
+    'raw': 'DATABASE',
+    'dw': 'DATABASEDW',
+}
 
-cursor = cnx.cursor()
+# Engines já criados (criados só no primeiro uso, ver get_engine)
+_ENGINES = {}
+_LOCK = threading.Lock()
+
+
+def _url_padrao(nome):
+    """
+    URL do banco `nome`. DB_URL_RAW / DB_URL_DW (ex.: sqlite:///local.db) têm prioridade;
+    sem elas monta a URL MySQL de produção a partir do .env.
+    """
+    url = os.getenv(f"DB_URL_{nome.upper()}")
+    if url:
+        return url
+    return f"mysql+pymysql://{os.getenv('USER_DB')}:{os.getenv('PASSWORDDB')}@{os.getenv('HOST')}:{int(os.getenv('PORTA'))}/{os.getenv(_DATABASES[nome])}"
+
+
+def _ativar_wal(dbapi_conn, _registro):
+    # o SQLite trava o arquivo inteiro durante uma escrita; com WAL os leitores continuam
+    # vendo a última versão confirmada (journal_mode fica gravado no arquivo)
+    dbapi_conn.execute('PRAGMA journal_mode=WAL')
+
+
+def _criar_engine(url):
+    """Cria o engine com as configurações de pool; nenhuma conexão é aberta aqui."""
+    if url.startswith('sqlite'):
+        # SQLite usa o pool padrão do SQLAlchemy (arquivo local, sem rede)
+        engine = create_engine(url)
+        if SQLITE_WAL:
+            event.listen(engine, 'connect', _ativar_wal)
+        return engine
+    # local_infile habilita a carga em massa via LOAD DATA LOCAL INFILE (inserirbanco.insert_dataframe)
+    return create_engine(
+        url,
+        connect_args={'local_infile': True},
+        pool_size=POOL_SIZE,
+        max_overflow=POOL_MAX_OVERFLOW,
+        pool_pre_ping=True,
+        pool_recycle=POOL_RECYCLE,
+    )
+
+
+def get_engine(nome='raw'):
+    """Retorna o engine `nome` ('raw' ou 'dw'), criando-o no primeiro uso."""
+    with _LOCK:
+        if nome not in _ENGINES:
+            _ENGINES[nome] = _criar_engine(_url_padrao(nome))
+        return _ENGINES[nome]
+
+
+def set_engine(nome, engine_ou_url):
+    """
+    Substitui o engine `nome` (ex.: um SQLite local para testes/benchmarks).
+    Aceita um Engine do SQLAlchemy ou uma URL.
+    """
+    engine = _criar_engine(engine_ou_url) if isinstance(engine_ou_url, str) else engine_ou_url
+    with _LOCK:
+        antigo = _ENGINES.get(nome)
+        _ENGINES[nome] = engine
+    if antigo is not None and antigo is not engine:
+        antigo.dispose()
+    return engine
+
+
+def dispose_engines():
+    """Fecha as conexões ociosas de todos os engines (ex.: ao fim do pipeline ou antes de um fork)."""
+    with _LOCK:
+        for engine in _ENGINES.values():
+            engine.dispose()
+
+
+def __getattr__(name):
+    # compatibilidade: ENGINE / ENGINEDW continuam acessíveis, mas só criados no primeiro acesso
+    if name == 'ENGINE':
+        return get_engine('raw')
+    if name == 'ENGINEDW':
+        return get_engine('dw')
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
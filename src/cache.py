@@ -0,0 +1,173 @@
+# src/cache.py
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+
+# Pastas cujo código entra na versão do cache: mudou o código, muda a impressão digital
+_CODE_DIRS = [Path(__file__).resolve().parent, Path(__file__).resolve().parent.parent / 'config']
+
+
+def _hash_arquivo(path, bloco=1 << 20):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for parte in iter(lambda: f.read(bloco), b''):
+            h.update(parte)
+    return h.hexdigest()
+
+
+def code_version():
+    """Hash do código-fonte do pipeline (src/*.py e config/*.py)."""
+    h = hashlib.sha256()
+    for pasta in _CODE_DIRS:
+        for path in sorted(pasta.glob('*.py')):
+            h.update(path.name.encode())
+            h.update(path.read_bytes())
+    return h.hexdigest()[:16]
+
+
+def fingerprint(paths, modo='stat', extra=None):
+    """
+    Impressão digital das entradas de uma execução.
+    - modo 'stat': caminho + tamanho + mtime de cada arquivo (barato, padrão)
+    - modo 'hash': sha256 do conteúdo (lê os arquivos inteiros)
+    O caminho entra inteiro: a mesma saída com outra pasta de origem é outra execução.
+    `extra` (dict) entra no hash junto com a versão do código, ex.: opções do pipeline.
+    """
+    h = hashlib.sha256()
+    for path in sorted(os.path.abspath(str(p)) for p in paths):
+        h.update(path.encode())
+        if not os.path.exists(path):
+            h.update(b'<ausente>')
+        elif modo == 'hash':
+            h.update(_hash_arquivo(path).encode())
+        else:
+            st = os.stat(path)
+            h.update(f"{st.st_size}:{st.st_mtime_ns}".encode())
+    h.update(code_version().encode())
+    h.update(json.dumps(extra or {}, sort_keys=True, default=str).encode())
+    return h.hexdigest()[:24]
+
+
+class StageCache:
+    """
+    Cache de estágios do pipeline, uma pasta por impressão digital das entradas:
+      <cache_dir>/<fingerprint>/manifest.json   estágios concluídos
+      <cache_dir>/<fingerprint>/frames/*.parquet saídas do transform (resumo_dict)
+    Um estágio só é pulado se foi concluído com a mesma impressão digital e, quando gera
+    arquivo, se o arquivo ainda está lá com o mesmo tamanho/mtime.
+    As pastas menos usadas são removidas quando o total passa de max_bytes.
+    Com key=None o cache fica desligado: nada é pulado nem gravado.
+    Pode ser usado por etapas em threads diferentes (ver dag.Agendador).
+    """
+
+    def __init__(self, cache_dir, key, max_bytes=2 * 1024**3):
+        self.cache_dir = Path(cache_dir)
+        self.key = key
+        self.max_bytes = max_bytes
+        self.manifest = {'key': key, 'stages': {}}
+        self._lock = threading.Lock()
+        if key is None:
+            self.dir = self.manifest_path = None
+            return
+        self.dir = self.cache_dir / key
+        self.manifest_path = self.dir / 'manifest.json'
+        if self.manifest_path.exists():
+            try:
+                self.manifest = json.loads(self.manifest_path.read_text(encoding='utf-8'))
+                # marca uso recente para a política de remoção (LRU)
+                os.utime(self.manifest_path)
+            except Exception as e:
+                logging.warning(f"Manifesto do cache ilegível ({e}); ignorando cache {key}.")
+
+    def _salvar_manifest(self):
+        if self.key is None:
+            return
+        self.dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.manifest_path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(self.manifest, indent=2, ensure_ascii=False), encoding='utf-8')
+        os.replace(tmp, self.manifest_path)
+
+    @staticmethod
+    def _stat(path):
+        st = os.stat(path)
+        return {'path': str(path), 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+    def done(self, stage):
+        """True se o estágio foi concluído para estas entradas (e seu arquivo de saída não mudou)."""
+        info = self.manifest['stages'].get(stage)
+        if info is None:
+            return False
+        out = info.get('output')
+        if out is None:
+            return True
+        return os.path.exists(out['path']) and self._stat(out['path']) == out
+
+    def mark(self, stage, output_path=None):
+        """Registra o estágio como concluído (opcionalmente com o arquivo que ele gerou)."""
+        with self._lock:
+            self.manifest['stages'][stage] = {
+                'finished_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'output': self._stat(output_path) if output_path else None,
+            }
+            self._salvar_manifest()
+
+    def save_frames(self, resumo_dict):
+        """
+        Guarda os DataFrames do transform em Parquet dentro da pasta do cache
+        (e os dicts, como quality_metrics, em JSON).
+        """
+        if self.key is None:
+            return
+        frames_dir = self.dir / 'frames'
+        frames_dir.mkdir(parents=True, exist_ok=True)
+        for nome, df in resumo_dict.items():
+            if isinstance(df, pd.DataFrame):
+                df.to_parquet(frames_dir / f"{nome}.parquet", index=False)
+            elif isinstance(df, dict):
+                (frames_dir / f"{nome}.json").write_text(json.dumps(df))
+        self.mark('transform')
+        self.evict()
+
+    def load_frames(self):
+        """Recarrega o resumo_dict salvo por save_frames (None se não houver)."""
+        if not self.done('transform'):
+            return None
+        frames_dir = self.dir / 'frames'
+        if not frames_dir.exists():
+            return None
+        frames = {p.stem: pd.read_parquet(p) for p in sorted(frames_dir.glob('*.parquet'))}
+        frames.update({p.stem: json.loads(p.read_text()) for p in sorted(frames_dir.glob('*.json'))})
+        return frames
+
+    def evict(self):
+        """Remove as pastas de cache usadas há mais tempo até o total caber em max_bytes."""
+        with self._lock:
+            self._evict()
+
+    def _evict(self):
+        if not self.cache_dir.exists():
+            return
+        entradas = []
+        for d in self.cache_dir.iterdir():
+            if not d.is_dir():
+                continue
+            tamanho = sum(f.stat().st_size for f in d.rglob('*') if f.is_file())
+            manifest = d / 'manifest.json'
+            uso = manifest.stat().st_mtime if manifest.exists() else d.stat().st_mtime
+            entradas.append((uso, tamanho, d))
+        total = sum(t for _, t, _ in entradas)
+        for uso, tamanho, d in sorted(entradas):
+            if total <= self.max_bytes:
+                break
+            if d == self.dir:
+                continue
+            logging.info(f"Cache: removendo {d.name} ({tamanho / 1024**2:.1f} MB)")
+            shutil.rmtree(d, ignore_errors=True)
+            total -= tamanho
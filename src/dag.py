@@ -0,0 +1,120 @@
+# src/dag.py
+"""
+Agendador de etapas com dependências (DAG) para o pipeline.
+
+    agenda = Agendador(max_paralelo=4)
+    agenda.adicionar('extract', ler)
+    agenda.adicionar('raw_load', carregar_raw, depende=['extract'])
+    agenda.adicionar('transform', transformar, depende=['extract'])
+    agenda.adicionar('pdf', lambda: agenda.em_processo(build_pdf, dados, path), depende=['transform'])
+    agenda.executar()
+
+Cada etapa começa assim que as dependências terminam, em uma thread do pool (até
+`max_paralelo` ao mesmo tempo): cargas em banco e gravação de arquivos são I/O e liberam o
+GIL. Trabalho de CPU em Python puro (ex.: o PDF) vai para um processo via em_processo().
+Na primeira falha nenhuma etapa nova é iniciada, as que já rodam terminam e executar()
+levanta ErroEtapa com o nome da etapa. Com max_paralelo=1 tudo roda na thread principal,
+na ordem em que as etapas foram adicionadas (comportamento sequencial de antes).
+"""
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+# Etapas do pipeline rodando ao mesmo tempo (1 = sequencial, na thread principal; 0 = uma por
+# núcleo, até 4: com um núcleo só as etapas disputariam o GIL e o total ficaria mais lento)
+PIPELINE_WORKERS = int(os.getenv('PIPELINE_WORKERS', '0')) or min(4, os.cpu_count() or 1)
+
+
+class ErroEtapa(RuntimeError):
+    """Falha de uma etapa do agendador; a exceção original fica em `erro` (e em __cause__)."""
+
+    def __init__(self, etapa, erro):
+        super().__init__(f"Etapa '{etapa}' falhou: {type(erro).__name__}: {erro}")
+        self.etapa = etapa
+        self.erro = erro
+
+
+class Agendador:
+    """Executa funções sem argumentos respeitando as dependências entre elas (ver módulo)."""
+
+    def __init__(self, max_paralelo=None):
+        self.max_paralelo = max(1, max_paralelo or PIPELINE_WORKERS)
+        self.etapas = {}
+        self._processos = None
+
+    def adicionar(self, nome, funcao, depende=()):
+        """Registra a etapa `nome`; `depende` lista etapas já adicionadas."""
+        if nome in self.etapas:
+            raise ValueError(f"Etapa duplicada: {nome}")
+        desconhecidas = [d for d in depende if d not in self.etapas]
+        if desconhecidas:
+            raise ValueError(f"Etapa '{nome}' depende de etapas não adicionadas: {desconhecidas}")
+        self.etapas[nome] = (funcao, tuple(depende))
+
+    def em_processo(self, funcao, *args):
+        """
+        Roda funcao(*args) em um processo separado e espera o resultado (para etapas de CPU).
+        O processo é criado com 'spawn': nada do estado das outras threads (conexões, locks)
+        vai junto, então argumentos e retorno precisam ser pickláveis. Sequencial ou com um
+        único núcleo (outro processo não teria onde rodar ao mesmo tempo): roda aqui.
+        """
+        if self.max_paralelo == 1 or (os.cpu_count() or 1) == 1:
+            return funcao(*args)
+        if self._processos is None:
+            self._processos = ProcessPoolExecutor(max_workers=self.max_paralelo, mp_context=multiprocessing.get_context('spawn'))
+        return self._processos.submit(funcao, *args).result()
+
+    def executar(self):
+        """Roda todas as etapas; retorna {etapa: segundos}. Levanta ErroEtapa na primeira falha."""
+        t0 = time.perf_counter()
+        try:
+            duracoes = self._sequencial() if self.max_paralelo == 1 else self._paralelo()
+        finally:
+            if self._processos is not None:
+                self._processos.shutdown()
+                self._processos = None
+        total = time.perf_counter() - t0
+        logging.info(f"Agendador: {len(duracoes)} etapas em {total:.2f}s (soma das etapas {sum(duracoes.values()):.2f}s)")
+        return duracoes
+
+    @staticmethod
+    def _cronometrar(nome, funcao):
+        t0 = time.perf_counter()
+        try:
+            funcao()
+        except Exception as e:
+            raise ErroEtapa(nome, e) from e
+        return time.perf_counter() - t0
+
+    def _sequencial(self):
+        return {nome: self._cronometrar(nome, funcao) for nome, (funcao, _) in self.etapas.items()}
+
+    def _paralelo(self):
+        pendentes = dict(self.etapas)
+        duracoes = {}
+        rodando = {}
+        with ThreadPoolExecutor(max_workers=self.max_paralelo, thread_name_prefix='etapa') as pool:
+            while pendentes or rodando:
+                prontas = [nome for nome, (_, depende) in pendentes.items() if all(d in duracoes for d in depende)]
+                for nome in prontas[:self.max_paralelo - len(rodando)]:
+                    funcao, _ = pendentes.pop(nome)
+                    rodando[pool.submit(self._cronometrar, nome, funcao)] = nome
+                feitas, _ = wait(rodando, return_when=FIRST_COMPLETED)
+                falhas = []
+                for futuro in feitas:
+                    nome = rodando.pop(futuro)
+                    if futuro.exception() is None:
+                        duracoes[nome] = futuro.result()
+                    else:
+                        falhas.append(futuro.exception())
+                if falhas:
+                    # falha rápida: nada novo começa; as etapas em andamento terminam (threads não são interrompidas)
+                    if pendentes:
+                        logging.error(f"Etapas não iniciadas por causa da falha: {', '.join(pendentes)}")
+                    for futuro in wait(rodando).done:
+                        if futuro.exception() is not None:
+                            logging.error(str(futuro.exception()))
+                    raise falhas[0]
+        return duracoes
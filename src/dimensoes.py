@@ -0,0 +1,157 @@
+# src/dimensoes.py
+"""
+Detecção de mudanças nas dimensões (empregados, produtos) por hash de linha.
+
+A cada carga cada linha da dimensão vira um hash de 64 bits (valores de todas as colunas),
+comparado com os hashes gravados na carga anterior (tabela etl_hashes, no mesmo banco).
+Só linhas novas ou alteradas são gravadas e as que sumiram do CSV são removidas, em uma
+transação e sem DROP da tabela: em um dia sem mudanças nada é escrito, e consultas sobre a
+dimensão não ficam esperando a tabela ser recriada.
+
+Com DIM_MODO=historico (dimensão de mudança lenta tipo 2) nada é apagado: a versão atual de
+uma linha alterada ou removida é encerrada (valido_ate = data da carga, atual = 0) e a nova
+versão entra com valido_de = data da carga e atual = 1. Consultas da versão vigente filtram
+atual = 1.
+
+A primeira carga (sem hashes gravados) e uma mudança de colunas ou de modo gravam a tabela
+inteira, como DIM_MODO=substituir. Tabelas sem chave inteira única (ex.: as raw, que guardam
+os CSVs como vieram, com linhas repetidas) são comparadas por inteiro: uma assinatura do
+conteúdo (CHAVE_TABELA) decide entre não escrever nada e regravar a tabela.
+"""
+import datetime
+import os
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_integer_dtype
+from sqlalchemy import BigInteger, Column, MetaData, String, Table, delete, insert, inspect, select, update
+
+# Carga das dimensões: 'upsert' (só linhas novas/alteradas), 'historico' (tipo 2, mantém as
+# versões anteriores) ou 'substituir' (regrava a tabela inteira, como antes)
+DIM_MODO = os.getenv('DIM_MODO', 'upsert')
+# Chaves por lote nos DELETE/UPDATE ... WHERE chave IN (...)
+LOTE_CHAVES = 1000
+
+# Colunas de vigência acrescentadas no modo historico
+COLUNAS_HISTORICO = ['valido_de', 'valido_ate', 'atual']
+
+TABELA_HASHES = 'etl_hashes'
+# Chave em etl_hashes da assinatura da tabela inteira (tabelas sem chave única)
+CHAVE_TABELA = -1
+_METADATA = MetaData()
+HASHES = Table(
+    TABELA_HASHES, _METADATA,
+    Column('tabela', String(128), primary_key=True),
+    Column('chave', BigInteger, primary_key=True),
+    Column('hash', BigInteger, nullable=False),
+)
+
+
+def chave_valida(df, chave):
+    """True se `chave` existe, é inteira, sem nulos e única (pré-requisito da comparação por linha)."""
+    return (chave in df.columns and is_integer_dtype(df[chave].dtype)
+            and not df[chave].isna().any() and df[chave].is_unique)
+
+
+def hash_linhas(df):
+    """Hash (int64) de cada linha com os valores de todas as colunas; não depende do índice."""
+    return pd.util.hash_pandas_object(df, index=False).to_numpy().view('int64')
+
+
+def assinatura(hashes):
+    """Assinatura do conteúdo (soma dos hashes das linhas, com estouro): não depende da ordem."""
+    soma = np.asarray(hashes, dtype='int64').view('uint64').sum(dtype=np.uint64)
+    return int(np.array([soma], dtype=np.uint64).view('int64')[0])
+
+
+def ler_hashes(conn, tabela):
+    """pd.Series hash por chave da última carga de `tabela` (None se ainda não houver)."""
+    if not inspect(conn).has_table(TABELA_HASHES):
+        return None
+    linhas = conn.execute(select(HASHES.c.chave, HASHES.c.hash).where(HASHES.c.tabela == tabela)).all()
+    if not linhas:
+        return None
+    chaves, hashes = zip(*linhas)
+    return pd.Series(np.array(hashes, dtype='int64'), index=pd.Index(np.array(chaves, dtype='int64')))
+
+
+def diferencas(chaves, hashes, anteriores):
+    """
+    Compara os hashes atuais com os `anteriores` (ler_hashes).
+    Retorna (posições das linhas novas ou alteradas, chaves alteradas, chaves removidas).
+    """
+    chaves = np.asarray(chaves, dtype='int64')
+    pos = anteriores.index.get_indexer(chaves)
+    antes = anteriores.to_numpy()[np.clip(pos, 0, None)] if len(anteriores) else np.zeros(len(chaves), dtype='int64')
+    mudou = (pos < 0) | (antes != hashes)
+    alteradas = chaves[mudou & (pos >= 0)]
+    removidas = anteriores.index.difference(pd.Index(chaves)).to_numpy(dtype='int64')
+    return np.flatnonzero(mudou), alteradas, removidas
+
+
+def colunas_tabela(conn, tabela):
+    """Nomes das colunas de `tabela` no banco (vazio se não existir)."""
+    if not inspect(conn).has_table(tabela):
+        return set()
+    return {c['name'] for c in inspect(conn).get_columns(tabela)}
+
+
+def com_vigencia(df, agora):
+    """df com as colunas do modo historico para versões que começam a valer em `agora`."""
+    return df.assign(valido_de=agora, valido_ate=pd.Series(pd.NaT, index=df.index, dtype='datetime64[ns]'), atual=True)
+
+
+def _lotes(chaves):
+    for inicio in range(0, len(chaves), LOTE_CHAVES):
+        yield [int(c) for c in chaves[inicio:inicio + LOTE_CHAVES]]
+
+
+def apagar_linhas(conn, tabela, chave, chaves):
+    """Remove de `tabela` as linhas com `chave` em `chaves` (modo upsert)."""
+    t = Table(tabela, MetaData(), autoload_with=conn)
+    for lote in _lotes(chaves):
+        conn.execute(delete(t).where(t.c[chave].in_(lote)))
+
+
+def encerrar_versoes(conn, tabela, chave, chaves, agora):
+    """Encerra a versão vigente das `chaves` em `tabela` (modo historico)."""
+    t = Table(tabela, MetaData(), autoload_with=conn)
+    for lote in _lotes(chaves):
+        conn.execute(update(t).where(t.c[chave].in_(lote), t.c.atual == True).values(valido_ate=agora, atual=False))  # noqa: E712
+
+
+def garantir_tabela_hashes(engine):
+    """
+    Cria etl_hashes se não existir. Chamada uma vez antes das cargas (load_tables), e não a
+    cada gravar_hashes: cargas em threads paralelas emitiriam o mesmo CREATE TABLE ao mesmo tempo.
+    """
+    with engine.begin() as conn:
+        _METADATA.create_all(conn, tables=[HASHES], checkfirst=True)
+
+
+def gravar_hashes(conn, tabela, chaves, hashes, substituir=False):
+    """Grava os hashes das `chaves` (substituir=True apaga antes todos os da tabela; etl_hashes já existe)."""
+    if substituir:
+        conn.execute(delete(HASHES).where(HASHES.c.tabela == tabela))
+    else:
+        for lote in _lotes(chaves):
+            conn.execute(delete(HASHES).where(HASHES.c.tabela == tabela, HASHES.c.chave.in_(lote)))
+    if len(chaves):
+        conn.execute(insert(HASHES), [{'tabela': tabela, 'chave': int(c), 'hash': int(h)} for c, h in zip(chaves, hashes)])
+
+
+def remover_hashes(conn, tabela, chaves):
+    """Apaga os hashes das `chaves` removidas da dimensão."""
+    for lote in _lotes(chaves):
+        conn.execute(delete(HASHES).where(HASHES.c.tabela == tabela, HASHES.c.chave.in_(lote)))
+
+
+def esquecer_hashes(conn, tabela):
+    """Apaga os hashes de `tabela` (regravada por inteiro fora da comparação): a próxima carga é completa."""
+    if inspect(conn).has_table(TABELA_HASHES):
+        conn.execute(delete(HASHES).where(HASHES.c.tabela == tabela))
+
+
+def agora_carga():
+    """Instante da carga para valido_de/valido_ate (sem microssegundos, igual em todas as linhas)."""
+    return datetime.datetime.now().replace(microsecond=0)
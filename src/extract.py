@@ -1,9 +1,130 @@
-import pandas as pd
+import glob
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from pathlib import Path
 
-def read_raw(folder):
+import numpy as np
+import pandas as pd
+
+from schema import SCHEMAS, COLUNAS_ORIGEM, read_csv_tipado
+
+# Arquivos de vendas: vazio = <pasta>/vendas.csv. Aceita uma pasta (todos os *.csv dela) ou um
+# glob relativo à pasta dos CSVs, ex.: 'diario/*.csv' ou 'lojas/*/vendas_*.csv'
+VENDAS_ARQUIVOS = os.getenv('VENDAS_ARQUIVOS', '')
+# Processos para ler vários arquivos de vendas em paralelo (0 = um por núcleo)
+EXTRACT_WORKERS = int(os.getenv('EXTRACT_WORKERS', '0'))
+
+
+def listar_arquivos_vendas(folder, vendas=None):
+    """
+    Arquivos de vendas a ler, em ordem de nome:
+    - vendas None: VENDAS_ARQUIVOS ou, se vazio, <folder>/vendas.csv
+    - uma pasta: todos os *.csv dela
+    - um glob (relativo a folder, se não for absoluto)
+    Os CSVs das dimensões (empregados/produtos) nunca entram na lista.
+    """
+    padrao = Path(folder) / (vendas or VENDAS_ARQUIVOS or SCHEMAS['vendas']['arquivo'])
+    if padrao.is_dir():
+        arquivos = padrao.glob('*.csv')
+    elif any(c in str(padrao) for c in '*?['):
+        arquivos = [Path(a) for a in glob.glob(str(padrao), recursive=True)]
+    else:
+        arquivos = [padrao]
+    dimensoes = {Path(folder, SCHEMAS[nome]['arquivo']).resolve() for nome in ('empregados', 'produtos')}
+    arquivos = sorted(p for p in arquivos if p.resolve() not in dimensoes)
+    if not arquivos:
+        raise FileNotFoundError(f"Nenhum arquivo de vendas em {padrao}")
+    return arquivos
+
+
+def _com_origem(df, rotulo, rotulos, primeira_linha=1):
+    """
+    Completa o schema de vendas (colunas ausentes no arquivo viram nulas, no tipo declarado) e
+    acrescenta a procedência: arquivo_origem (category com todos os arquivos da leitura, para a
+    concatenação manter o tipo) e linha_origem (linha do registro no arquivo, sem o cabeçalho).
+    """
+    for col, tipo in SCHEMAS['vendas']['colunas'].items():
+        if col not in df.columns:
+            df[col] = pd.Series(index=df.index, dtype=tipo)
+    codigo = rotulos.index(rotulo)
+    df['arquivo_origem'] = pd.Categorical.from_codes(np.full(len(df), codigo, dtype=np.int32), categories=rotulos)
+    df['linha_origem'] = np.arange(primeira_linha, primeira_linha + len(df), dtype=COLUNAS_ORIGEM['linha_origem'])
+    return df
+
+
+def _ler_arquivo(tarefa):
+    """Lê um arquivo de vendas inteiro, tipado e com procedência (roda nos processos do pool)."""
+    path, rotulo, rotulos, engine = tarefa
+    return _com_origem(read_csv_tipado(path, 'vendas', engine=engine), rotulo, rotulos)
+
+
+def _ler_em_blocos(path, rotulo, rotulos, chunksize):
+    linha = 1
+    for chunk in read_csv_tipado(path, 'vendas', chunksize=chunksize):
+        yield _com_origem(chunk, rotulo, rotulos, linha)
+        linha += len(chunk)
+
+
+def _vendas_em_blocos(tarefas, chunksize, workers):
+    """
+    Iterador de blocos de até `chunksize` linhas, na ordem dos arquivos.
+    Com um worker cada arquivo é lido em blocos (memória limitada pelo bloco); com vários,
+    até `workers` arquivos são lidos inteiros à frente no pool enquanto o atual é repassado
+    em blocos (memória limitada por `workers` arquivos).
+    """
+    if workers <= 1:
+        for path, rotulo, rotulos, _ in tarefas:
+            yield from _ler_em_blocos(path, rotulo, rotulos, chunksize)
+        return
+    pendentes = iter(tarefas)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        lendo = deque(pool.submit(_ler_arquivo, t) for t in islice(pendentes, workers))
+        while lendo:
+            df = lendo.popleft().result()
+            proxima = next(pendentes, None)
+            if proxima is not None:
+                lendo.append(pool.submit(_ler_arquivo, proxima))
+            for inicio in range(0, len(df), chunksize):
+                yield df.iloc[inicio:inicio + chunksize].copy(deep=False)
+
+
+def ler_vendas(folder, vendas=None, chunksize=None, engine=None, workers=None):
+    """
+    Lê os arquivos de vendas (ver listar_arquivos_vendas) com o schema declarado e as colunas
+    de procedência (schema.COLUNAS_ORIGEM). Vários arquivos são lidos em paralelo em um pool
+    de processos (workers, ou EXTRACT_WORKERS; 0 = um por núcleo) e concatenados, ou, com
+    chunksize, repassados em blocos (ver _vendas_em_blocos).
+    """
+    arquivos = listar_arquivos_vendas(folder, vendas)
+    rotulos = [os.path.relpath(p, folder) for p in arquivos]
+    tarefas = [(path, rotulo, rotulos, engine) for path, rotulo in zip(arquivos, rotulos)]
+    workers = max(1, min(workers or EXTRACT_WORKERS or os.cpu_count() or 1, len(tarefas)))
+    if chunksize:
+        return _vendas_em_blocos(tarefas, chunksize, workers)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            partes = list(pool.map(_ler_arquivo, tarefas))
+    else:
+        partes = [_ler_arquivo(t) for t in tarefas]
+    if len(partes) == 1:
+        return partes[0]
+    return pd.concat(partes, ignore_index=True, copy=False)
+
+
+def read_raw(folder, chunksize=None, engine=None, vendas=None, workers=None):
+    """
+    Lê os CSVs brutos da pasta já com os tipos declarados em schema.SCHEMAS
+    (categorias, inteiros de 32 bits e 'data' convertida para datetime).
+    Vendas pode vir de vários arquivos (`vendas`: pasta ou glob, ver ler_vendas), lidos em
+    paralelo e com as colunas de procedência arquivo_origem/linha_origem.
+    Com chunksize, as vendas não são carregadas inteiras: é retornado um iterador de
+    DataFrames com até `chunksize` linhas cada (modo streaming, ver transform_data_stream).
+    engine='pyarrow' usa o parser CSV do pyarrow.
+    """
     p = Path(folder)
-    emp = pd.read_csv(p/'empregados.csv')
-    prod = pd.read_csv(p/'produtos.csv')
-    vendas = pd.read_csv(p/'vendas.csv')
+    emp = read_csv_tipado(p/SCHEMAS['empregados']['arquivo'], 'empregados', engine=engine)
+    prod = read_csv_tipado(p/SCHEMAS['produtos']['arquivo'], 'produtos', engine=engine)
+    vendas = ler_vendas(folder, vendas, chunksize=chunksize, engine=engine, workers=workers)
     return emp, prod, vendas
@@ -0,0 +1,149 @@
+# src/incremental.py
+"""
+Carga incremental por marca d'água (high-water mark) das tabelas de vendas.
+
+Cada tabela carregada de forma incremental tem uma linha em etl_marcas, no mesmo banco:
+a maior MARCA_COLUNA (id_venda ou data) já carregada nela. Só as vendas acima da marca são
+transformadas e anexadas, e a marca avança na mesma transação da carga. Antes de anexar,
+linhas acima da marca que tenham sobrado de uma carga interrompida são apagadas: repetir
+uma carga que falhou não duplica nada.
+
+    with engine.begin() as conn:
+        marca = ler_marcas(conn).get('fVendas')
+        novas = filtrar_novas(vendas, marca)
+        limpar_acima(conn, 'fVendas', marca)
+        ...  # anexa `novas`
+        gravar_marca(conn, 'fVendas', maior_marca(novas['id_venda'], marca), len(novas))
+
+Com MARCA_COLUNA=data, vendas que chegarem atrasadas com data <= marca são ignoradas.
+Vendas sem valor na coluna da marca só entram na primeira carga (ainda sem marca).
+"""
+import datetime
+import os
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import BigInteger, Column, DateTime, MetaData, String, Table, delete, insert, inspect, select
+
+# Carga das tabelas de vendas: 'completa' (substitui tudo) ou 'incremental' (só vendas acima da marca)
+CARGA_MODO = os.getenv('CARGA_MODO', 'completa')
+# Coluna da marca d'água: 'id_venda' ou 'data'
+MARCA_COLUNA = os.getenv('MARCA_COLUNA', 'id_venda')
+
+TABELA_MARCAS = 'etl_marcas'
+_METADATA = MetaData()
+MARCAS = Table(
+    TABELA_MARCAS, _METADATA,
+    Column('tabela', String(128), primary_key=True),
+    Column('coluna', String(64), nullable=False),
+    Column('valor', String(64), nullable=False),
+    Column('linhas', BigInteger, nullable=False),  # linhas anexadas na última carga
+    Column('atualizado_em', DateTime, nullable=False),
+)
+
+
+def _para_texto(valor, coluna):
+    if coluna == 'data':
+        return pd.Timestamp(valor).isoformat()
+    return str(int(valor)) if float(valor).is_integer() else repr(float(valor))
+
+
+def _de_texto(texto, coluna):
+    if coluna == 'data':
+        return pd.Timestamp(texto)
+    valor = float(texto)
+    return int(valor) if valor.is_integer() else valor
+
+
+def _valores(serie, coluna):
+    """Coluna da marca como datetime (data) ou número; inválidos viram NaT/NaN."""
+    if coluna == 'data':
+        return pd.to_datetime(serie, errors='coerce')
+    return pd.to_numeric(serie, errors='coerce')
+
+
+def ler_marcas(conn, coluna=MARCA_COLUNA):
+    """
+    {tabela: marca} gravadas em etl_marcas para `coluna` (marcas de outra coluna são
+    ignoradas: trocar MARCA_COLUNA recomeça com uma carga completa). Vazio sem a tabela.
+    """
+    if not inspect(conn).has_table(TABELA_MARCAS):
+        return {}
+    linhas = conn.execute(select(MARCAS.c.tabela, MARCAS.c.valor).where(MARCAS.c.coluna == coluna))
+    return {tabela: _de_texto(valor, coluna) for tabela, valor in linhas}
+
+
+def marca_comum(marcas, tabelas):
+    """Marca a partir da qual todas as `tabelas` precisam de dados (None se alguma não tiver marca)."""
+    if not tabelas or any(t not in marcas for t in tabelas):
+        return None
+    return min(marcas[t] for t in tabelas)
+
+
+def maior_marca(serie, marca=None, coluna=MARCA_COLUNA):
+    """Nova marca: o maior valor entre `marca` e a coluna `serie` (None se os dois faltarem)."""
+    maximo = _valores(serie, coluna).max() if len(serie) else None
+    if maximo is None or pd.isna(maximo):
+        return marca
+    maximo = pd.Timestamp(maximo) if coluna == 'data' else maximo.item()
+    return maximo if marca is None else max(marca, maximo)
+
+
+def filtrar_novas(df, marca, coluna=MARCA_COLUNA):
+    """Linhas de `df` com `coluna` acima de `marca` (sem marca: o próprio df)."""
+    if marca is None:
+        return df
+    acima = (_valores(df[coluna], coluna) > marca).to_numpy(dtype=bool, na_value=False)
+    if acima.all():
+        return df
+    novas = df.take(np.flatnonzero(acima))
+    novas.index = pd.RangeIndex(len(novas))
+    return novas
+
+
+def filtrar_ate(df, marca, coluna=MARCA_COLUNA):
+    """
+    Complemento de filtrar_novas: linhas de `df` com `coluna` até `marca` ou sem valor nela
+    (sobras acima da marca, de uma carga interrompida, ficam fora; sem marca, nenhuma linha).
+    """
+    if marca is None:
+        return df.iloc[:0]
+    acima = (_valores(df[coluna], coluna) > marca).to_numpy(dtype=bool, na_value=False)
+    if not acima.any():
+        return df
+    return df.take(np.flatnonzero(~acima))
+
+
+def filtrar_blocos(chunks, marca, estado, coluna=MARCA_COLUNA):
+    """
+    filtrar_novas aplicado a cada bloco (modo streaming); blocos sem nada novo são pulados.
+    estado['marca'] acompanha a maior marca vista (a nova marca ao fim da leitura).
+    """
+    estado['marca'] = marca
+    for chunk in chunks:
+        novas = filtrar_novas(chunk, marca, coluna)
+        if len(novas):
+            estado['marca'] = maior_marca(novas[coluna], estado['marca'], coluna)
+            yield novas
+
+
+def limpar_acima(conn, tabela, marca, coluna=MARCA_COLUNA):
+    """
+    Apaga de `tabela` as linhas com `coluna` acima de `marca` (todas, se marca for None).
+    Retorna as linhas apagadas (0 se a tabela ainda não existir).
+    """
+    if not inspect(conn).has_table(tabela):
+        return 0
+    t = Table(tabela, MetaData(), autoload_with=conn)
+    comando = delete(t)
+    if marca is not None:
+        comando = comando.where(t.c[coluna] > (marca.to_pydatetime() if coluna == 'data' else marca))
+    return conn.execute(comando).rowcount
+
+
+def gravar_marca(conn, tabela, valor, linhas, coluna=MARCA_COLUNA):
+    """Grava a marca de `tabela` (na transação de `conn`, junto com a carga)."""
+    _METADATA.create_all(conn, tables=[MARCAS], checkfirst=True)
+    conn.execute(delete(MARCAS).where(MARCAS.c.tabela == tabela))
+    conn.execute(insert(MARCAS).values(tabela=tabela, coluna=coluna, valor=_para_texto(valor, coluna),
+                                       linhas=int(linhas), atualizado_em=datetime.datetime.now()))
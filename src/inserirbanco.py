@@ -1,57 +1,515 @@
 # src/inserirbanco.py
 import os
 import logging
+import numpy as np
 import pandas as pd
 import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from pandas.api.types import is_bool_dtype, is_datetime64_any_dtype, is_object_dtype, is_string_dtype
+from sqlalchemy import inspect
+from sqlalchemy.engine import Connection
 
 # permitir imports a partir da raiz do projeto
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from config import ENGINE, ENGINEDW
+from config import get_engine
+from schema import SCHEMAS, read_csv_tipado
+from extract import ler_vendas
+from instrument import etapa
+from incremental import MARCA_COLUNA, ler_marcas, marca_comum, maior_marca, filtrar_novas, limpar_acima, gravar_marca
+from dimensoes import (DIM_MODO, COLUNAS_HISTORICO, CHAVE_TABELA, chave_valida, hash_linhas, assinatura, ler_hashes,
+                       diferencas, colunas_tabela, com_vigencia, apagar_linhas, encerrar_versoes, gravar_hashes, remover_hashes, esquecer_hashes, agora_carga,
+                       garantir_tabela_hashes)
+from modelo_dw import (tabela_gerenciada, conferir_frame, garantir_tabela, garantir_particoes, esvaziar, remover_indices, criar_indices, ddl_transacional,
+                       usa_staging, nome_staging, criar_staging, indices_na_staging, limpar_staging, publicar_staging)
+from transform import mesclar_kpis
 
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 
 
-def insert_dataframe(df: pd.DataFrame, table_name: str, engine):
-    """Insere um DataFrame no banco (replace)."""
-    logging.info(f"Inserindo {len(df)} linhas na tabela `{table_name}`...")
+# Linhas por lote no executemany (parâmetros preparados)
+BULK_CHUNKSIZE = int(os.getenv('BULK_CHUNKSIZE', '50000'))
+
+
+@contextmanager
+def _transacao(engine):
+    """engine.begin(), ou a própria conexão se o chamador já passou uma (carga dentro da transação dele)."""
+    if isinstance(engine, Connection):
+        yield engine
+    else:
+        with engine.begin() as conn:
+            yield conn
+
+
+def _carga_multi(df: pd.DataFrame, table_name: str, engine, if_exists: str):
+    """Carga antiga: INSERTs multi-linha montados pelo pandas (lento para tabelas grandes)."""
+    df.to_sql(table_name, con=engine, if_exists=if_exists, index=False, method='multi', chunksize=1000)
+
+
+def _carga_executemany(df: pd.DataFrame, table_name: str, engine, if_exists: str):
+    """Um único INSERT preparado executado em lote (cursor.executemany) pelo driver."""
+    df.to_sql(table_name, con=engine, if_exists=if_exists, index=False, chunksize=BULK_CHUNKSIZE)
+
+
+def _barras_dobradas(valor):
+    return valor.replace('\\', '\\\\') if isinstance(valor, str) else valor
+
+
+def _preparar_load_data(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Frame no formato que o LOAD DATA (ESCAPED BY '\\') lê de volta sem perder valores:
+    - barras invertidas do texto dobradas (em colunas object/string e nas categorias), senão
+      'a\\nb' viraria quebra de linha e '\\N' nulo
+    - bool como 1/0: 'True'/'False' entram como 0 em uma coluna BOOLEAN/TINYINT (só com aviso)
+    Só copia as colunas alteradas.
+    """
+    trocas = {}
+    for coluna in df.columns:
+        serie = df[coluna]
+        if is_bool_dtype(serie.dtype):
+            trocas[coluna] = serie.astype('Int8' if serie.hasnans else 'int8')
+        elif isinstance(serie.dtype, pd.CategoricalDtype):
+            categorias = serie.cat.categories
+            if categorias.dtype == object and any(isinstance(c, str) and '\\' in c for c in categorias):
+                trocas[coluna] = serie.cat.rename_categories(_barras_dobradas)
+        elif (is_object_dtype(serie.dtype) or is_string_dtype(serie.dtype)) and serie.astype(str).str.contains('\\', regex=False).any():
+            trocas[coluna] = serie.map(_barras_dobradas)
+    return df.assign(**trocas) if trocas else df
+
+
+def _escrever_csv_load_data(df: pd.DataFrame, arquivo):
+    """Grava `df` no CSV lido por _carga_load_data (ver _preparar_load_data e o LOAD DATA de lá)."""
+    _preparar_load_data(df).to_csv(arquivo, index=False, header=False, na_rep='\\N', date_format='%Y-%m-%d %H:%M:%S', lineterminator='\n')
+
+
+def _carga_load_data(df: pd.DataFrame, table_name: str, engine, if_exists: str):
+    """
+    MySQL: cria/limpa a tabela com o schema inferido pelo pandas e carrega as linhas com
+    LOAD DATA LOCAL INFILE a partir de um CSV temporário (requer local_infile no servidor
+    e no driver, ver config.py). Se o servidor recusar, cai para executemany.
+    O escape do CSV é declarado no LOAD DATA: nulos como \\N, barras do texto dobradas e bool
+    como 1/0 (_preparar_load_data) e aspas dentro de campo entre aspas dobradas, como escreve o to_csv.
+    """
+    df.head(0).to_sql(table_name, con=engine, if_exists=if_exists, index=False)
+    fd, tmp_path = tempfile.mkstemp(suffix='.csv')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+            _escrever_csv_load_data(df, f)
+        colunas = ', '.join(f"`{c}`" for c in df.columns)
+        sql = (f"LOAD DATA LOCAL INFILE %s INTO TABLE `{table_name}` CHARACTER SET utf8mb4 "
+               f"FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' ({colunas})")
+        try:
+            with _transacao(engine) as conn:
+                conn.exec_driver_sql(sql, (tmp_path.replace('\\', '/'),))
+        except Exception as e:
+            logging.warning(f"LOAD DATA indisponível para `{table_name}` ({e}); usando executemany.")
+            _carga_executemany(df, table_name, engine, 'append')
+    finally:
+        os.remove(tmp_path)
+
+
+# Estratégias de carga disponíveis e a padrão por dialeto do SQLAlchemy.
+# Para outro banco, registre aqui a função de carga (df, table_name, engine, if_exists).
+LOADERS = {
+    'multi': _carga_multi,
+    'executemany': _carga_executemany,
+    'load_data': _carga_load_data,
+}
+LOADER_POR_DIALETO = {
+    'mysql': 'load_data',
+}
+# Força uma estratégia para todas as cargas (vazio = escolher pelo dialeto)
+LOAD_STRATEGY = os.getenv('LOAD_STRATEGY') or None
+
+
+def _carga_gerenciada(df: pd.DataFrame, t, engine, if_exists: str, strategy: str):
+    """
+    Carga em uma tabela do modelo do DW (modelo_dw): a tabela é criada pela DDL do modelo se
+    preciso e nunca recriada pelo pandas. 'replace' esvazia a tabela (DELETE) em vez de apagá-la,
+    na mesma transação do insert: se a carga falhar a tabela volta ao conteúdo anterior. Em
+    carga em massa (replace ou tabela recém-criada) os índices secundários são removidos antes
+    do insert e recriados uma vez no fim; no MySQL (DDL com commit implícito, ver
+    modelo_dw.ddl_transacional) isso só vale para a tabela recém-criada, ainda vazia, e o
+    replace grava com os índices. 'append' em tabela existente mantém os índices.
+    """
+    conferir_frame(df, t)
+    with _transacao(engine) as conn:
+        criada = garantir_tabela(conn, t)
+        coluna = t.info.get('particionar_por')
+        if coluna in df.columns:
+            garantir_particoes(conn, t, df[coluna])
+        em_massa = criada or (if_exists == 'replace' and ddl_transacional(conn))
+        if if_exists == 'replace' and not criada:
+            esvaziar(conn, t)
+        if em_massa:
+            remover_indices(conn, t)
+        LOADERS[strategy](df, t.name, conn, 'append')
+        if em_massa:
+            criar_indices(conn, t)
+
+
+def _carga_staging(df: pd.DataFrame, table_name: str, engine, strategy: str):
+    """
+    Carga completa de uma tabela do DW sem expor a tabela vazia ou pela metade: as linhas vão
+    para a staging (modelo_dw.criar_staging) em uma transação e a tabela é trocada pela
+    staging em outra (modelo_dw.publicar_staging). Se algo falhar a staging é apagada e a
+    tabela publicada continua a anterior. Sobras de cargas interrompidas são apagadas antes.
+    """
+    t = tabela_gerenciada(table_name)
+    if t is not None:
+        conferir_frame(df, t)
+    with _transacao(engine) as conn:
+        limpar_staging(conn, table_name)
+    try:
+        with _transacao(engine) as conn:
+            if t is None:
+                LOADERS[strategy](df, nome_staging(table_name), conn, 'replace')
+            else:
+                ts = criar_staging(conn, t, df)
+                LOADERS[strategy](df, ts.name, conn, 'append')
+                if indices_na_staging(conn):
+                    criar_indices(conn, ts)
+        with _transacao(engine) as conn:
+            publicar_staging(conn, table_name, t)
+    except Exception:
+        try:
+            with _transacao(engine) as conn:
+                limpar_staging(conn, table_name)
+        except Exception as e:
+            logging.warning(f"Não foi possível apagar a staging de `{table_name}` ({e}); será apagada na próxima carga.")
+        raise
+
+
+def insert_dataframe(df: pd.DataFrame, table_name: str, engine, if_exists: str = 'replace', strategy: str = None):
+    """
+    Insere um DataFrame no banco (replace por padrão; 'append' para cargas em blocos).
+    engine pode ser uma Connection para a carga entrar em uma transação já aberta.
+    Tabelas do DW com DDL própria (modelo_dw) não são recriadas: ver _carga_gerenciada.
+    'replace' de tabelas do DW passa por staging e troca atômica (_carga_staging, DW_PUBLICACAO).
+    strategy: chave de LOADERS; se omitida usa LOAD_STRATEGY ou a padrão do dialeto
+    (LOAD DATA no MySQL, executemany nos demais).
+    """
+    strategy = strategy or LOAD_STRATEGY or LOADER_POR_DIALETO.get(engine.dialect.name, 'executemany')
+    logging.info(f"Inserindo {len(df)} linhas na tabela `{table_name}` ({strategy})...")
     try:
-        # limpa nomes de colunas para o banco (opcional)
-        df_to_save = df.copy()
+        # limpa nomes de colunas para o banco (opcional); cópia rasa: só os nomes mudam
+        df_to_save = df.copy(deep=False)
         # não forçar lower se preferir manter nomes originais no raw
         df_to_save.columns = df_to_save.columns.str.strip()
-        df_to_save.to_sql(table_name, con=engine, if_exists='replace', index=False, method='multi', chunksize=1000)
+        gerenciada = tabela_gerenciada(table_name)
+        if if_exists == 'replace' and usa_staging(table_name):
+            _carga_staging(df_to_save, table_name, engine, strategy)
+        elif gerenciada is not None:
+            _carga_gerenciada(df_to_save, gerenciada, engine, if_exists, strategy)
+        else:
+            LOADERS[strategy](df_to_save, table_name, engine, if_exists)
         logging.info(f"OK: {table_name}")
     except Exception as e:
         logging.exception(f"Erro ao inserir tabela {table_name}: {e}")
         raise
 
 
-def save_raw_csvs_from_folder(raw_folder: str, engine=ENGINE):
+# Tabelas carregadas em paralelo (1 = sequencial, como antes)
+LOAD_WORKERS = int(os.getenv('LOAD_WORKERS', '4'))
+
+
+def _limpar_incremental(conn, table_name: str, marca):
+    """
+    Antes de uma carga incremental: com `marca`, apaga as linhas acima dela (sobras de uma carga
+    interrompida, com aviso); sem marca é a carga completa inicial e a tabela é esvaziada.
+    """
+    removidas = limpar_acima(conn, table_name, marca)
+    if marca is None:
+        logging.info(f"Carga incremental `{table_name}`: sem marca d'água, carga completa inicial"
+                     + (f" ({removidas} linhas anteriores substituídas)." if removidas else '.'))
+    elif removidas:
+        logging.warning(f"{removidas} linhas acima da marca em `{table_name}` (carga anterior interrompida) removidas.")
+
+
+def append_incremental(df: pd.DataFrame, table_name: str, conn, marca, nova_marca=None) -> int:
+    """
+    Carga incremental de `df` em `table_name` dentro da transação `conn` (ver incremental.py):
+    apaga as linhas acima de `marca` (sobras de uma carga interrompida; sem marca, todas),
+    anexa só as linhas de df acima da marca e grava a nova marca (a maior de df, ou `nova_marca`).
+    Retorna as linhas anexadas.
+    """
+    novas = filtrar_novas(df, marca)
+    _limpar_incremental(conn, table_name, marca)
+    if len(novas) or not inspect(conn).has_table(table_name):
+        insert_dataframe(novas, table_name, conn, if_exists='append')
+    nova_marca = nova_marca if nova_marca is not None else maior_marca(novas[MARCA_COLUNA], marca)
+    if nova_marca is not None:
+        gravar_marca(conn, table_name, nova_marca, len(novas))
+    logging.info(f"Carga incremental `{table_name}`: {len(novas)} linhas novas (marca {MARCA_COLUNA} {marca} -> {nova_marca})")
+    return len(novas)
+
+
+def upsert_dimensao(df: pd.DataFrame, table_name: str, engine, chave: str, modo: str = None) -> int:
+    """
+    Carga de uma dimensão por diferença de hash (ver dimensoes.py), em uma transação:
+    só linhas novas ou alteradas são gravadas e as removidas do CSV saem da tabela
+    (modo 'upsert') ou têm a versão vigente encerrada (modo 'historico').
+    Sem hashes anteriores ou com colunas diferentes das da tabela grava tudo; sem chave única
+    compara a tabela inteira (grava tudo ou nada). etl_hashes precisa existir
+    (garantir_tabela_hashes, feito por load_tables antes de abrir as threads).
+    Retorna as linhas gravadas (0 em um dia sem mudanças).
+    """
+    modo = modo or DIM_MODO
+    historico = modo == 'historico'
+    por_chave = chave_valida(df, chave)
+    agora = agora_carga()
+    hashes = hash_linhas(df)
+    with engine.begin() as conn:
+        anteriores = ler_hashes(conn, table_name)
+        colunas = set(df.columns) | (set(COLUNAS_HISTORICO) if historico and por_chave else set())
+        if not por_chave:
+            chaves, hashes = np.array([CHAVE_TABELA]), np.array([assinatura(hashes)])
+            if anteriores is not None and colunas_tabela(conn, table_name) == colunas and anteriores.get(CHAVE_TABELA) == hashes[0]:
+                logging.info(f"`{table_name}`: sem mudanças.")
+                return 0
+            logging.info(f"`{table_name}`: sem chave {chave} única, conteúdo novo ou alterado; gravando a tabela inteira ({len(df)} linhas).")
+            insert_dataframe(df, table_name, conn)
+            gravar_hashes(conn, table_name, chaves, hashes, substituir=True)
+            return len(df)
+        chaves = df[chave].to_numpy(dtype='int64')
+        if anteriores is None or CHAVE_TABELA in anteriores.index or colunas_tabela(conn, table_name) != colunas:
+            logging.info(f"Dimensão `{table_name}`: carga completa ({len(df)} linhas, modo {modo}).")
+            insert_dataframe(com_vigencia(df, agora) if historico else df, table_name, conn)
+            gravar_hashes(conn, table_name, chaves, hashes, substituir=True)
+            return len(df)
+        posicoes, alteradas, removidas = diferencas(chaves, hashes, anteriores)
+        if not len(posicoes) and not len(removidas):
+            logging.info(f"Dimensão `{table_name}`: sem mudanças.")
+            return 0
+        saem = np.concatenate([alteradas, removidas])
+        if historico:
+            encerrar_versoes(conn, table_name, chave, saem, agora)
+        else:
+            apagar_linhas(conn, table_name, chave, saem)
+        novas = df.take(posicoes)
+        insert_dataframe(com_vigencia(novas, agora) if historico else novas, table_name, conn, if_exists='append')
+        gravar_hashes(conn, table_name, chaves[posicoes], hashes[posicoes])
+        remover_hashes(conn, table_name, removidas)
+        logging.info(f"Dimensão `{table_name}`: {len(posicoes) - len(alteradas)} novas, {len(alteradas)} alteradas, {len(removidas)} removidas.")
+        return len(posicoes)
+
+
+def _carregar_tabela(df: pd.DataFrame, table_name: str, engine, nome_etapa: str, incremental: bool = False, chave: str = None):
+    """
+    insert_dataframe medido como sub-etapa '<nome_etapa>/<tabela>' (ver instrument);
+    append_incremental se `incremental`, upsert_dimensao se a tabela tiver `chave`.
+    """
+    with etapa(f"{nome_etapa}/{table_name}", linhas_entrada=len(df)) as registro:
+        if incremental:
+            with engine.begin() as conn:
+                registro['linhas_saida'] = append_incremental(df, table_name, conn, ler_marcas(conn).get(table_name))
+            return
+        if chave is not None and DIM_MODO != 'substituir':
+            registro['linhas_saida'] = upsert_dimensao(df, table_name, engine, chave)
+            return
+        if chave is not None:
+            with engine.begin() as conn:
+                insert_dataframe(df, table_name, conn)
+                esquecer_hashes(conn, table_name)
+            registro['linhas_saida'] = len(df)
+            return
+        insert_dataframe(df, table_name, engine)
+        registro['linhas_saida'] = len(df)
+
+
+def load_tables(tarefas: dict, engine, workers: int = None, nome_etapa: str = 'carga', incrementais=(), dimensoes=None) -> dict:
+    """
+    Carrega várias tabelas independentes em paralelo, cada uma em sua própria conexão.
+    tarefas: {nome_tabela: DataFrame}
+    incrementais: tabelas carregadas com append_incremental (só linhas acima da marca) em vez de replace
+    dimensoes: {nome_tabela: chave} das tabelas carregadas com upsert_dimensao (ver DIM_MODO)
+    Cada tabela é registrada como etapa '<nome_etapa>/<tabela>' no manifesto da execução.
+    Os workers são limitados ao tamanho do pool de conexões do engine (para nenhuma
+    thread ficar esperando conexão) e as maiores tabelas começam primeiro.
+    Retorna {nome_tabela: exceção} com as tabelas que falharam (vazio se tudo OK).
+    """
+    workers = max(1, min(workers or LOAD_WORKERS, len(tarefas) or 1))
+    tamanho_pool = engine.pool.size() if callable(getattr(engine.pool, 'size', None)) else None
+    if tamanho_pool and workers > tamanho_pool:
+        logging.warning(f"LOAD_WORKERS={workers} maior que o pool de conexões ({tamanho_pool}); usando {tamanho_pool}.")
+        workers = tamanho_pool
+
+    dimensoes = dimensoes or {}
+    if dimensoes:
+        garantir_tabela_hashes(engine)
+    ordem = sorted(tarefas, key=lambda t: len(tarefas[t]), reverse=True)
+    erros = {}
+    if workers == 1:
+        for table in ordem:
+            try:
+                _carregar_tabela(tarefas[table], table, engine, nome_etapa, table in incrementais, dimensoes.get(table))
+            except Exception as e:
+                erros[table] = e
+        return erros
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='carga') as pool:
+        futuros = {pool.submit(_carregar_tabela, tarefas[table], table, engine, nome_etapa, table in incrementais, dimensoes.get(table)): table for table in ordem}
+        for futuro in as_completed(futuros):
+            table = futuros[futuro]
+            try:
+                futuro.result()
+            except Exception as e:
+                erros[table] = e
+    return erros
+
+
+# Nome das tabelas raw por dataset (mantemos sufixo _raw para deixar claro que é a matéria-prima)
+RAW_TABLES = {
+    'empregados': 'empregados_raw',
+    'produtos': 'produtos_raw',
+    'vendas': 'vendas_raw'
+}
+
+
+def save_raw_frames(frames: dict, engine=None, incremental: bool = False, em_blocos=()):
+    """
+    Salva no banco bruto (ENGINE) DataFrames já lidos pela extração, sem reler os CSVs.
+    frames: {'empregados': df, 'produtos': df, 'vendas': df} (chaves ausentes são puladas)
+    incremental: vendas_raw recebe só as vendas acima da sua marca d'água (ver incremental.py)
+    em_blocos: datasets gravados à parte por save_raw_chunks (modo streaming), pulados sem aviso
+    Retorna {tabela: exceção} das cargas que falharam (as falhas são só registradas no log).
+    """
+    logging.info("Salvando dados brutos no banco raw (ENGINE)...")
+    engine = engine or get_engine('raw')
+    tarefas = {}
+    for nome, table in RAW_TABLES.items():
+        if nome in em_blocos:
+            continue
+        if frames.get(nome) is None:
+            logging.warning(f"Dataset '{nome}' não informado (pulando): {table}")
+            continue
+        tarefas[table] = frames[nome]
+    erros = load_tables(tarefas, engine, nome_etapa='raw_load', incrementais=[RAW_TABLES['vendas']] if incremental else (),
+                        dimensoes={RAW_TABLES[nome]: SCHEMAS[nome]['chave'] for nome in ('empregados', 'produtos')})
+    for table, e in erros.items():
+        logging.error(f"Falha na carga raw de `{table}`: {e}")
+    return erros
+
+
+def save_raw_chunks(chunks, table_name: str, engine=None, erros: list = None, incremental: bool = False):
+    """
+    Grava no banco raw cada bloco de um iterador (replace no primeiro, append nos demais)
+    e repassa o bloco adiante. Permite que o mesmo parse do CSV em modo streaming
+    alimente a carga raw e a transformação.
+    incremental: só as linhas acima da marca d'água da tabela são anexadas (sobras de uma
+    carga interrompida são apagadas antes) e a marca avança no fim, se nenhum bloco falhou.
+    Falhas são registradas no log e, se informada, na lista `erros`.
+    """
+    engine = engine or get_engine('raw')
+    if_exists = 'replace'
+    marca = nova_marca = None
+    linhas = 0
+    if incremental:
+        if_exists = 'append'
+        with engine.begin() as conn:
+            marca = nova_marca = ler_marcas(conn).get(table_name)
+            _limpar_incremental(conn, table_name, marca)
+    falhou = False
+    for chunk in chunks:
+        try:
+            novas = filtrar_novas(chunk, marca) if incremental else chunk
+            if len(novas) or if_exists == 'replace':
+                insert_dataframe(novas, table_name, engine, if_exists=if_exists)
+                if_exists = 'append'
+            if incremental:
+                nova_marca = maior_marca(novas[MARCA_COLUNA], nova_marca)
+                linhas += len(novas)
+        except Exception as e:
+            falhou = True
+            logging.exception(f"Erro ao inserir bloco em {table_name}: {e}")
+            if erros is not None:
+                erros.append(e)
+        yield chunk
+    if incremental and not falhou and nova_marca is not None:
+        with engine.begin() as conn:
+            gravar_marca(conn, table_name, nova_marca, linhas)
+        logging.info(f"Carga incremental `{table_name}`: {linhas} linhas novas (marca {MARCA_COLUNA} {marca} -> {nova_marca})")
+
+
+def save_raw_csvs_from_folder(raw_folder: str, engine=None):
     """
     Lê os CSVs brutos e salva no banco bruto (ENGINE).
     Nome das tabelas: empregados_raw, produtos_raw, vendas_raw
-    (mantemos sufixo _raw para deixar claro que é a matéria-prima)
+    No pipeline (main.py) prefira save_raw_frames com os DataFrames do read_raw,
+    para não ler cada CSV duas vezes.
     """
-    logging.info("Salvando CSVs brutos no banco raw (ENGINE)...")
-    mapping = {
-        'empregados.csv': 'empregados_raw',
-        'produtos.csv': 'produtos_raw',
-        'vendas.csv': 'vendas_raw'
-    }
-    for fname, table in mapping.items():
-        csv_path = os.path.join(raw_folder, fname)
+    frames = {}
+    for nome in RAW_TABLES:
+        if nome == 'vendas':
+            # vendas pode estar em vários arquivos (VENDAS_ARQUIVOS), lidos em paralelo
+            try:
+                frames[nome] = ler_vendas(raw_folder)
+            except Exception as e:
+                logging.exception(f"Erro ao ler vendas de {raw_folder}: {e}")
+            continue
+        csv_path = os.path.join(raw_folder, SCHEMAS[nome]['arquivo'])
         if not os.path.exists(csv_path):
             logging.warning(f"Arquivo não encontrado (pulando): {csv_path}")
             continue
         try:
-            df = pd.read_csv(csv_path)
-            insert_dataframe(df, table, engine)
+            frames[nome] = read_csv_tipado(csv_path, nome)
         except Exception as e:
-            logging.exception(f"Erro ao inserir CSV {csv_path} -> {table}: {e}")
+            logging.exception(f"Erro ao ler CSV {csv_path}: {e}")
+    save_raw_frames(frames, engine)
+
 
+# Dimensões do DW e suas chaves (carga por diferença de hash, ver upsert_dimensao)
+DIMENSOES_DW = {'dFuncionarios': 'id_empregado', 'dProdutos': 'id_produto'}
 
-def save_transformed_to_dw(resumo_dict: dict, engine=ENGINEDW):
+# Tabelas do DW com carga incremental (CARGA_MODO=incremental): fatos recebem só as vendas
+# acima da marca; os agregados são somados aos já carregados (transform.mesclar_kpis)
+FATOS_INCREMENTAIS = {'fVendas': 'fVendas', 'resumo': 'resumo_vendas'}
+AGREGADOS_INCREMENTAIS = {'total_por_func': 'total_por_func', 'ticket_por_prod': 'ticket_por_prod',
+                          'vendas_por_categoria': 'vendas_por_categoria', 'top5': 'top5_func'}
+
+
+def tabelas_incrementais_dw(granular: bool = True) -> list:
+    """Tabelas do DW com marca d'água; sem `granular` (modo streaming) só os agregados."""
+    return (list(FATOS_INCREMENTAIS.values()) if granular else []) + list(AGREGADOS_INCREMENTAIS.values())
+
+
+def marca_dw(granular: bool = True, engine=None):
+    """Marca d'água comum das tabelas incrementais do DW (None = ainda sem carga incremental)."""
+    engine = engine or get_engine('dw')
+    with engine.connect() as conn:
+        return marca_comum(ler_marcas(conn), tabelas_incrementais_dw(granular))
+
+
+def _carga_incremental_dw(tarefas: dict, engine, marca, nova_marca):
+    """
+    Fatos e agregados do DW em uma única transação: fatos anexados acima de `marca`,
+    agregados somados aos do DW (sem marca: substituídos) e marcas avançadas para `nova_marca`.
+    As tabelas carregadas aqui saem de `tarefas`; as demais (dimensões) seguem para load_tables.
+    Uma carga que falha não deixa nada pela metade: a próxima recomeça da mesma marca.
+    """
+    fatos = {t: tarefas.pop(t) for t in FATOS_INCREMENTAIS.values() if t in tarefas}
+    agregados = {k: t for k, t in AGREGADOS_INCREMENTAIS.items() if t in tarefas}
+    delta = {k: tarefas.pop(t) for k, t in agregados.items()}
+    with etapa('dw_load/incremental', linhas_entrada=sum(len(df) for df in fatos.values())) as registro, engine.begin() as conn:
+        atual = marca_comum(ler_marcas(conn), list(fatos) + list(agregados.values()))
+        if atual != marca:
+            raise RuntimeError(f"Marca d'água do DW mudou durante a execução ({marca} -> {atual}); rode o pipeline de novo.")
+        registro['linhas_saida'] = sum(append_incremental(df, t, conn, marca, nova_marca) for t, df in fatos.items())
+        if not agregados:
+            return
+        existentes = {k: t for k, t in agregados.items() if marca is not None and inspect(conn).has_table(t)}
+        carregados = {k: pd.read_sql_table(t, conn) for k, t in existentes.items()}
+        mesclados = mesclar_kpis(carregados, delta)
+        for key, table in agregados.items():
+            limpar_acima(conn, table, None)
+            insert_dataframe(mesclados[key], table, conn, if_exists='append')
+            if nova_marca is not None:
+                gravar_marca(conn, table, nova_marca, len(delta[key]))
+
+
+def save_transformed_to_dw(resumo_dict: dict, engine=None, incremental: bool = False, marca=None, nova_marca=None):
     """
     Salva os DataFrames transformados no DW.
     As chaves esperadas em resumo_dict (conforme seu transform.py):
@@ -63,8 +521,11 @@ def save_transformed_to_dw(resumo_dict: dict, engine=ENGINEDW):
       - 'ticket_por_prod' -> tabela 'ticket_por_prod'
       - 'vendas_por_categoria' -> 'vendas_por_categoria'
       - 'top5' -> 'top5_func'
+    incremental: fatos e agregados carregados por marca d'água (ver _carga_incremental_dw);
+    resumo_dict tem só as vendas acima de `marca` e `nova_marca` é a maior delas.
     """
     logging.info("Salvando dados transformados no Data Warehouse (ENGINEDW)...")
+    engine = engine or get_engine('dw')
     mapping = {
         'dProdutos': 'dProdutos',
         'dFuncionarios': 'dFuncionarios',
@@ -76,25 +537,35 @@ def save_transformed_to_dw(resumo_dict: dict, engine=ENGINEDW):
         'top5': 'top5_func'
     }
 
+    tarefas = {}
     for key, table in mapping.items():
         if key not in resumo_dict or resumo_dict[key] is None:
             logging.info(f"Chave '{key}' não encontrada em resumo_dict — pulando `{table}`.")
             continue
-        df = resumo_dict[key].copy()
+        # cópia rasa: renomear colunas e trocar 'data' não altera o frame original
+        df = resumo_dict[key].copy(deep=False)
         # normalizar nomes (opcional) para DW: lower_case, sem espaços
         df.columns = df.columns.str.strip().str.lower().str.replace(' ', '_')
         # converter datetimes para formato compatível (se existir coluna 'data')
-        if 'data' in df.columns:
+        if 'data' in df.columns and not is_datetime64_any_dtype(df['data']):
             try:
                 df['data'] = pd.to_datetime(df['data'], errors='coerce')
             except Exception:
                 pass
-        insert_dataframe(df, table, engine)
+        tarefas[table] = df
+
+    if incremental:
+        _carga_incremental_dw(tarefas, engine, marca, nova_marca)
+    erros = load_tables(tarefas, engine, nome_etapa='dw_load', dimensoes=DIMENSOES_DW)
+    if erros:
+        for table, e in erros.items():
+            logging.error(f"Falha na carga do DW em `{table}`: {e}")
+        raise RuntimeError(f"Carga do DW falhou em {len(erros)} tabela(s): {', '.join(sorted(erros))}")
 
 
 # execução standalone para facilitar testes locais (opcional)
 if __name__ == "__main__":
     logging.info("Executando inserirbanco.py em modo standalone (ler CSVs e inserir no DB raw ENGINE).")
     raw_folder = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'arquivos_teste_dados_bus2'))
-    save_raw_csvs_from_folder(raw_folder, engine=ENGINE)
+    save_raw_csvs_from_folder(raw_folder)
     logging.info("Modo standalone finalizado.")
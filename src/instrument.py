@@ -0,0 +1,283 @@
+# src/instrument.py
+"""
+Instrumentação das etapas do pipeline e manifesto da execução.
+
+    execucao = iniciar('outputs/runs', perfis='transform,pdf')
+    with etapa('transform', linhas_entrada=len(vendas)) as registro:
+        ...
+        registro['linhas_saida'] = len(resumo)
+    finalizar('ok')   # grava outputs/runs/<run_id>.json
+
+Cada etapa registra tempo de parede, tempo de CPU, pico de RSS, linhas de entrada/saída e
+bytes gravados (preenchidos pelo chamador no dict `registro`). Etapas de topo registram o
+pico de RSS e o cProfile em qualquer thread (com PIPELINE_WORKERS > 1 cada uma roda em uma
+thread do dag.Agendador): o RSS é amostrado por uma thread só para o processo inteiro, e
+com etapas simultâneas o pico de cada uma inclui a memória das outras. Fora da thread
+principal o CPU e o perfil são os da thread da etapa. Etapas aninhadas (dentro de outra na
+mesma thread, ou com '/' no nome, ex.: uma tabela dentro das cargas paralelas) registram
+só tempo, CPU da thread e linhas.
+Sem execução iniciada as etapas são medidas e descartadas (ex.: funções usadas fora do main).
+"""
+import cProfile
+import json
+import logging
+import os
+import platform
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _rss():
+    """RSS atual do processo em bytes (Linux: /proc; demais: pico do processo via resource)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        if resource is None:
+            return 0
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return pico if sys.platform == 'darwin' else pico * 1024
+
+
+def _cpu_filhos():
+    """CPU (s) dos processos filhos já encerrados (ex.: workers do PDF)."""
+    if resource is None:
+        return 0.0
+    uso = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return uso.ru_utime + uso.ru_stime
+
+
+class _AmostradorRSS:
+    """
+    Uma thread por processo amostrando o RSS para todos os MedidorRecursos ativos (etapas
+    simultâneas em threads diferentes), no menor intervalo entre eles; para sem medidores.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ativos = set()
+        self._parar = None
+
+    def registrar(self, medidor):
+        with self._lock:
+            self._ativos.add(medidor)
+            if self._parar is None:
+                self._parar = threading.Event()
+                threading.Thread(target=self._amostrar, args=(self._parar,), daemon=True, name='amostrador-rss').start()
+
+    def remover(self, medidor):
+        with self._lock:
+            self._ativos.discard(medidor)
+            if not self._ativos and self._parar is not None:
+                self._parar.set()
+                self._parar = None
+
+    def _amostrar(self, parar):
+        while True:
+            with self._lock:
+                intervalo = min((m.intervalo for m in self._ativos), default=0.05)
+            if parar.wait(intervalo):
+                return
+            rss = _rss()
+            with self._lock:
+                for medidor in self._ativos:
+                    medidor.pico = max(medidor.pico, rss)
+
+
+_AMOSTRADOR = _AmostradorRSS()
+
+
+class MedidorRecursos:
+    """
+    Tempo de parede, CPU e pico de RSS durante um bloco `with`.
+    O RSS do processo é amostrado a cada `intervalo` segundos (_AmostradorRSS); com
+    memoria=False (etapas aninhadas) mede só tempo e CPU da própria thread. O CPU é o do
+    processo na thread principal e o da thread nas demais (etapas paralelas do agendador).
+    """
+
+    def __init__(self, memoria=True, intervalo=0.05):
+        self.memoria = memoria
+        self.intervalo = intervalo
+
+    def __enter__(self):
+        principal = threading.current_thread() is threading.main_thread()
+        self._cpu = time.process_time if self.memoria and principal else time.thread_time
+        self.inicio = self.pico = _rss() if self.memoria else 0
+        if self.memoria:
+            _AMOSTRADOR.registrar(self)
+        self.cpu0 = self._cpu()
+        self.cpu_filhos0 = _cpu_filhos() if self.memoria else 0.0
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.segundos = time.perf_counter() - self.t0
+        self.cpu = self._cpu() - self.cpu0
+        self.cpu_filhos = (_cpu_filhos() - self.cpu_filhos0) if self.memoria else 0.0
+        if self.memoria:
+            _AMOSTRADOR.remover(self)
+            self.pico = max(self.pico, _rss())
+        return False
+
+
+def tamanho_em_disco(path):
+    """Bytes de um arquivo ou do total de uma pasta (0 se não existir)."""
+    if not path or not os.path.exists(path):
+        return 0
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(raiz, nome)) for raiz, _, nomes in os.walk(path) for nome in nomes)
+
+
+class Execucao:
+    """Registro de uma execução do pipeline: etapas medidas + metadados, salvo em JSON."""
+
+    def __init__(self, saida_dir=None, perfis=None, metadados=None, guardar=True):
+        self.run_id = time.strftime('%Y%m%d-%H%M%S') + f'-{os.getpid()}'
+        self.saida_dir = saida_dir
+        # perfis: nomes de etapas separados por vírgula (ou 'all') para gravar cProfile
+        self.perfis = {p.strip() for p in (perfis or '').split(',') if p.strip()}
+        self.metadados = dict(metadados or {})
+        self.inicio = time.strftime('%Y-%m-%dT%H:%M:%S')
+        self.t0 = time.perf_counter()
+        self.etapas = []
+        self.guardar = guardar
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _perfilar(self, nome):
+        return self.saida_dir and ('all' in self.perfis or nome in self.perfis or nome.split('/')[0] in self.perfis)
+
+    def etapa(self, nome, linhas_entrada=None, **extra):
+        return _Etapa(self, nome, linhas_entrada, extra)
+
+    def pular(self, nome, motivo='cache'):
+        """Registra uma etapa que não rodou (ex.: saída reaproveitada do cache)."""
+        with self._lock:
+            self.etapas.append({'etapa': nome, 'status': 'pulada', 'motivo': motivo})
+
+    def manifesto(self, status):
+        return {
+            'run_id': self.run_id,
+            'inicio': self.inicio,
+            'fim': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'duracao_s': round(time.perf_counter() - self.t0, 3),
+            'status': status,
+            'python': platform.python_version(),
+            'pid': os.getpid(),
+            **self.metadados,
+            'etapas': self.etapas,
+        }
+
+    def salvar(self, status='ok'):
+        """Grava <saida_dir>/<run_id>.json e retorna o caminho (None sem saida_dir)."""
+        if not self.saida_dir:
+            return None
+        os.makedirs(self.saida_dir, exist_ok=True)
+        path = os.path.join(self.saida_dir, f'{self.run_id}.json')
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.manifesto(status), f, indent=2, ensure_ascii=False, default=str)
+        os.replace(path + '.tmp', path)
+        return path
+
+
+class _Etapa:
+    """Context manager de uma etapa: mede, opcionalmente perfila e anexa o registro à execução."""
+
+    def __init__(self, execucao, nome, linhas_entrada, extra):
+        self.execucao = execucao
+        self.registro = {'etapa': nome, 'status': 'ok', 'linhas_entrada': linhas_entrada,
+                         'linhas_saida': None, 'bytes_gravados': None, **extra}
+
+    def __enter__(self):
+        local = self.execucao._local
+        self.nivel = getattr(local, 'nivel', 0)
+        local.nivel = self.nivel + 1
+        # etapa de topo (em qualquer thread: as do agendador também) mede o processo; as
+        # aninhadas só a própria thread
+        nome = self.registro['etapa']
+        topo = self.nivel == 0 and '/' not in nome
+        self.medidor = MedidorRecursos(memoria=topo).__enter__()
+        self.perfil = None
+        if topo and self.execucao._perfilar(nome):
+            # o cProfile perfila só a thread que o habilita: um por etapa, na thread dela
+            perfil = cProfile.Profile()
+            try:
+                perfil.enable()
+                self.perfil = perfil
+            except ValueError as e:  # outro perfil ativo (Python 3.12+: um por processo)
+                logging.warning(f"Etapa {nome}: perfil não gravado ({e})")
+        self.registro['inicio'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+        return self.registro
+
+    def __exit__(self, tipo, erro, tb):
+        if self.perfil is not None:
+            self.perfil.disable()
+        self.medidor.__exit__(tipo, erro, tb)
+        self.execucao._local.nivel = self.nivel
+        r = self.registro
+        r['duracao_s'] = round(self.medidor.segundos, 3)
+        r['cpu_s'] = round(self.medidor.cpu, 3)
+        if self.medidor.memoria:
+            r['cpu_filhos_s'] = round(self.medidor.cpu_filhos, 3)
+            r['rss_inicio_mb'] = round(self.medidor.inicio / 1024**2, 1)
+            r['rss_pico_mb'] = round(self.medidor.pico / 1024**2, 1)
+        if erro is not None:
+            r['status'] = 'erro'
+            r['erro'] = f"{tipo.__name__}: {erro}"
+        if self.perfil is not None:
+            pasta = os.path.join(self.execucao.saida_dir, self.execucao.run_id)
+            os.makedirs(pasta, exist_ok=True)
+            r['perfil'] = os.path.join(pasta, r['etapa'].replace('/', '_') + '.prof')
+            self.perfil.dump_stats(r['perfil'])
+        if self.execucao.guardar:
+            with self.execucao._lock:
+                self.execucao.etapas.append(r)
+        logging.info(f"Etapa {r['etapa']}: {r['duracao_s']:.2f}s"
+                     + (f", pico RSS {r['rss_pico_mb']:.0f} MB" if 'rss_pico_mb' in r else '')
+                     + (f", {r['linhas_saida']} linhas" if r['linhas_saida'] is not None else ''))
+        return False
+
+
+# Execução ativa (uma por processo); sem ela as etapas vão para uma execução descartável
+_ATUAL = None
+_DESCARTE = Execucao(guardar=False)
+
+
+def iniciar(saida_dir, perfis=None, **metadados):
+    """Inicia a execução ativa; o manifesto vai para `saida_dir` em finalizar()."""
+    global _ATUAL
+    _ATUAL = Execucao(saida_dir, perfis, metadados)
+    return _ATUAL
+
+
+def atual():
+    return _ATUAL
+
+
+def etapa(nome, linhas_entrada=None, **extra):
+    """Mede uma etapa na execução ativa (ver módulo). Uso: `with etapa('nome') as registro:`."""
+    return (_ATUAL or _DESCARTE).etapa(nome, linhas_entrada, **extra)
+
+
+def pular(nome, motivo='cache'):
+    if _ATUAL is not None:
+        _ATUAL.pular(nome, motivo)
+
+
+def finalizar(status='ok'):
+    """Grava o manifesto da execução ativa e a encerra; retorna o caminho do JSON."""
+    global _ATUAL
+    if _ATUAL is None:
+        return None
+    path = _ATUAL.salvar(status)
+    _ATUAL = None
+    if path:
+        logging.info(f"Manifesto da execução: {path}")
+    return path
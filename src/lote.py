@@ -0,0 +1,212 @@
+# src/lote.py
+"""
+Modo em lote: o pipeline completo (extract → transform → parquet → PDF → DW) para várias
+pastas de CSVs (uma por loja ou período), cada pasta em um processo de um pool.
+
+    python src/lote.py 'dados/lojas/*' --workers 4
+    python src/lote.py dados/loja_a dados/loja_b --saida /tmp/lotes
+
+Cada pasta grava em <saida>/<nome da pasta>/ (parquet, PDF, quarentena, cache, manifestos em
+runs/ e o log completo em pipeline.log) e carrega seus próprios bancos: LOTE_DB_URL_RAW e
+LOTE_DB_URL_DW com {pasta} no lugar do nome (ex.: mysql+pymysql://u:s@host/dw_{pasta});
+sem elas, um SQLite raw.db / dw.db dentro da pasta de saída. Ao fim <saida>/resumo-lote.json
+reúne status, duração por etapa e erro de cada pasta; o código de saída é 1 se alguma falhou.
+
+O paralelismo fica entre as pastas: dentro de cada processo a leitura de vendas e as páginas
+do PDF não abrem processos próprios (EXTRACT_WORKERS / REPORT_WORKERS = 1, se não definidos).
+"""
+import argparse
+import glob
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from instrument import tamanho_em_disco
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+# Processos do lote, um por pasta em andamento (0 = um por núcleo)
+LOTE_WORKERS = int(os.getenv('LOTE_WORKERS', '0'))
+# Bancos de cada pasta: URL com {pasta} (nome da pasta de saída); vazio = SQLite na pasta de saída
+LOTE_DB_URL_RAW = os.getenv('LOTE_DB_URL_RAW', '')
+LOTE_DB_URL_DW = os.getenv('LOTE_DB_URL_DW', '')
+
+ARQUIVO_RESUMO = 'resumo-lote.json'
+
+
+def listar_pastas(padroes):
+    """Pastas de `padroes` (caminhos ou globs), sem repetição e na ordem em que aparecem."""
+    pastas = []
+    for padrao in padroes:
+        encontradas = sorted(glob.glob(padrao)) if glob.has_magic(padrao) else [padrao]
+        for pasta in encontradas:
+            pasta = os.path.abspath(pasta)
+            if os.path.isdir(pasta) and pasta not in pastas:
+                pastas.append(pasta)
+    if not pastas:
+        raise ValueError(f"Nenhuma pasta encontrada em {list(padroes)}")
+    return pastas
+
+
+def nomes_saida(pastas):
+    """
+    Nome da pasta de saída de cada pasta: o nome da própria pasta ou, se dois se repetirem
+    (ex.: loja_a/2024 e loja_b/2024), o caminho a partir do ancestral comum ('loja_a__2024').
+    """
+    nomes = [os.path.basename(p) for p in pastas]
+    if len(set(nomes)) == len(nomes):
+        return nomes
+    comum = os.path.commonpath(pastas)
+    return [os.path.relpath(p, comum).replace(os.sep, '__') for p in pastas]
+
+
+def _url(modelo, nome, saida, arquivo):
+    if not modelo:
+        return f"sqlite:///{os.path.join(saida, arquivo)}"
+    return modelo.replace('{pasta}', nome)
+
+
+def _conferir_urls(quantidade):
+    """Um modelo de URL sem {pasta} faria todas as pastas gravarem (e substituírem) as mesmas tabelas."""
+    for variavel, modelo in (('LOTE_DB_URL_RAW', LOTE_DB_URL_RAW), ('LOTE_DB_URL_DW', LOTE_DB_URL_DW)):
+        if modelo and '{pasta}' not in modelo and quantidade > 1:
+            raise ValueError(f"{variavel} precisa de {{pasta}} no lote (ex.: .../dw_{{pasta}}): as pastas gravariam nas mesmas tabelas")
+
+
+def _inicializar():
+    """Processo do lote: sem pools de processos aninhados (o paralelismo é entre pastas)."""
+    os.environ.setdefault('EXTRACT_WORKERS', '1')
+    os.environ.setdefault('REPORT_WORKERS', '1')
+
+
+def _configurar_log(nome, saida):
+    """Log completo da pasta em <saida>/pipeline.log; no terminal só avisos, com o nome da pasta."""
+    raiz = logging.getLogger()
+    for handler in raiz.handlers:
+        handler.setLevel(logging.WARNING)
+        handler.setFormatter(logging.Formatter(f'[{nome}] %(levelname)s: %(message)s'))
+    arquivo = logging.FileHandler(os.path.join(saida, 'pipeline.log'), mode='w', encoding='utf-8')
+    arquivo.setFormatter(logging.Formatter('%(asctime)s %(levelname)s: %(message)s'))
+    raiz.addHandler(arquivo)
+    # traceback de uma falha só no arquivo: o terminal já recebe a linha do resumo do lote
+    logging.getLogger('lote.pasta').handlers = [arquivo]
+    logging.getLogger('lote.pasta').propagate = False
+    return arquivo
+
+
+def _etapas(saida):
+    """Duração das etapas de topo no manifesto mais recente de <saida>/runs (vazio se não houver)."""
+    manifestos = glob.glob(os.path.join(saida, 'runs', '*.json'))
+    if not manifestos:
+        return {}
+    path = max(manifestos, key=os.path.getmtime)
+    with open(path, encoding='utf-8') as f:
+        manifesto = json.load(f)
+    etapas = {e['etapa']: e['duracao_s'] for e in manifesto['etapas'] if '/' not in e['etapa'] and 'duracao_s' in e}
+    return {'manifesto': path, 'etapas': etapas}
+
+
+def rodar_pasta(pasta, nome, saida):
+    """Executado no processo do lote: pipeline de uma pasta, com bancos e saídas próprios."""
+    # importado aqui, depois de _inicializar: as constantes dos módulos leem o ambiente na importação
+    import main as pipeline
+    from config import set_engine
+
+    os.makedirs(saida, exist_ok=True)
+    arquivo_log = _configurar_log(nome, saida)
+    set_engine('raw', _url(LOTE_DB_URL_RAW, nome, saida, 'raw.db'))
+    set_engine('dw', _url(LOTE_DB_URL_DW, nome, saida, 'dw.db'))
+    resultado = {'pasta': pasta, 'nome': nome, 'saida': saida, 'status': 'erro', 'etapa_falha': None, 'erro': None}
+    inicio = time.perf_counter()
+    try:
+        resultado['status'] = pipeline.main(pasta, saida)
+    except Exception as e:
+        resultado['etapa_falha'] = getattr(e, 'etapa', None)
+        resultado['erro'] = f"{type(e).__name__}: {e}"
+        logging.getLogger('lote.pasta').exception(f"Pipeline falhou para {pasta}: {e}")
+    finally:
+        logging.getLogger().removeHandler(arquivo_log)
+        arquivo_log.close()
+    resultado['segundos'] = round(time.perf_counter() - inicio, 3)
+    resultado.update(_etapas(saida))
+    return resultado
+
+
+def rodar_lote(padroes, saida_dir, workers=None):
+    """
+    Roda o pipeline para cada pasta de `padroes` (ver listar_pastas) em um pool de processos
+    (workers, ou LOTE_WORKERS; 0 = um por núcleo), as maiores pastas primeiro.
+    Grava e retorna o resumo do lote (ver módulo); falhas de uma pasta não param as outras.
+    """
+    pastas = listar_pastas(padroes)
+    _conferir_urls(len(pastas))
+    saidas = dict(zip(pastas, (os.path.join(saida_dir, n) for n in nomes_saida(pastas))))
+    workers = max(1, min(workers or LOTE_WORKERS or os.cpu_count() or 1, len(pastas)))
+    ordem = sorted(pastas, key=tamanho_em_disco, reverse=True)
+    logging.info(f"Lote: {len(pastas)} pastas em {workers} processos; saídas em {saida_dir}")
+
+    inicio = time.perf_counter()
+    resultados = {}
+    contexto = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=contexto, initializer=_inicializar) as pool:
+        futuros = {pool.submit(rodar_pasta, p, os.path.basename(saidas[p]), saidas[p]): p for p in ordem}
+        for futuro in as_completed(futuros):
+            pasta = futuros[futuro]
+            try:
+                r = futuro.result()
+            except Exception as e:
+                # processo do lote morreu (ex.: falta de memória): o pool para e as pastas ainda
+                # pendentes recebem o mesmo erro; as já concluídas ficam no resumo
+                r = {'pasta': pasta, 'nome': os.path.basename(saidas[pasta]), 'saida': saidas[pasta], 'status': 'erro',
+                     'etapa_falha': None, 'erro': f"{type(e).__name__}: {e}"}
+            resultados[pasta] = r
+            if r['status'] == 'erro':
+                logging.error(f"{r['nome']}: falhou" + (f" na etapa {r['etapa_falha']}" if r['etapa_falha'] else '') + f" ({r['erro']})")
+            else:
+                logging.info(f"{r['nome']}: {r['status']} em {r.get('segundos', 0):.1f}s")
+
+    total = time.perf_counter() - inicio
+    lista = [resultados[p] for p in pastas]
+    etapas_total = {}
+    for r in lista:
+        for nome, segundos in r.get('etapas', {}).items():
+            etapas_total[nome] = round(etapas_total.get(nome, 0) + segundos, 3)
+    soma = sum(r.get('segundos', 0) for r in lista)
+    resumo = {
+        'inicio': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(time.time() - total)),
+        'duracao_s': round(total, 3),
+        'soma_execucoes_s': round(soma, 3),
+        'workers': workers,
+        'pastas': len(lista),
+        'ok': sum(r['status'] != 'erro' for r in lista),
+        'falhas': sum(r['status'] == 'erro' for r in lista),
+        'etapas_total_s': etapas_total,
+        'execucoes': lista,
+    }
+    os.makedirs(saida_dir, exist_ok=True)
+    path = os.path.join(saida_dir, ARQUIVO_RESUMO)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(resumo, f, indent=2, ensure_ascii=False, default=str)
+    os.replace(path + '.tmp', path)
+    logging.info(f"Lote: {resumo['ok']} ok, {resumo['falhas']} com falha em {total:.1f}s "
+                 f"(soma das execuções {soma:.1f}s, {workers} processos); resumo em {path}")
+    return resumo
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pipeline ETL para várias pastas de CSVs em paralelo')
+    base = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    parser.add_argument('pastas', nargs='+', help="pastas de CSVs ou globs (ex.: 'dados/lojas/*')")
+    parser.add_argument('--workers', type=int, default=LOTE_WORKERS, help='processos (0 = um por núcleo)')
+    parser.add_argument('--saida', default=os.path.join(base, 'outputs', 'lotes'), help='pasta das saídas por pasta e do resumo')
+    args = parser.parse_args()
+    resumo = rodar_lote(args.pastas, os.path.abspath(args.saida), args.workers)
+    sys.exit(1 if resumo['falhas'] else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,39 +1,281 @@
 # src/main.py
-import logging, os
-from extract import read_raw
-from transform import transform_data
-from report import save_parquet, build_pdf
-from inserirbanco import save_raw_csvs_from_folder, save_transformed_to_dw
+import contextlib, logging, os
+import pandas as pd
+from extract import read_raw, listar_arquivos_vendas
+from transform import transform_data, transform_data_stream
+from report import save_parquet, save_parquet_dataset, build_pdf, CHAVES_PDF, ParquetAppender, ParquetDatasetAppender
+from inserirbanco import RAW_TABLES, LOAD_STRATEGY, save_raw_frames, save_raw_chunks, save_transformed_to_dw, marca_dw
+from dimensoes import DIM_MODO
+from modelo_dw import DW_DDL, DW_PUBLICACAO
+from incremental import CARGA_MODO, MARCA_COLUNA, filtrar_novas, filtrar_ate, filtrar_blocos, maior_marca
+from config import dispose_engines, get_engine
+from cache import StageCache, fingerprint, code_version
+from schema import SCHEMAS
+import instrument
+from instrument import etapa, tamanho_em_disco
+from dag import Agendador, PIPELINE_WORKERS
 
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 
-def main():
+# Tamanho do bloco de vendas.csv no modo streaming (0 = ler o arquivo inteiro)
+VENDAS_CHUNKSIZE = int(os.getenv('VENDAS_CHUNKSIZE', '0'))
+# Parser dos CSVs: vazio = padrão do pandas, 'pyarrow' = parser multithread do pyarrow
+CSV_ENGINE = os.getenv('CSV_ENGINE') or None
+# Cache de estágios: 'stat' (tamanho+mtime), 'hash' (conteúdo) ou 'off'
+CACHE_MODE = os.getenv('CACHE_MODE', 'stat')
+# Tamanho máximo da pasta outputs/.cache (MB)
+CACHE_MAX_MB = int(os.getenv('CACHE_MAX_MB', '2048'))
+# Saída Parquet: 'arquivo' (outputs/resumo-vendas.parquet) ou 'particionado'
+# (outputs/resumo-vendas/ano=AAAA/mes=MM/, regravando só os meses alterados)
+PARQUET_LAYOUT = os.getenv('PARQUET_LAYOUT', 'arquivo')
+# Etapas perfiladas com cProfile (separadas por vírgula, ou 'all'); os .prof vão para outputs/runs/<run_id>/
+PROFILE_STAGES = os.getenv('PROFILE_STAGES', '')
+# Vendas reprovadas na validação (ver validacao.py): '0' = só copiadas para
+# outputs/quarentena-vendas.parquet; '1' = também removidas do resumo, dos KPIs e do DW
+QUARENTENA_REMOVER = os.getenv('QUARENTENA_REMOVER', '0') == '1'
+# Copy-on-write do pandas (padrão no pandas 3): as etapas compartilham colunas entre frames
+# sem cópias defensivas; a cópia só acontece se alguém alterar uma coluna compartilhada.
+# Vale só durante main() (ver _copy_on_write), não para quem apenas importa este módulo
+COPY_ON_WRITE = os.getenv('COPY_ON_WRITE', '1') == '1'
+
+def _copy_on_write():
+    """Contexto com o copy-on-write de COPY_ON_WRITE (no pandas 3 ele é sempre ligado)."""
+    if int(pd.__version__.split('.')[0]) >= 3:
+        return contextlib.nullcontext()
+    return pd.option_context('mode.copy_on_write', COPY_ON_WRITE)
+
+def _contar_linhas(chunks, registro):
+    """Repassa os blocos somando as linhas lidas em registro['linhas_entrada']."""
+    registro['linhas_entrada'] = 0
+    for chunk in chunks:
+        registro['linhas_entrada'] += len(chunk)
+        yield chunk
+
+def _remover_quarentena(path):
+    """Apaga a quarentena de uma execução anterior (ela reflete só as entradas atuais)."""
+    if os.path.exists(path):
+        os.remove(path)
+
+def main(raw_folder=None, outputs_dir=None):
+    """
+    Roda o pipeline para os CSVs de `raw_folder` gravando as saídas em `outputs_dir`
+    (padrão: arquivos_teste_dados_bus2 e outputs/ na raiz do projeto; várias pastas de uma
+    vez: lote.py). Retorna o status da execução ('ok' ou 'cache').
+    """
     logging.info("Iniciando pipeline ETL local")
 
     base = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-    raw_folder = os.path.join(base, 'arquivos_teste_dados_bus2')
-    outputs_dir = os.path.join(base, 'outputs')
+    raw_folder = raw_folder or os.path.join(base, 'arquivos_teste_dados_bus2')
+    outputs_dir = outputs_dir or os.path.join(base, 'outputs')
     os.makedirs(outputs_dir, exist_ok=True)
 
-    # 0) Persistir CSVs brutos no banco raw (ENGINE)
-    save_raw_csvs_from_folder(raw_folder)
-
-    # 1) Extração
-    emp, prod, vendas = read_raw(raw_folder)
+    # Manifesto da execução (tempo, CPU, memória, linhas e bytes por etapa) em outputs/runs/
+    instrument.iniciar(os.path.join(outputs_dir, 'runs'), perfis=PROFILE_STAGES, versao_codigo=code_version(),
+                       raw_folder=raw_folder,
+                       config={'VENDAS_CHUNKSIZE': VENDAS_CHUNKSIZE, 'CSV_ENGINE': CSV_ENGINE, 'CACHE_MODE': CACHE_MODE,
+                               'PARQUET_LAYOUT': PARQUET_LAYOUT, 'COPY_ON_WRITE': COPY_ON_WRITE,
+                               'PIPELINE_WORKERS': PIPELINE_WORKERS, 'QUARENTENA_REMOVER': QUARENTENA_REMOVER,
+                               'CARGA_MODO': CARGA_MODO, 'MARCA_COLUNA': MARCA_COLUNA})
+    status = 'erro'
+    try:
+        with _copy_on_write():
+            status = _pipeline(raw_folder, outputs_dir)
+    finally:
+        instrument.finalizar(status)
+    return status
 
-    # 2) Transformação
-    resumo_dict = transform_data(emp, prod, vendas)
+def _pipeline(raw_folder, outputs_dir):
+    """Etapas do pipeline; retorna o status da execução ('ok' ou 'cache')."""
+    particionado = PARQUET_LAYOUT == 'particionado'
+    # Carga incremental: só vendas acima da marca d'água do DW são transformadas (ver incremental.py);
+    # Parquet (arquivo único), PDF e quarentena passam a descrever só as vendas novas desta carga.
+    # No Parquet particionado as vendas novas se juntam às já publicadas nos meses que tocam
+    incremental = CARGA_MODO == 'incremental'
 
-    # 3) Saídas locais (parquet + pdf)
-    parquet_path = os.path.join(outputs_dir, 'resumo-vendas.parquet')
+    def manter_publicadas():
+        # linhas já publicadas até a marca (as acima dela são sobras de uma carga interrompida)
+        return (lambda existentes: filtrar_ate(existentes, dados['marca'])) if incremental else None
+    parquet_path = os.path.join(outputs_dir, 'resumo-vendas' if particionado else 'resumo-vendas.parquet')
     pdf_path = os.path.join(outputs_dir, 'relatorio-preliminar.pdf')
-    save_parquet(resumo_dict['resumo'], parquet_path)
-    build_pdf(resumo_dict, pdf_path)
+    quarentena_path = os.path.join(outputs_dir, 'quarentena-vendas.parquet')
+
+    # Cache: estágios já concluídos para as mesmas entradas (CSVs + código + opções + bancos de
+    # destino) são pulados; outro DB_URL_RAW / DB_URL_DW é outra chave (URL sem a senha), assim
+    # como as opções de carga que mudam o que fica no banco (DIM_MODO, DW_DDL, DW_PUBLICACAO, LOAD_STRATEGY)
+    # (vendas pode vir de vários arquivos: VENDAS_ARQUIVOS, ver extract.listar_arquivos_vendas)
+    arquivos_vendas = listar_arquivos_vendas(raw_folder)
+    entradas = [os.path.join(raw_folder, SCHEMAS[nome]['arquivo']) for nome in ('empregados', 'produtos')] + arquivos_vendas
+    chave = fingerprint(entradas, modo=CACHE_MODE, extra={'chunksize': VENDAS_CHUNKSIZE, 'parquet': PARQUET_LAYOUT, 'quarentena_remover': QUARENTENA_REMOVER,
+                                                                 'carga': CARGA_MODO, 'marca': MARCA_COLUNA, 'dim_modo': DIM_MODO, 'dw_ddl': DW_DDL,
+                                                                 'dw_publicacao': DW_PUBLICACAO, 'load_strategy': LOAD_STRATEGY,
+                                                                 'bancos': {n: get_engine(n).url.render_as_string(hide_password=True) for n in ('raw', 'dw')}}) if CACHE_MODE != 'off' else None
+    cache = StageCache(os.path.join(outputs_dir, '.cache'), chave, max_bytes=CACHE_MAX_MB * 1024**2)
+    instrument.atual().metadados['cache_key'] = chave
+    estagios = ['raw', 'transform', 'parquet', 'pdf', 'dw']
+    if all(cache.done(e) for e in estagios):
+        logging.info(f"Entradas inalteradas (cache {chave}): nada a fazer.")
+        return 'cache'
+
+    # Com a carga raw já feita, o transform pode vir do cache sem reler os CSVs
+    # (no modo streaming o resumo granular não fica no cache: o parquet precisa estar em dia)
+    # (na carga incremental não: as vendas a transformar dependem da marca atual do DW)
+    usar_cache = cache.done('raw') and (VENDAS_CHUNKSIZE == 0 or cache.done('parquet')) and not incremental
+    # Estado compartilhado entre as etapas (cada chave é escrita por uma etapa só)
+    dados = {'resumo_dict': cache.load_frames() if usar_cache else None}
+    # Etapas em DAG: cada uma começa quando suas dependências terminam (ver dag.Agendador).
+    # Carga raw e transform só dependem da extração; parquet, pdf e DW só do transform.
+    agenda = Agendador()
+
+    def extrair(**leitura):
+        with etapa('extract', arquivos_vendas=len(arquivos_vendas)) as registro:
+            if incremental:
+                dados['marca'] = registro['marca'] = marca_dw(granular=not leitura)
+                logging.info(f"Carga incremental: vendas com {MARCA_COLUNA} acima de {dados['marca']}")
+            dados['emp'], dados['prod'], dados['vendas'] = read_raw(raw_folder, engine=CSV_ENGINE, **leitura)
+            registro['linhas_saida'] = len(dados['emp']) + len(dados['prod'])
+            if not leitura:
+                registro['linhas_saida'] += len(dados['vendas'])
+                registro['tabelas'] = {'empregados': len(dados['emp']), 'produtos': len(dados['prod']), 'vendas': len(dados['vendas'])}
+
+    transform = []
+    if dados['resumo_dict'] is not None:
+        logging.info(f"Transformação reaproveitada do cache {chave}")
+        instrument.pular('transform')
+    elif VENDAS_CHUNKSIZE > 0:
+        # Cada CSV é lido uma única vez: os mesmos DataFrames vão para o banco raw e para o transform
+        # 1) Extração em blocos
+        logging.info(f"Modo streaming: {len(arquivos_vendas)} arquivo(s) de vendas em blocos de {VENDAS_CHUNKSIZE} linhas")
+        agenda.adicionar('extract', lambda: extrair(chunksize=VENDAS_CHUNKSIZE))
+
+        # 2) Persistir brutos no banco raw (ENGINE); vendas vai bloco a bloco junto com o transform
+        def carregar_raw():
+            with etapa('raw_load', linhas_entrada=len(dados['emp']) + len(dados['prod'])):
+                dados['erros_raw'] = list(save_raw_frames({'empregados': dados['emp'], 'produtos': dados['prod']}, em_blocos=['vendas']).values())
+        agenda.adicionar('raw_load', carregar_raw, depende=['extract'])
+
+        # 3) Transformação em blocos; leitura de vendas, carga raw e parquet acontecem junto
+        # (depois da carga raw das dimensões, que é pequena, para o cache 'raw' refletir as duas)
+        def transformar_em_blocos():
+            erros_raw = dados['erros_raw']
+            appender = ParquetDatasetAppender(parquet_path, manter=manter_publicadas()) if particionado else ParquetAppender(parquet_path)
+            reprovadas = ParquetAppender(quarentena_path)
+            _remover_quarentena(quarentena_path)
+            progresso = {}
+            with etapa('stream') as registro:
+                vendas_chunks = _contar_linhas(dados.pop('vendas'), registro)
+                vendas_chunks = save_raw_chunks(vendas_chunks, RAW_TABLES['vendas'], erros=erros_raw, incremental=incremental)
+                if incremental:
+                    vendas_chunks = filtrar_blocos(vendas_chunks, dados['marca'], progresso)
+                try:
+                    resumo_dict = transform_data_stream(dados['emp'], dados['prod'], vendas_chunks, on_chunk=appender,
+                                                        on_quarentena=reprovadas, remover_reprovadas=QUARENTENA_REMOVER)
+                except BaseException:
+                    appender.abort()
+                    reprovadas.abort()
+                    raise
+                saida_parquet = appender.close()
+                reprovadas.close()
+                registro['linhas_quarentena'] = reprovadas.rows
+                registro['linhas_saida'] = int(resumo_dict['kpis']['n_transacoes'].iloc[0])
+                registro['bytes_gravados'] = tamanho_em_disco(parquet_path)
+            if not erros_raw:
+                cache.mark('raw')
+            cache.save_frames(resumo_dict)
+            cache.mark('parquet', saida_parquet)
+            dados['resumo_dict'] = resumo_dict
+            dados['nova_marca'] = progresso.get('marca')
+        agenda.adicionar('stream', transformar_em_blocos, depende=['raw_load'])
+        transform = ['stream']
+    else:
+        # Cada CSV é lido uma única vez: os mesmos DataFrames vão para o banco raw e para o transform
+        # 1) Extração
+        agenda.adicionar('extract', extrair)
+
+        # 2) Persistir brutos no banco raw (ENGINE), em paralelo com o transform
+        def carregar_raw():
+            with etapa('raw_load', linhas_entrada=len(dados['emp']) + len(dados['prod']) + len(dados['vendas'])):
+                if not save_raw_frames({'empregados': dados['emp'], 'produtos': dados['prod'], 'vendas': dados['vendas']}, incremental=incremental):
+                    cache.mark('raw')
+        agenda.adicionar('raw_load', carregar_raw, depende=['extract'])
+
+        # 3) Transformação (não altera os frames lidos: a carga raw pode usá-los ao mesmo tempo)
+        def transformar():
+            vendas = dados['vendas']
+            if incremental:
+                vendas = filtrar_novas(vendas, dados['marca'])
+                dados['nova_marca'] = maior_marca(vendas[MARCA_COLUNA], dados['marca'])
+            with etapa('transform', linhas_entrada=len(vendas)) as registro:
+                dados['resumo_dict'] = transform_data(dados['emp'], dados['prod'], vendas, remover_reprovadas=QUARENTENA_REMOVER)
+                registro['linhas_saida'] = len(dados['resumo_dict']['resumo'])
+                registro['linhas_quarentena'] = len(dados['resumo_dict']['quarentena'])
+            cache.save_frames(dados['resumo_dict'])
+        agenda.adicionar('transform', transformar, depende=['extract'])
+        transform = ['transform']
+
+    # 4) Saídas locais (parquet + pdf)
+    if VENDAS_CHUNKSIZE > 0 and transform:
+        instrument.pular('parquet', 'gravado na etapa stream')
+    elif cache.done('parquet'):
+        logging.info("Parquet inalterado (cache): pulando.")
+        instrument.pular('parquet')
+    else:
+        def gravar_parquet():
+            resumo = dados['resumo_dict']['resumo']
+            with etapa('parquet', linhas_entrada=len(resumo)) as registro:
+                if particionado:
+                    # o cache acompanha o manifesto das partições (regravado a cada execução)
+                    cache.mark('parquet', save_parquet_dataset(resumo, parquet_path, manter=manter_publicadas()))
+                else:
+                    save_parquet(resumo, parquet_path)
+                    cache.mark('parquet', parquet_path)
+                registro['bytes_gravados'] = tamanho_em_disco(parquet_path)
+        agenda.adicionar('parquet', gravar_parquet, depende=transform)
+
+    # Quarentena (modo em memória; no streaming é gravada bloco a bloco na etapa stream):
+    # regravada a cada execução, ou removida se nenhuma venda foi reprovada
+    if VENDAS_CHUNKSIZE == 0:
+        def gravar_quarentena():
+            reprovadas = dados['resumo_dict'].get('quarentena')
+            with etapa('quarentena', linhas_entrada=0 if reprovadas is None else len(reprovadas)) as registro:
+                _remover_quarentena(quarentena_path)
+                if reprovadas is not None and len(reprovadas):
+                    save_parquet(reprovadas, quarentena_path)
+                    registro['bytes_gravados'] = tamanho_em_disco(quarentena_path)
+        agenda.adicionar('quarentena', gravar_quarentena, depende=transform)
+
+    if cache.done('pdf'):
+        logging.info("PDF inalterado (cache): pulando.")
+        instrument.pular('pdf')
+    else:
+        # PDF é CPU em Python (matplotlib): roda em outro processo, só com as tabelas agregadas
+        # que ele lê (report.CHAVES_PDF; nada de resumo, fVendas ou quarentena)
+        def gerar_pdf():
+            relatorio = {k: dados['resumo_dict'][k] for k in CHAVES_PDF if k in dados['resumo_dict']}
+            with etapa('pdf') as registro:
+                agenda.em_processo(build_pdf, relatorio, pdf_path)
+                registro['bytes_gravados'] = tamanho_em_disco(pdf_path)
+            cache.mark('pdf', pdf_path)
+        agenda.adicionar('pdf', gerar_pdf, depende=transform)
+
+    # 5) Carga no Data Warehouse (transformados)
+    if cache.done('dw'):
+        logging.info("DW já carregado com estas entradas (cache): pulando.")
+        instrument.pular('dw_load')
+    else:
+        # linhas por tabela ficam nas sub-etapas dw_load/<tabela>
+        def carregar_dw():
+            with etapa('dw_load'):
+                save_transformed_to_dw(dados['resumo_dict'], incremental=incremental,
+                                       marca=dados.get('marca'), nova_marca=dados.get('nova_marca'))
+            cache.mark('dw')
+        agenda.adicionar('dw_load', carregar_dw, depende=transform)
 
-    # 4) Carga no Data Warehouse (transformados)
-    save_transformed_to_dw(resumo_dict)
+    agenda.executar()
+    cache.evict()
+    dispose_engines()
 
     logging.info("Pipeline finalizado com sucesso!")
+    return 'ok'
 
 if __name__ == '__main__':
     main()
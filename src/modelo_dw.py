@@ -0,0 +1,291 @@
+# src/modelo_dw.py
+"""
+DDL das tabelas do DW, mantida pelo inserirbanco em vez de inferida pelo pandas.
+
+As tabelas são criadas uma vez com tipos explícitos, chave primária e índices nas chaves de
+junção e filtro (data, id_produto, id_empregado); as cargas passam a gravar nessas tabelas,
+sem o to_sql recriá-las (ver inserirbanco.insert_dataframe). Em uma carga completa os índices
+secundários são removidos antes do insert em massa e recriados depois, uma única vez.
+No MySQL as tabelas de fatos são particionadas por mês de `data` (RANGE COLUMNS), com uma
+partição 'pfuturo' que é dividida quando chegam vendas de meses novos (garantir_particoes).
+
+DW_DDL=pandas volta ao comportamento antigo (to_sql replace, schema inferido).
+
+Cargas completas (replace) do DW são gravadas em uma tabela de staging e publicadas por troca
+de nomes em uma transação (publicar_staging): quem consulta vê a tabela anterior completa até
+o commit e a nova completa depois, e uma carga que falha deixa a anterior intacta.
+"""
+import logging
+import os
+
+import pandas as pd
+from sqlalchemy import (BigInteger, Boolean, Column, DateTime, Float, Index, Integer, MetaData, SmallInteger,
+                        String, Table, delete, inspect, text)
+from sqlalchemy.schema import CreateTable
+
+from dimensoes import DIM_MODO
+
+# DDL do DW: 'gerenciado' (tabelas, chaves e índices deste módulo) ou 'pandas' (to_sql replace)
+DW_DDL = os.getenv('DW_DDL', 'gerenciado')
+# Partição aberta das tabelas de fatos no MySQL (vendas de meses ainda sem partição própria)
+PARTICAO_FUTURO = 'pfuturo'
+# Publicação das cargas completas do DW: 'troca' (tabela de staging + troca atômica) ou
+# 'direta' (esvazia e regrava a própria tabela, visível pela metade durante a carga)
+DW_PUBLICACAO = os.getenv('DW_PUBLICACAO', 'troca')
+# Sufixos das tabelas temporárias da troca (sobras de cargas que falharam são apagadas)
+SUFIXO_STAGING = '__stg'
+SUFIXO_ANTIGA = '__antiga'
+
+
+def _colunas_venda():
+    return [
+        Column('id_venda', Integer),
+        Column('data', DateTime),
+        Column('id_produto', Integer),
+        Column('id_empregado', Integer),
+        Column('quantidade', Integer),
+        Column('valor_unitario', Float(53)),
+        Column('valor_total', Float(53)),
+    ]
+
+
+def _colunas_vigencia(historico):
+    """Colunas do modo historico das dimensões (dimensoes.COLUNAS_HISTORICO)."""
+    if not historico:
+        return []
+    return [Column('valido_de', DateTime, primary_key=True), Column('valido_ate', DateTime), Column('atual', Boolean)]
+
+
+def criar_modelo(historico=None):
+    """
+    MetaData com as tabelas do DW. historico (padrão: DIM_MODO) acrescenta a vigência às
+    dimensões, com chave (id, valido_de). Fatos não têm chave primária: id_venda pode se
+    repetir (vendas corrigidas com o mesmo id) ou faltar; ficam com índice não único.
+    """
+    historico = DIM_MODO == 'historico' if historico is None else historico
+    modelo = MetaData()
+    Table('dFuncionarios', modelo,
+          Column('id_empregado', Integer, primary_key=True, autoincrement=False),
+          Column('nome_emp', String(120)),
+          Column('cargo', String(60)),
+          Column('idade', SmallInteger),
+          *_colunas_vigencia(historico))
+    Table('dProdutos', modelo,
+          Column('id_produto', Integer, primary_key=True, autoincrement=False),
+          Column('nome_prod', String(120)),
+          Column('preco', Float(53)),
+          Column('categoria', String(60)),
+          *_colunas_vigencia(historico))
+    enriquecidas = [Column('nome_emp', String(120)), Column('cargo', String(60)), Column('idade', SmallInteger),
+                    Column('nome_prod', String(120)), Column('preco', Float(53)), Column('categoria', String(60))]
+    for nome, extras, filtros in (('fVendas', [], []), ('resumo_vendas', enriquecidas, ['categoria'])):
+        prefixo = f'ix_{nome.lower()}'
+        Table(nome, modelo, *_colunas_venda(), *extras,
+              *(Index(f'{prefixo}_{c}', c) for c in ['data', 'id_venda', 'id_produto', 'id_empregado', *filtros]),
+              info={'particionar_por': 'data'})
+    for nome in ('total_por_func', 'top5_func'):
+        Table(nome, modelo,
+              Column('id_empregado', Integer, primary_key=True, autoincrement=False),
+              Column('nome_emp', String(120)),
+              Column('total_vendas', Float(53)))
+    Table('ticket_por_prod', modelo,
+          Column('id_produto', Integer, primary_key=True, autoincrement=False),
+          Column('nome_prod', String(120)),
+          Column('valor_total', Float(53)),
+          Column('total_qt', BigInteger),
+          Column('ticket_medio', Float(53)))
+    Table('vendas_por_categoria', modelo,
+          Column('categoria', String(60), primary_key=True),
+          Column('valor_total', Float(53)))
+    return modelo
+
+
+MODELO = criar_modelo()
+
+
+def tabela_gerenciada(nome):
+    """Table do modelo para `nome`, ou None (tabela fora do DW ou DW_DDL=pandas)."""
+    if DW_DDL != 'gerenciado':
+        return None
+    return MODELO.tables.get(nome)
+
+
+def conferir_frame(df, t):
+    """Erro claro (antes de tocar no banco) se df não couber na tabela: colunas a mais ou chave repetida."""
+    extras = [c for c in df.columns if c not in t.c]
+    if extras:
+        raise ValueError(f"Colunas fora do modelo de `{t.name}`: {extras} (ajuste modelo_dw.py ou use DW_DDL=pandas)")
+    chave = [c.name for c in t.primary_key.columns]
+    if chave and all(c in df.columns for c in chave) and df.duplicated(subset=chave).any():
+        raise ValueError(f"Chave primária {chave} repetida nos dados de `{t.name}` (use DW_DDL=pandas para gravar sem chave)")
+
+
+def _criar(conn, t, indices=True):
+    """CREATE TABLE (+ índices); no MySQL as tabelas de fatos nascem particionadas por mês."""
+    coluna = t.info.get('particionar_por')
+    if coluna and conn.dialect.name == 'mysql':
+        ddl = str(CreateTable(t).compile(dialect=conn.dialect)).rstrip()
+        conn.exec_driver_sql(f"{ddl} PARTITION BY RANGE COLUMNS(`{coluna}`) "
+                             f"(PARTITION {PARTICAO_FUTURO} VALUES LESS THAN (MAXVALUE))")
+    else:
+        conn.execute(CreateTable(t))
+    if indices:
+        criar_indices(conn, t)
+
+
+def _mesmo_schema(insp, t):
+    """
+    Mesmas colunas e chave primária do modelo, e textos com tamanho (VARCHAR): tabelas criadas
+    pelo to_sql têm TEXT, que o MySQL não indexa, e nenhuma chave.
+    """
+    atuais = {c['name']: c['type'] for c in insp.get_columns(t.name)}
+    if set(atuais) != set(t.c.keys()):
+        return False
+    if set(insp.get_pk_constraint(t.name)['constrained_columns']) != {c.name for c in t.primary_key.columns}:
+        return False
+    return all(getattr(atuais[c.name], 'length', None) for c in t.c if isinstance(c.type, String))
+
+
+def garantir_tabela(conn, t):
+    """
+    Cria `t` se não existir. Se existir com outro schema (ex.: criada pelo to_sql, ou a troca
+    de DIM_MODO), é recriada pelo modelo; índices ausentes (carga interrompida entre
+    remover_indices e criar_indices) são recriados. Retorna True se a tabela foi (re)criada.
+    """
+    insp = inspect(conn)
+    if insp.has_table(t.name):
+        if _mesmo_schema(insp, t):
+            criar_indices(conn, t)
+            return False
+        logging.warning(f"`{t.name}` existe com colunas, tipos ou chave diferentes do modelo do DW; recriando.")
+        t.drop(conn)
+    _criar(conn, t)
+    return True
+
+
+def remover_indices(conn, t):
+    """Remove os índices secundários de `t` antes de uma carga em massa."""
+    existentes = {i['name'] for i in inspect(conn).get_indexes(t.name)}
+    for indice in t.indexes:
+        if indice.name in existentes:
+            indice.drop(conn)
+
+
+def criar_indices(conn, t):
+    """Cria os índices secundários de `t` que não existirem (após a carga em massa)."""
+    existentes = {i['name'] for i in inspect(conn).get_indexes(t.name)}
+    for indice in t.indexes:
+        if indice.name not in existentes:
+            indice.create(conn)
+
+
+def ddl_transacional(conn):
+    """
+    False no MySQL, em que TRUNCATE e CREATE/DROP INDEX fazem commit implícito da transação
+    em andamento: uma carga que falhasse depois deles não voltaria atrás.
+    """
+    return conn.dialect.name != 'mysql'
+
+
+def esvaziar(conn, t):
+    """
+    Apaga as linhas de `t` sem recriar a tabela, com DELETE em todos os bancos: desfeito junto
+    com a carga se ela falhar (TRUNCATE seria mais rápido, mas no MySQL faz commit na hora).
+    """
+    conn.execute(delete(t))
+
+
+def garantir_particoes(conn, t, datas):
+    """
+    MySQL: divide a partição PARTICAO_FUTURO em partições mensais (p202301 = jan/2023) para os
+    meses de `datas` posteriores à última partição mensal. Nos demais bancos não faz nada.
+    """
+    coluna = t.info.get('particionar_por')
+    if not coluna or conn.dialect.name != 'mysql' or not len(datas):
+        return
+    nomes = conn.execute(text("SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+                              "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :t"), {'t': t.name}).scalars().all()
+    if PARTICAO_FUTURO not in nomes:
+        return
+    ultima = max((int(n[1:]) for n in nomes if n and n[1:].isdigit()), default=0)
+    meses = pd.to_datetime(pd.Series(datas), errors='coerce').dropna().dt.to_period('M').unique()
+    novos = sorted(m for m in meses if int(m.strftime('%Y%m')) > ultima)
+    if not novos:
+        return
+    particoes = [f"PARTITION p{m.strftime('%Y%m')} VALUES LESS THAN ('{(m + 1).start_time:%Y-%m-%d}')" for m in novos]
+    particoes.append(f"PARTITION {PARTICAO_FUTURO} VALUES LESS THAN (MAXVALUE)")
+    conn.exec_driver_sql(f"ALTER TABLE `{t.name}` REORGANIZE PARTITION {PARTICAO_FUTURO} INTO ({', '.join(particoes)})")
+    logging.info(f"`{t.name}`: {len(novos)} partições mensais novas ({novos[0]} a {novos[-1]}).")
+
+
+def usa_staging(nome):
+    """True se cargas completas de `nome` (tabela do DW) passam por staging + troca."""
+    return DW_PUBLICACAO == 'troca' and nome in MODELO.tables
+
+
+def nome_staging(nome):
+    return f'{nome}{SUFIXO_STAGING}'
+
+
+def tabela_staging(t):
+    """Cópia de `t` com o nome da staging (mesmas colunas, chave, índices e partição)."""
+    return t.to_metadata(MetaData(), name=nome_staging(t.name))
+
+
+def criar_staging(conn, t, df):
+    """Cria a staging vazia de `t` (índices só depois do insert) com as partições dos meses de df."""
+    ts = tabela_staging(t)
+    _criar(conn, ts, indices=False)
+    coluna = t.info.get('particionar_por')
+    if coluna in df.columns:
+        garantir_particoes(conn, ts, df[coluna])
+    return ts
+
+
+def limpar_staging(conn, nome):
+    """Apaga staging e tabela antiga de `nome` que tenham sobrado de uma carga interrompida."""
+    insp = inspect(conn)
+    for sobra in (nome_staging(nome), f'{nome}{SUFIXO_ANTIGA}'):
+        if insp.has_table(sobra):
+            logging.warning(f"Removendo `{sobra}` (carga interrompida).")
+            conn.exec_driver_sql(f"DROP TABLE {conn.dialect.identifier_preparer.quote(sobra)}")
+
+
+def indices_na_staging(conn):
+    """
+    Índices podem ser criados na staging antes da troca se os nomes de índice forem por tabela
+    (MySQL); no SQLite/PostgreSQL são por schema e só são criados depois da troca.
+    """
+    return conn.dialect.name == 'mysql'
+
+
+def _abrir_transacao_ddl(conn):
+    """
+    O pysqlite só abre transação antes de INSERT/UPDATE/DELETE: sem isto DROP e RENAME da
+    troca rodariam em autocommit e uma consulta entre os dois não acharia a tabela.
+    """
+    if conn.dialect.name == 'sqlite' and not conn.connection.dbapi_connection.in_transaction:
+        conn.exec_driver_sql('BEGIN IMMEDIATE')
+
+
+def publicar_staging(conn, nome, t=None):
+    """
+    Troca `nome` pela sua staging. MySQL: um único RENAME TABLE (atômico) e DROP da antiga.
+    Demais bancos (DDL transacional): DROP da atual, RENAME da staging e criação dos índices
+    de `t`, tudo na transação de `conn`; as consultas veem a tabela anterior até o commit.
+    """
+    q = conn.dialect.identifier_preparer.quote
+    existe = inspect(conn).has_table(nome)
+    if indices_na_staging(conn):
+        antiga = f'{nome}{SUFIXO_ANTIGA}'
+        trocas = ([f"{q(nome)} TO {q(antiga)}"] if existe else []) + [f"{q(nome_staging(nome))} TO {q(nome)}"]
+        conn.exec_driver_sql(f"RENAME TABLE {', '.join(trocas)}")
+        if existe:
+            conn.exec_driver_sql(f"DROP TABLE {q(antiga)}")
+        return
+    _abrir_transacao_ddl(conn)
+    if existe:
+        conn.exec_driver_sql(f"DROP TABLE {q(nome)}")
+    conn.exec_driver_sql(f"ALTER TABLE {q(nome_staging(nome))} RENAME TO {q(nome)}")
+    if t is not None:
+        criar_indices(conn, t)
@@ -0,0 +1,147 @@
+# src/query.py
+"""
+Leitura seletiva do resumo de vendas em Parquet: o arquivo único (report.save_parquet) ou o
+dataset particionado por ano/mês (report.save_parquet_dataset).
+Os filtros viram expressões do pyarrow.dataset: partições fora do intervalo de datas nem são
+abertas, row groups cujas estatísticas (min/max) não casam com o filtro são pulados e só as
+colunas pedidas são lidas. Assim uma fatia custa proporcionalmente ao seu tamanho.
+
+    python src/query.py --inicio 2023-01-01 --fim 2023-04-01 --categoria Livros --pdf outputs/livros-t1.pdf
+"""
+import argparse
+import os
+
+import pandas as pd
+import pyarrow.dataset as ds
+
+from transform import EstadoKPIs, kpi_cube, kpis_de_resumo
+
+# Colunas de partição do dataset (vêm do caminho ano=AAAA/mes=MM, não existem no resumo)
+COLUNAS_PARTICAO = ('ano', 'mes')
+
+
+def abrir_resumo(path):
+    """Dataset do pyarrow sobre o arquivo Parquet ou a pasta particionada (Hive ano=/mes=)."""
+    if os.path.isdir(path):
+        # arquivos começando com '_' ou '.' (ex.: _particoes.json) são ignorados pelo pyarrow
+        return ds.dataset(path, format='parquet', partitioning='hive')
+    return ds.dataset(path, format='parquet')
+
+
+def _lista(valor):
+    if valor is None:
+        return None
+    if isinstance(valor, (str, int)):
+        return [valor]
+    return list(valor)
+
+
+def filtro_resumo(inicio=None, fim=None, categorias=None, empregados=None, produtos=None, particionado=False):
+    """
+    Expressão de filtro do pyarrow (None se nenhum filtro):
+    - inicio/fim: intervalo [inicio, fim) de `data`
+    - categorias, empregados (id_empregado), produtos (id_produto): valor único ou lista
+    Com particionado=True o intervalo de datas também é aplicado a ano/mes, para podar partições.
+    """
+    condicoes = []
+    if inicio is not None:
+        inicio = pd.Timestamp(inicio)
+        condicoes.append(ds.field('data') >= inicio)
+        if particionado:
+            condicoes.append((ds.field('ano') > inicio.year) | ((ds.field('ano') == inicio.year) & (ds.field('mes') >= inicio.month)))
+    if fim is not None:
+        fim = pd.Timestamp(fim)
+        condicoes.append(ds.field('data') < fim)
+        if particionado:
+            ultimo = fim - pd.Timedelta(1, 'ns')
+            condicoes.append((ds.field('ano') < ultimo.year) | ((ds.field('ano') == ultimo.year) & (ds.field('mes') <= ultimo.month)))
+    for coluna, valores in (('categoria', categorias), ('id_empregado', empregados), ('id_produto', produtos)):
+        valores = _lista(valores)
+        if valores is not None:
+            condicoes.append(ds.field(coluna).isin(valores))
+    if not condicoes:
+        return None
+    filtro = condicoes[0]
+    for condicao in condicoes[1:]:
+        filtro = filtro & condicao
+    return filtro
+
+
+def ler_resumo(path, colunas=None, **filtros):
+    """
+    Lê do Parquet só as linhas que passam nos `filtros` (ver filtro_resumo) e só as `colunas`
+    pedidas (padrão: todas as do resumo, sem ano/mes da partição).
+    """
+    dataset = abrir_resumo(path)
+    particionado = all(c in dataset.schema.names for c in COLUNAS_PARTICAO)
+    if colunas is None:
+        colunas = [c for c in dataset.schema.names if not (particionado and c in COLUNAS_PARTICAO)]
+    tabela = dataset.to_table(columns=list(colunas), filter=filtro_resumo(particionado=particionado, **filtros))
+    return tabela.to_pandas()
+
+
+def estado_kpis(path, tamanho_lote=1_000_000, **filtros):
+    """
+    EstadoKPIs (camada de KPIs do relatório) de uma fatia do Parquet lida em lotes de até
+    `tamanho_lote` linhas: a memória fica limitada pelo lote, não pela fatia. Mediana e
+    histograma saem aproximados (ver transform.EstadoKPIs); use .resultado() para as tabelas.
+    """
+    dataset = abrir_resumo(path)
+    particionado = all(c in dataset.schema.names for c in COLUNAS_PARTICAO)
+    colunas = [c for c in dataset.schema.names if not (particionado and c in COLUNAS_PARTICAO)]
+    estado = EstadoKPIs()
+    for lote in dataset.to_batches(columns=colunas, filter=filtro_resumo(particionado=particionado, **filtros), batch_size=tamanho_lote):
+        if lote.num_rows:
+            estado.mesclar(EstadoKPIs.de_bloco(lote.to_pandas()))
+    return estado
+
+
+def resumo_dict_fatia(path, **filtros):
+    """resumo_dict (resumo + KPIs + camada do relatório) de uma fatia do Parquet, no formato de transform_data."""
+    resumo = ler_resumo(path, **filtros)
+    return {
+        'resumo': resumo,
+        **kpis_de_resumo(resumo),
+        **kpi_cube(resumo)
+    }
+
+
+def relatorio_fatia(path, output_pdf_path, **filtros):
+    """Gera o PDF de build_pdf só para a fatia filtrada do Parquet."""
+    from report import build_pdf
+
+    resumo_dict = resumo_dict_fatia(path, **filtros)
+    print(f"Fatia: {len(resumo_dict['resumo'])} linhas")
+    build_pdf(resumo_dict, output_pdf_path)
+    return resumo_dict
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Consulta/relatório sobre uma fatia do resumo-vendas em Parquet')
+    base = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    parser.add_argument('--parquet', default=os.path.join(base, 'outputs', 'resumo-vendas.parquet'),
+                        help='arquivo .parquet ou pasta do dataset particionado')
+    parser.add_argument('--inicio', help='data inicial (inclusiva), ex.: 2023-01-01')
+    parser.add_argument('--fim', help='data final (exclusiva), ex.: 2023-04-01')
+    parser.add_argument('--categoria', action='append', dest='categorias')
+    parser.add_argument('--empregado', action='append', type=int, dest='empregados')
+    parser.add_argument('--produto', action='append', type=int, dest='produtos')
+    parser.add_argument('--colunas', help='colunas separadas por vírgula (só na consulta)')
+    parser.add_argument('--pdf', help='gera o relatório da fatia neste caminho')
+    parser.add_argument('--kpis', action='store_true', help='só os KPIs da capa, lendo a fatia em lotes')
+    args = parser.parse_args()
+
+    filtros = {k: getattr(args, k) for k in ('inicio', 'fim', 'categorias', 'empregados', 'produtos')}
+    if args.pdf:
+        relatorio_fatia(args.parquet, args.pdf, **filtros)
+    elif args.kpis:
+        print(estado_kpis(args.parquet, **filtros).resultado()['kpis'].T.to_string(header=False))
+    else:
+        colunas = args.colunas.split(',') if args.colunas else None
+        df = ler_resumo(args.parquet, colunas=colunas, **filtros)
+        print(df.to_string(max_rows=20))
+        print(f"{len(df)} linhas")
+
+
+if __name__ == '__main__':
+    main()
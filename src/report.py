@@ -1,9 +1,14 @@
+import hashlib
+import json
+import io
 import os
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_pdf import PdfPages
 from matplotlib.ticker import FuncFormatter
+from transform import kpi_cube
 
 # --- CONFIGURAÇÕES GLOBAIS DE LAYOUT E ESTILO ---
 # Tamanho da página A4 landscape em polegadas (11.69 x 8.27)
@@ -34,6 +39,16 @@ COLOR_ACCENT = '#FFC300'    # Amarelo para destaque
 COLOR_TEXT = '#333333'      # Cinza escuro para texto
 COLOR_LIGHT_GRAY = '#CCCCCC' # Cinza claro para linhas/bordas
 
+# Processos para montar as páginas do PDF em paralelo (1 = sequencial)
+REPORT_WORKERS = int(os.getenv('REPORT_WORKERS', '1'))
+
+# Escrita Parquet: compressão, linhas por row group (0 = padrão do pyarrow), dicionário e estatísticas
+# (PARQUET_DICTIONARY / PARQUET_STATISTICS: '1' = todas as colunas, '0' = nenhuma ou lista 'col1,col2')
+PARQUET_COMPRESSION = os.getenv('PARQUET_COMPRESSION', 'snappy')
+PARQUET_ROW_GROUP_SIZE = int(os.getenv('PARQUET_ROW_GROUP_SIZE', '0'))
+PARQUET_DICTIONARY = os.getenv('PARQUET_DICTIONARY', '1')
+PARQUET_STATISTICS = os.getenv('PARQUET_STATISTICS', '1')
+
 # --- FUNÇÕES AUXILIARES ---
 
 def currency_fmt(x, pos=None):
@@ -77,340 +92,624 @@ def _new_page(fig, title=None, subtitle=None):
     content.axis('off')
     return content
 
-def save_parquet(df, path_parquet):
-    """Salva um DataFrame em formato Parquet."""
+def _colunas_ou_bool(valor):
+    """'1'/'0' -> True/False; 'a,b' -> ['a', 'b'] (formatos aceitos pelo pyarrow)."""
+    valor = str(valor).strip()
+    if valor.lower() in ('1', 'true', 'sim', ''):
+        return True
+    if valor.lower() in ('0', 'false', 'nao', 'não'):
+        return False
+    return [c.strip() for c in valor.split(',') if c.strip()]
+
+def parquet_options(**kwargs):
+    """
+    Opções de escrita Parquet (pyarrow): compression, row_group_size, use_dictionary e
+    write_statistics. Os padrões vêm das variáveis PARQUET_*; kwargs sobrescrevem.
+    """
+    opcoes = {
+        'compression': PARQUET_COMPRESSION,
+        'row_group_size': PARQUET_ROW_GROUP_SIZE or None,
+        'use_dictionary': _colunas_ou_bool(PARQUET_DICTIONARY),
+        'write_statistics': _colunas_ou_bool(PARQUET_STATISTICS),
+    }
+    opcoes.update(kwargs)
+    return opcoes
+
+def save_parquet(df, path_parquet, opcoes=None):
+    """Salva um DataFrame em formato Parquet (arquivo único; opcoes: ver parquet_options)."""
     os.makedirs(os.path.dirname(path_parquet), exist_ok=True)
-    df = df.reset_index(drop=True)
-    df.to_parquet(path_parquet, index=False)
+    # index=False já descarta o índice: sem reset_index (que copiaria o frame)
+    df.to_parquet(path_parquet, index=False, **(opcoes or parquet_options()))
     print(f"Parquet salvo: {path_parquet}")
 
-def build_pdf(resumo_dict, output_pdf_path, top_n_employees=10, top_n_products=12):
-    """Constrói o relatório PDF com base nos dados processados."""
-    os.makedirs(os.path.dirname(output_pdf_path), exist_ok=True)
+class ParquetAppender:
+    """
+    Grava um Parquet de forma incremental, um bloco de linhas por vez (modo streaming).
+    Pode ser passado direto como on_chunk de transform_data_stream; chamar close() no final.
+    O schema é fixado pelo primeiro bloco e os seguintes são convertidos para ele.
+    """
 
-    resumo = resumo_dict.get('resumo', pd.DataFrame())
+    def __init__(self, path_parquet, opcoes=None):
+        os.makedirs(os.path.dirname(path_parquet), exist_ok=True)
+        self.path_parquet = path_parquet
+        self.opcoes = dict(opcoes or parquet_options())
+        self.row_group_size = self.opcoes.pop('row_group_size', None)
+        self.writer = None
+        self.rows = 0
+
+    def __call__(self, df):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self.writer is None:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            self.writer = pq.ParquetWriter(self.path_parquet, table.schema, **self.opcoes)
+        else:
+            table = pa.Table.from_pandas(df, schema=self.writer.schema, preserve_index=False)
+        self.writer.write_table(table, row_group_size=self.row_group_size)
+        self.rows += len(df)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            print(f"Parquet salvo: {self.path_parquet} ({self.rows} linhas)")
+        return self.path_parquet
+
+    def abort(self):
+        """Descarta o arquivo parcial (ex.: o transform falhou no meio)."""
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+            os.remove(self.path_parquet)
+
+# --- DATASET PARQUET PARTICIONADO (ano/mês) ---
+# Layout Hive: <dataset>/ano=2023/mes=01/part-0.parquet, lido por pyarrow/pandas/Power BI como
+# uma tabela só (colunas ano e mes vêm do caminho). _particoes.json guarda a assinatura do
+# conteúdo de cada partição para que só as partições alteradas sejam regravadas.
+# Linhas sem data vão para ano=0/mes=00 (a partição nula do Hive quebra o pd.read_parquet da pasta).
+PARTICAO_SEM_DATA = 'ano=0/mes=00'
+MANIFESTO_PARTICOES = '_particoes.json'
+
+def _rotulos_particao(datas):
+    """Rótulo 'ano=AAAA/mes=MM' de cada linha (datas nulas vão para PARTICAO_SEM_DATA)."""
+    datas = pd.to_datetime(datas, errors='coerce')
+    rotulos = ('ano=' + datas.dt.year.astype('Int64').astype(str) + '/mes=' + datas.dt.month.astype('Int64').astype(str).str.zfill(2))
+    return rotulos.where(datas.notna(), PARTICAO_SEM_DATA)
+
+def _soma_hash(df):
+    """Soma (uint64, com estouro) dos hashes das linhas: não depende da ordem nem da divisão em blocos."""
+    return int(pd.util.hash_pandas_object(df, index=False).to_numpy().sum(dtype=np.uint64))
+
+def _assinatura(soma, linhas, df, opcoes):
+    """Assinatura do conteúdo de uma partição: hash das linhas + colunas/dtypes + opções de escrita."""
+    base = json.dumps([soma, linhas, [f"{c}:{t}" for c, t in df.dtypes.items()], opcoes], sort_keys=True, default=str)
+    return hashlib.sha256(base.encode()).hexdigest()[:24]
+
+def _ler_manifesto(dataset_dir):
+    path = os.path.join(dataset_dir, MANIFESTO_PARTICOES)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _salvar_manifesto(dataset_dir, manifesto):
+    path = os.path.join(dataset_dir, MANIFESTO_PARTICOES)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifesto, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+    return path
+
+def _publicar_particao(dir_particao, tmp):
+    """Troca o arquivo da partição pelo recém-gravado e remove arquivos antigos da pasta."""
+    destino = os.path.join(dir_particao, 'part-0.parquet')
+    os.replace(tmp, destino)
+    for nome in os.listdir(dir_particao):
+        if nome.endswith('.parquet') and nome != 'part-0.parquet':
+            os.remove(os.path.join(dir_particao, nome))
+
+def _linhas_mantidas(dir_particao, manter, modelo):
+    """
+    Linhas já publicadas na partição que `manter` preserva (carga incremental), com os tipos
+    de `modelo`; None se a partição ainda não existir.
+    """
+    arquivos = sorted(n for n in os.listdir(dir_particao) if n.endswith('.parquet')) if os.path.isdir(dir_particao) else []
+    if not arquivos:
+        return None
+    existentes = manter(pd.concat([pd.read_parquet(os.path.join(dir_particao, n)) for n in arquivos], ignore_index=True))
+    tipos = {c: 'category' if isinstance(t, pd.CategoricalDtype) else t for c, t in modelo.dtypes.items()}
+    return existentes.reindex(columns=modelo.columns).astype(tipos)
+
+def save_parquet_dataset(df, dataset_dir, coluna_data='data', opcoes=None, manter=None):
+    """
+    Salva o resumo como dataset Parquet particionado por ano/mês de `coluna_data`.
+    Só as partições presentes em `df` são consideradas, e dentre elas só as de conteúdo
+    alterado são regravadas; meses ausentes de `df` (histórico) ficam intactos.
+    Com `manter` (carga incremental: df traz só as vendas novas) cada partição tocada é
+    regravada com as linhas já publicadas que manter(existentes) devolve mais as de df,
+    em vez de só as de df.
+    Retorna o caminho do manifesto das partições.
+    """
+    opcoes = opcoes or parquet_options()
+    os.makedirs(dataset_dir, exist_ok=True)
+    manifesto = _ler_manifesto(dataset_dir)
+    gravadas = inalteradas = 0
+    for rotulo, parte in df.groupby(_rotulos_particao(df[coluna_data]), sort=True):
+        dir_particao = os.path.join(dataset_dir, *rotulo.split('/'))
+        antigas = _linhas_mantidas(dir_particao, manter, parte) if manter is not None else None
+        if antigas is not None and len(antigas):
+            tipos = {c: 'category' for c, t in parte.dtypes.items() if isinstance(t, pd.CategoricalDtype)}
+            parte = pd.concat([antigas, parte], ignore_index=True).astype(tipos)
+        assinatura = _assinatura(_soma_hash(parte), len(parte), parte, opcoes)
+        if manifesto.get(rotulo, {}).get('assinatura') == assinatura and os.path.exists(os.path.join(dir_particao, 'part-0.parquet')):
+            inalteradas += 1
+            continue
+        os.makedirs(dir_particao, exist_ok=True)
+        tmp = os.path.join(dir_particao, 'part-0.parquet.tmp')
+        parte.to_parquet(tmp, index=False, **opcoes)
+        _publicar_particao(dir_particao, tmp)
+        manifesto[rotulo] = {'assinatura': assinatura, 'linhas': len(parte)}
+        gravadas += 1
+    path = _salvar_manifesto(dataset_dir, manifesto)
+    print(f"Parquet particionado salvo: {dataset_dir} ({gravadas} partições gravadas, {inalteradas} inalteradas)")
+    return path
+
+class ParquetDatasetAppender:
+    """
+    Versão em streaming de save_parquet_dataset (on_chunk de transform_data_stream).
+    Cada partição tocada ganha um writer próprio gravando em arquivo temporário; no close()
+    as partições com conteúdo alterado são publicadas e as demais descartadas.
+    O schema é fixado pelo primeiro bloco, como em ParquetAppender. `manter`: como em
+    save_parquet_dataset (as linhas mantidas entram no temporário da partição no close()).
+    """
+
+    def __init__(self, dataset_dir, coluna_data='data', opcoes=None, manter=None):
+        os.makedirs(dataset_dir, exist_ok=True)
+        self.dataset_dir = dataset_dir
+        self.coluna_data = coluna_data
+        self.opcoes = opcoes or parquet_options()
+        self.manter = manter
+        self.schema = None
+        self.exemplo = None
+        self.particoes = {}  # rótulo -> [writer, tmp, soma_hash, linhas]
+
+    def __call__(self, df):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self.schema is None:
+            self.schema = pa.Table.from_pandas(df.head(0), preserve_index=False).schema
+            self.exemplo = df.head(0)
+        opcoes = {k: v for k, v in self.opcoes.items() if k != 'row_group_size'}
+        for rotulo, parte in df.groupby(_rotulos_particao(df[self.coluna_data]), sort=False):
+            estado = self.particoes.get(rotulo)
+            if estado is None:
+                dir_particao = os.path.join(self.dataset_dir, *rotulo.split('/'))
+                os.makedirs(dir_particao, exist_ok=True)
+                tmp = os.path.join(dir_particao, 'part-0.parquet.tmp')
+                estado = self.particoes[rotulo] = [pq.ParquetWriter(tmp, self.schema, **opcoes), tmp, 0, 0]
+            estado[0].write_table(pa.Table.from_pandas(parte, schema=self.schema, preserve_index=False),
+                                  row_group_size=self.opcoes.get('row_group_size'))
+            estado[2] = (estado[2] + _soma_hash(parte)) % 2**64
+            estado[3] += len(parte)
+
+    def close(self):
+        """Fecha os writers e publica as partições alteradas; retorna o caminho do manifesto."""
+        manifesto = _ler_manifesto(self.dataset_dir)
+        gravadas = inalteradas = 0
+        for rotulo, (writer, tmp, soma, linhas) in sorted(self.particoes.items()):
+            dir_particao = os.path.dirname(tmp)
+            antigas = _linhas_mantidas(dir_particao, self.manter, self.exemplo) if self.manter is not None else None
+            if antigas is not None and len(antigas):
+                import pyarrow as pa
+                writer.write_table(pa.Table.from_pandas(antigas, schema=self.schema, preserve_index=False),
+                                   row_group_size=self.opcoes.get('row_group_size'))
+                soma, linhas = (soma + _soma_hash(antigas)) % 2**64, linhas + len(antigas)
+            writer.close()
+            assinatura = _assinatura(soma, linhas, self.exemplo, self.opcoes)
+            if manifesto.get(rotulo, {}).get('assinatura') == assinatura and os.path.exists(os.path.join(dir_particao, 'part-0.parquet')):
+                os.remove(tmp)
+                inalteradas += 1
+                continue
+            _publicar_particao(dir_particao, tmp)
+            manifesto[rotulo] = {'assinatura': assinatura, 'linhas': linhas}
+            gravadas += 1
+        self.particoes = {}
+        path = _salvar_manifesto(self.dataset_dir, manifesto)
+        print(f"Parquet particionado salvo: {self.dataset_dir} ({gravadas} partições gravadas, {inalteradas} inalteradas)")
+        return path
+
+    def abort(self):
+        """Descarta os temporários sem tocar nas partições publicadas (ex.: o transform falhou)."""
+        for writer, tmp, _, _ in self.particoes.values():
+            writer.close()
+            os.remove(tmp)
+        self.particoes = {}
+
+def _pagina_capa(page, kpis):
+    """Página 1: capa + KPIs (dict com uma linha da tabela 'kpis' do transform)."""
+    # KPIs
+    total_vendas = kpis['total_vendas']
+    n_transacoes = kpis['n_transacoes']
+    ticket_medio = kpis['ticket_medio']
+    ticket_mediano = kpis['ticket_mediano']
+    n_produtos = kpis['n_produtos']
+    n_funcionarios = kpis['n_funcionarios']
+
+    fig = plt.figure(figsize=FIGSIZE)
+    _new_page(fig, title="Relatório de Análise de Vendas", subtitle="Desafio Técnico Bus2")
+
+    fig.text(0.10, 0.80, "Matheus Vieira Perpetua", fontsize=SUBTITLE_FONT, color=COLOR_TEXT)
+    fig.text(0.10, 0.75, f"Data de Geração: {pd.Timestamp.now().strftime('%d/%m/%Y %H:%M')}", fontsize=TEXT_FONT, color=COLOR_TEXT)
+
+    # KPI cards (2x3 grid)
+    kpis = [
+        ("Total Vendas (R$)", total_vendas),
+        ("Transações (count)", n_transacoes),
+        ("Ticket Médio (R$)", ticket_medio),
+        ("Ticket Mediano (R$, aprox.)" if kpis.get('ticket_mediano_aproximado') else "Ticket Mediano (R$)", ticket_mediano),
+        ("Produtos Únicos", n_produtos),
+        ("Funcionários Únicos", n_funcionarios)
+    ]
+
+    for i, (title, value) in enumerate(kpis):
+        x_start = 0.10 + (i % 3) * 0.28  # Ajusta espaçamento horizontal
+        y_start = 0.55 - (i // 3) * 0.18  # Ajusta espaçamento vertical
+
+        fig.text(x_start, y_start + 0.04, title, fontsize=TEXT_FONT, weight='bold', color=COLOR_TEXT)
+
+        # Formatação específica para valores
+        if "Vendas" in title or "Ticket" in title:
+            formatted_value = currency_fmt(value)
+        else:
+            formatted_value = f"{value:,}".replace(",", ".") # Formata números grandes
+
+        fig.text(x_start, y_start, formatted_value, fontsize=SUBTITLE_FONT, weight='bold', color=COLOR_PRIMARY)
+
+    _page_footer(fig, page)
+
+    return fig
+
+def _pagina_funcionarios(page, total_por_func, top_n_employees):
+    """Página 2: top funcionários (barras + tabela)."""
+    df_emp = total_por_func.copy().sort_values('total_vendas', ascending=False).head(top_n_employees)
+    # Renomear coluna para exibição no PDF se necessário
+    if 'nome_emp' in df_emp.columns: # Verifica se a coluna existe
+        df_emp.rename(columns={'nome_emp': 'Nome do Funcionário'}, inplace=True)
+    elif 'nome_empregado' in df_emp.columns:
+        df_emp.rename(columns={'nome_empregado': 'Nome do Funcionário'}, inplace=True)
+
+
+    names = df_emp['Nome do Funcionário'].astype(str).values
+    values = df_emp['total_vendas'].astype(float).values
+    y_pos = np.arange(len(names))
+
+    fig = plt.figure(figsize=FIGSIZE)
+    _new_page(fig, title=f"Top {top_n_employees} Funcionários por Volume de Vendas")
+
+    left, bottom, width, height = CONTENT_BOX['full']
+    ax_bar = fig.add_axes([left, bottom + 0.25, width, 0.60]) # Gráfico ocupa mais espaço
+    ax_tab = fig.add_axes([left, bottom, width, 0.20]) # Tabela abaixo do gráfico
+
+    ax_bar.barh(y_pos, values, align='center', color=COLOR_PRIMARY)
+    ax_bar.invert_yaxis()
+    ax_bar.set_yticks(y_pos)
+    ax_bar.set_yticklabels(names, fontsize=LABEL_FONT, color=COLOR_TEXT)
+    ax_bar.set_xlabel("Tabela top 5 Vendas (R$) por funcionário", fontsize=LABEL_FONT, color=COLOR_TEXT)
+    ax_bar.xaxis.set_major_formatter(FuncFormatter(currency_fmt))
+    ax_bar.tick_params(axis='x', colors=COLOR_TEXT)
+    ax_bar.tick_params(axis='y', colors=COLOR_TEXT)
+    ax_bar.spines['top'].set_visible(False)
+    ax_bar.spines['right'].set_visible(False)
+    ax_bar.spines['left'].set_color(COLOR_LIGHT_GRAY)
+    ax_bar.spines['bottom'].set_color(COLOR_LIGHT_GRAY)
+    ax_bar.grid(axis='x', linestyle='--', alpha=0.7, color=COLOR_LIGHT_GRAY)
+
+    if len(values) > 0:
+        ax_bar.set_xlim(0, max(values) * 1.15) # Aumenta o limite para rótulos externos
+    _annotate_barh(ax_bar, y_pos, values, fmt_func=currency_fmt, inside_threshold=0.14)
+
+    # Tabela top 5 (separada para melhor formatação)
+    t5 = df_emp.head(5)[['Nome do Funcionário', 'total_vendas']].copy()
+    t5['total_vendas'] = t5['total_vendas'].apply(lambda x: currency_fmt(x))
+
+    ax_tab.axis('off')
+    table = ax_tab.table(cellText=t5.values, colLabels=t5.columns, cellLoc='center', loc='center', bbox=[0, 0, 1, 1])
+    table.auto_set_font_size(False)
+    table.set_fontsize(TABLE_FONT)
+    table.scale(1, 1.5) # Aumenta altura das células
+
+    for (row, col), cell in table.get_celld().items():
+        cell.set_height(0.15) # Ajusta altura da célula
+        cell.set_text_props(color=COLOR_TEXT)
+        cell.set_edgecolor(COLOR_LIGHT_GRAY)
+        if row == 0: # Cabeçalho
+            cell.set_facecolor(COLOR_PRIMARY)
+            cell.set_text_props(weight='bold', color='white')
+        else:
+            cell.set_facecolor('white')
+
+    _page_footer(fig, page)
+
+    return fig
+
+def _pagina_produtos(page, ticket_por_prod, histograma, top_n_products):
+    """Página 3: ticket médio por produto (barras) + histograma pré-calculado de valor_total."""
+    df_ticket = ticket_por_prod.copy().sort_values('ticket_medio', ascending=False).head(top_n_products)
+    if 'nome_prod' in df_ticket.columns:
+        df_ticket.rename(columns={'nome_prod': 'Nome do Produto'}, inplace=True)
+    elif 'nome_produto' in df_ticket.columns:
+        df_ticket.rename(columns={'nome_produto': 'Nome do Produto'}, inplace=True)
+
+    names = df_ticket['Nome do Produto'].astype(str).values
+    vals = df_ticket['ticket_medio'].astype(float).values
+    y_pos = np.arange(len(names))
+
+    fig = plt.figure(figsize=FIGSIZE3)
+    _new_page(fig, title=f"Top {top_n_products} Produtos por Ticket Médio")
+
+    left, bottom, width, height = CONTENT_BOX['full']
+    ax_top = fig.add_axes([left, bottom + 0.33, width, 0.50]) # Gráfico ocupa mais espaço
+    ax_hist = fig.add_axes([left, bottom + 0.00, width, 0.25]) # Histograma abaixo
+
+    # BARRAS HORIZONTAIS (ticket médio)
+    ax_top.barh(y_pos, vals, align='center', color=COLOR_PRIMARY)
+    ax_top.invert_yaxis()
+    ax_top.set_yticks(y_pos)
+    ax_top.set_yticklabels(names, fontsize=LABEL_FONT, color=COLOR_TEXT)
+    ax_top.set_xlabel("Ticket Médio (R$)", fontsize=LABEL_FONT, color=COLOR_TEXT)
+    ax_top.xaxis.set_major_formatter(FuncFormatter(currency_fmt))
+    ax_top.tick_params(axis='x', colors=COLOR_TEXT)
+    ax_top.tick_params(axis='y', colors=COLOR_TEXT)
+    ax_top.spines['top'].set_visible(False)
+    ax_top.spines['right'].set_visible(False)
+    ax_top.spines['left'].set_color(COLOR_LIGHT_GRAY)
+    ax_top.spines['bottom'].set_color(COLOR_LIGHT_GRAY)
+    ax_top.grid(axis='x', linestyle='--', alpha=0.7, color=COLOR_LIGHT_GRAY)
+
+    if len(vals) > 0:
+        ax_top.set_xlim(0, max(vals) * 2)
+    _annotate_barh(ax_top, y_pos, vals, fmt_func=currency_fmt, inside_threshold=0.12)
+    ax_top.set_title(f"Ticket Médio por Produto", fontsize=SUBTITLE_FONT, color=COLOR_TEXT)
+
+    # HISTOGRAMA (distribuição)
+    # contagens por faixa já calculadas no transform (no modo streaming vêm do sketch de quantis, aproximadas)
+    ax_hist.bar(histograma['bin_inicio'], histograma['contagem'], width=histograma['bin_fim'] - histograma['bin_inicio'],
+                align='edge', color=COLOR_SECONDARY, edgecolor='white')
+    ax_hist.set_title("Distribuição de Valor por Transação", fontsize=SUBTITLE_FONT, color=COLOR_TEXT)
+    ax_hist.set_xlabel("Valor Total (R$)", fontsize=LABEL_FONT, color=COLOR_TEXT)
+    ax_hist.set_ylabel("Frequência", fontsize=LABEL_FONT, color=COLOR_TEXT)
+    ax_hist.xaxis.set_major_formatter(FuncFormatter(currency_fmt))
+    ax_hist.tick_params(axis='x', rotation=0, colors=COLOR_TEXT)
+    ax_hist.tick_params(axis='y', colors=COLOR_TEXT)
+    ax_hist.spines['top'].set_visible(False)
+    ax_hist.spines['right'].set_visible(False)
+    ax_hist.spines['left'].set_color(COLOR_LIGHT_GRAY)
+    ax_hist.spines['bottom'].set_color(COLOR_LIGHT_GRAY)
+    ax_hist.grid(axis='y', linestyle='--', alpha=0.7, color=COLOR_LIGHT_GRAY)
+
+    _page_footer(fig, page)
+
+    return fig
+
+def _pagina_categorias(page, vendas_por_categoria):
+    """Página 4: vendas por categoria (barras + pizza)."""
+    vc = vendas_por_categoria.sort_values('valor_total', ascending=False) 
+    if 'categoria' in vc.columns: # Verifica se a coluna existe
+        vc.rename(columns={'categoria': 'Categoria'}, inplace=True)
+    if 'valor_total' in vc.columns: 
+        vc.rename(columns={'valor_total': 'Valor Total'}, inplace=True)
+
+    fig = plt.figure(figsize=FIGSIZE)
+    _new_page(fig, title="Vendas por Categoria de Produto")
+
+    left, bottom, width, height = CONTENT_BOX['full']
+    ax1 = fig.add_axes([left, bottom + 0.15, width * 0.60, 0.70]) # Gráfico de barras maior
+    ax2 = fig.add_axes([left + width * 0.65, bottom + 0.25, width * 0.30, 0.50]) # Gráfico de pizza menor
+
+    ax1.bar(vc['Categoria'].astype(str), vc['Valor Total'], color=COLOR_PRIMARY)
+    ax1.set_xticklabels(vc['Categoria'].astype(str), rotation=45, ha='right', fontsize=LABEL_FONT, color=COLOR_TEXT)
+    ax1.set_ylabel("Valor (R$)", fontsize=LABEL_FONT, color=COLOR_TEXT)
+    ax1.yaxis.set_major_formatter(FuncFormatter(currency_fmt))
+    ax1.tick_params(axis='x', colors=COLOR_TEXT)
+    ax1.tick_params(axis='y', colors=COLOR_TEXT)
+    ax1.spines['top'].set_visible(False)
+    ax1.spines['right'].set_visible(False)
+    ax1.spines['left'].set_color(COLOR_LIGHT_GRAY)
+    ax1.spines['bottom'].set_color(COLOR_LIGHT_GRAY)
+    ax1.grid(axis='y', linestyle='--', alpha=0.7, color=COLOR_LIGHT_GRAY)
+    #ax1.set_title("Total de Vendas por Categoria", fontsize=SUBTITLE_FONT, color=COLOR_TEXT)
+
+    # Gráfico de pizza
+    wedges, texts, autotexts = ax2.pie(vc['Valor Total'], labels=vc['Categoria'], autopct='%1.1f%%', startangle=90, 
+                                    textprops={'fontsize': LABEL_FONT, 'color': COLOR_TEXT}, 
+                                    colors=plt.cm.Paired.colors) # Usando um colormap diferente
+    for autotext in autotexts:
+        autotext.set_color('white') # Cor do texto dentro das fatias
+    ax2.set_title("Participação de Vendas por Categoria", fontsize=SUBTITLE_FONT, color=COLOR_TEXT)
+
+    _page_footer(fig, page)
+
+    return fig
+
+def _pagina_serie(page, serie_mensal):
+    """Página 5: série mensal de vendas (tabela 'serie_mensal' do transform)."""
+    series = serie_mensal.set_index('mes')['valor_total']
+    fig = plt.figure(figsize=FIGSIZE)
+    _new_page(fig, title="Evolução Mensal das Vendas")
+
+    left, bottom, width, height = CONTENT_BOX['full']
+    ax = fig.add_axes([left, bottom + 0.15, width, 0.70])
+    ax.plot(series.index, series.values, marker='o', linewidth=2, color=COLOR_PRIMARY, markersize=5)
+    ax.set_xlabel("Mês", fontsize=LABEL_FONT, color=COLOR_TEXT)
+    ax.set_ylabel("Valor Total (R$)", fontsize=LABEL_FONT, color=COLOR_TEXT)
+    ax.yaxis.set_major_formatter(FuncFormatter(currency_fmt))
+    ax.tick_params(axis='x', colors=COLOR_TEXT)
+    ax.tick_params(axis='y', colors=COLOR_TEXT)
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+    ax.spines['left'].set_color(COLOR_LIGHT_GRAY)
+    ax.spines['bottom'].set_color(COLOR_LIGHT_GRAY)
+    ax.grid(True, linestyle='--', alpha=0.7, color=COLOR_LIGHT_GRAY)
+
+    _page_footer(fig, page)
+
+    return fig
+
+def _pagina_qualidade(page, quality, kpis, nulos_por_coluna):
+    """Página 6: qualidade dos dados (quality_metrics ou, na falta, os agregados do transform)."""
+    fig = plt.figure(figsize=FIGSIZE)
+    _new_page(fig, title="Qualidade dos Dados - Resumo")
+    left, bottom, width, height = CONTENT_BOX['full']
+    ax_text = fig.add_axes([left + 0.01, bottom + 0.02, width - 0.02, height - 0.15])
+    ax_text.axis('off')
+
+    lines = []
+    lines.append("**Métricas de Qualidade dos Dados:**\n")
+    if quality:
+        for k,v in quality.items():
+            lines.append(f"- **{k}:** {v:,}" if isinstance(v, int) else f"- **{k}:** {v}")
+    else:
+        if kpis['n_transacoes'] > 0:
+            missing = dict(zip(nulos_por_coluna['coluna'], nulos_por_coluna['nulos'].astype(int).tolist()))
+            dup_v = int(kpis['registros_duplicados'])
+            lines.append(f"- **Total de registros no resumo:** {kpis['n_transacoes']:,}")
+            lines.append(f"- **Registros duplicados (resumo):** {dup_v:,}")
+            lines.append("\n**Contagem de Valores Ausentes por Coluna (Top 12):**")
+            nonzero = [(c,n) for c,n in missing.items() if n>0]
+            if nonzero:
+                for c,n in nonzero[:12]:
+                    lines.append(f"  - **{c}:** {n:,}")
+            else:
+                for c,n in list(missing.items())[:12]:
+                    lines.append(f"  - **{c}:** {n:,}")
+        else:
+            lines.append("- Não há dados no resumo para análise de qualidade.")
+
+    # Usar text_wrap para quebrar linhas automaticamente
+    text_content = "\n".join(lines).replace(",", ".") # Substitui vírgula por ponto para números grandes
+    ax_text.text(0, 1, text_content, fontsize=TEXT_FONT, family='monospace', va='top', wrap=True, color=COLOR_TEXT)
+
+    _page_footer(fig, page)
+
+    return fig
+
+def _pagina_amostra(page, amostra):
+    """Página 7: amostra de registros (tabela 'amostra' do transform)."""
+    sample = amostra.head(12).copy()
+    cols_priority = ['id_venda','data','id_produto','id_empregado','quantidade','valor_unitario','valor_total','nome_emp','nome_prod','categoria'] 
+    cols = [c for c in cols_priority if c in sample.columns]
+    sample = sample[cols]
+
+    # Formatação de valores monetários e datas
+    for col in ['valor_unitario','valor_total']:
+        if col in sample.columns:
+            sample[col] = sample[col].apply(lambda x: currency_fmt(x) if pd.notna(x) else "")
+    if 'quantidade' in sample.columns:
+        sample['quantidade'] = sample['quantidade'].apply(lambda x: f"{int(x):,}".replace(",", ".") if pd.notna(x) else "")
+    if 'data' in sample.columns:
+        sample['data'] = pd.to_datetime(sample['data'], errors='coerce').dt.strftime('%d/%m/%Y').fillna('')
+
+    fig = plt.figure(figsize=FIGSIZE)
+    _new_page(fig, title="Amostra de Registros (Dados Transformados)")
+    left, bottom, width, height = CONTENT_BOX['full']
+    ax_table = fig.add_axes([left, bottom, width, height])
+    ax_table.axis('off')
+
+    # Ajustes para a tabela
+    table = ax_table.table(cellText=sample.values, colLabels=sample.columns, cellLoc='center', loc='center', bbox=[0, 0, 1, 1])
+    table.auto_set_font_size(False)
+    table.set_fontsize(TABLE_FONT)
+    table.scale(1, 1.5) # Aumenta altura das células
+
+    for (row, col), cell in table.get_celld().items():
+        cell.set_height(0.15) # Ajusta altura da célula
+        cell.set_text_props(color=COLOR_TEXT)
+        cell.set_edgecolor(COLOR_LIGHT_GRAY)
+        if row == 0: # Cabeçalho
+            cell.set_facecolor(COLOR_PRIMARY)
+            cell.set_text_props(weight='bold', color='white')
+        else:
+            cell.set_facecolor('white')
+
+    _page_footer(fig, page)
+
+    return fig
+
+def _render_pagina(tarefa):
+    """
+    Monta e renderiza uma página em um worker do pool de build_pdf: devolve o PDF de uma
+    página (bytes), com a figura já fechada no pyplot do worker.
+    """
+    func, args = tarefa
+    fig = func(*args)
+    try:
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format='pdf')
+    finally:
+        plt.close(fig)
+    return buffer.getvalue()
+
+# Tabelas agregadas lidas por build_pdf (o resto do resumo_dict não precisa ir para o processo do PDF)
+CHAVES_PDF = ('kpis', 'serie_mensal', 'histograma', 'nulos_por_coluna', 'amostra', 'total_por_func',
+              'ticket_por_prod', 'vendas_por_categoria', 'quality_metrics')
+
+def build_pdf(resumo_dict, output_pdf_path, top_n_employees=10, top_n_products=12, workers=None):
+    """
+    Constrói o relatório PDF com base nos dados processados.
+    Usa só as tabelas agregadas do transform (kpis, serie_mensal, histograma,
+    nulos_por_coluna, amostra), nunca o resumo granular; se elas faltarem no dict,
+    são calculadas uma vez a partir de resumo_dict['resumo'].
+    Com workers > 1 (ou REPORT_WORKERS) cada página é montada e renderizada em PDF em um
+    processo do pool, recebendo só os dados de que precisa; aqui as páginas prontas só são
+    juntadas na ordem (pypdfium2, dependência do pdfplumber).
+    """
+    os.makedirs(os.path.dirname(output_pdf_path), exist_ok=True)
+    workers = workers or REPORT_WORKERS
+
+    if 'kpis' not in resumo_dict:
+        resumo_dict = {**resumo_dict, **kpi_cube(resumo_dict.get('resumo', pd.DataFrame()))}
+    kpis = resumo_dict['kpis'].to_dict('records')[0]
+    serie_mensal = resumo_dict['serie_mensal']
+    histograma = resumo_dict['histograma']
+    nulos_por_coluna = resumo_dict['nulos_por_coluna']
+    amostra = resumo_dict['amostra']
     total_por_func = resumo_dict.get('total_por_func', pd.DataFrame())
     ticket_por_prod = resumo_dict.get('ticket_por_prod', pd.DataFrame())
     vendas_por_categoria = resumo_dict.get('vendas_por_categoria', pd.DataFrame())
     quality = resumo_dict.get('quality_metrics', {})
 
-    # KPIs
-    total_vendas = resumo['valor_total'].sum() if not resumo.empty and 'valor_total' in resumo.columns else 0.0
-    n_transacoes = len(resumo)
-    ticket_medio = resumo['valor_total'].mean() if not resumo.empty and 'valor_total' in resumo.columns else 0.0
-    ticket_mediano = resumo['valor_total'].median() if not resumo.empty and 'valor_total' in resumo.columns else 0.0
-    n_produtos = resumo['id_produto'].nunique() if 'id_produto' in resumo.columns else 0
-    n_funcionarios = resumo['id_empregado'].nunique() if 'id_empregado' in resumo.columns else 0
-
-    page = 1
-    with PdfPages(output_pdf_path) as pdf:
-        # --- PAGE 1: COVER + KPIs ---
-        fig = plt.figure(figsize=FIGSIZE)
-        _new_page(fig, title="Relatório de Análise de Vendas", subtitle="Desafio Técnico Bus2")
-        
-        fig.text(0.10, 0.80, "Matheus Vieira Perpetua", fontsize=SUBTITLE_FONT, color=COLOR_TEXT)
-        fig.text(0.10, 0.75, f"Data de Geração: {pd.Timestamp.now().strftime('%d/%m/%Y %H:%M')}", fontsize=TEXT_FONT, color=COLOR_TEXT)
-
-        # KPI cards (2x3 grid)
-        kpis = [
-            ("Total Vendas (R$)", total_vendas),
-            ("Transações (count)", n_transacoes),
-            ("Ticket Médio (R$)", ticket_medio),
-            ("Ticket Mediano (R$)", ticket_mediano),
-            ("Produtos Únicos", n_produtos),
-            ("Funcionários Únicos", n_funcionarios)
-        ]
-        
-        for i, (title, value) in enumerate(kpis):
-            x_start = 0.10 + (i % 3) * 0.28  # Ajusta espaçamento horizontal
-            y_start = 0.55 - (i // 3) * 0.18  # Ajusta espaçamento vertical
-            
-            fig.text(x_start, y_start + 0.04, title, fontsize=TEXT_FONT, weight='bold', color=COLOR_TEXT)
-            
-            # Formatação específica para valores
-            if "Vendas" in title or "Ticket" in title:
-                formatted_value = currency_fmt(value)
-            else:
-                formatted_value = f"{value:,}".replace(",", ".") # Formata números grandes
-            
-            fig.text(x_start, y_start, formatted_value, fontsize=SUBTITLE_FONT, weight='bold', color=COLOR_PRIMARY)
-        
-        _page_footer(fig, page)
-        pdf.savefig(fig)
-        plt.close(fig)
-        page += 1
-
-        # --- PAGE 2: Top employees (bar + table) ---
-        if not total_por_func.empty:
-            df_emp = total_por_func.copy().sort_values('total_vendas', ascending=False).head(top_n_employees)
-            # Renomear coluna para exibição no PDF se necessário
-            if 'nome_emp' in df_emp.columns: # Verifica se a coluna existe
-                df_emp.rename(columns={'nome_emp': 'Nome do Funcionário'}, inplace=True)
-            elif 'nome_empregado' in df_emp.columns:
-                df_emp.rename(columns={'nome_empregado': 'Nome do Funcionário'}, inplace=True)
-           
-            
-            names = df_emp['Nome do Funcionário'].astype(str).values
-            values = df_emp['total_vendas'].astype(float).values
-            y_pos = np.arange(len(names))
-
-            fig = plt.figure(figsize=FIGSIZE)
-            _new_page(fig, title=f"Top {top_n_employees} Funcionários por Volume de Vendas")
-
-            left, bottom, width, height = CONTENT_BOX['full']
-            ax_bar = fig.add_axes([left, bottom + 0.25, width, 0.60]) # Gráfico ocupa mais espaço
-            ax_tab = fig.add_axes([left, bottom, width, 0.20]) # Tabela abaixo do gráfico
-
-            ax_bar.barh(y_pos, values, align='center', color=COLOR_PRIMARY)
-            ax_bar.invert_yaxis()
-            ax_bar.set_yticks(y_pos)
-            ax_bar.set_yticklabels(names, fontsize=LABEL_FONT, color=COLOR_TEXT)
-            ax_bar.set_xlabel("Tabela top 5 Vendas (R$) por funcionário", fontsize=LABEL_FONT, color=COLOR_TEXT)
-            ax_bar.xaxis.set_major_formatter(FuncFormatter(currency_fmt))
-            ax_bar.tick_params(axis='x', colors=COLOR_TEXT)
-            ax_bar.tick_params(axis='y', colors=COLOR_TEXT)
-            ax_bar.spines['top'].set_visible(False)
-            ax_bar.spines['right'].set_visible(False)
-            ax_bar.spines['left'].set_color(COLOR_LIGHT_GRAY)
-            ax_bar.spines['bottom'].set_color(COLOR_LIGHT_GRAY)
-            ax_bar.grid(axis='x', linestyle='--', alpha=0.7, color=COLOR_LIGHT_GRAY)
-
-            if len(values) > 0:
-                ax_bar.set_xlim(0, max(values) * 1.15) # Aumenta o limite para rótulos externos
-            _annotate_barh(ax_bar, y_pos, values, fmt_func=currency_fmt, inside_threshold=0.14)
-
-            # Tabela top 5 (separada para melhor formatação)
-            t5 = df_emp.head(5)[['Nome do Funcionário', 'total_vendas']].copy()
-            t5['total_vendas'] = t5['total_vendas'].apply(lambda x: currency_fmt(x))
-            
-            ax_tab.axis('off')
-            table = ax_tab.table(cellText=t5.values, colLabels=t5.columns, cellLoc='center', loc='center', bbox=[0, 0, 1, 1])
-            table.auto_set_font_size(False)
-            table.set_fontsize(TABLE_FONT)
-            table.scale(1, 1.5) # Aumenta altura das células
-            
-            for (row, col), cell in table.get_celld().items():
-                cell.set_height(0.15) # Ajusta altura da célula
-                cell.set_text_props(color=COLOR_TEXT)
-                cell.set_edgecolor(COLOR_LIGHT_GRAY)
-                if row == 0: # Cabeçalho
-                    cell.set_facecolor(COLOR_PRIMARY)
-                    cell.set_text_props(weight='bold', color='white')
-                else:
-                    cell.set_facecolor('white')
-
-            _page_footer(fig, page)
-            pdf.savefig(fig)
-            plt.close(fig)
-            page += 1
-
-        # --- PAGE 3: Ticket medio por produto (bar + histogram) ---
-        if not ticket_por_prod.empty:
-            df_ticket = ticket_por_prod.copy().sort_values('ticket_medio', ascending=False).head(top_n_products)
-            if 'nome_prod' in df_ticket.columns:
-                df_ticket.rename(columns={'nome_prod': 'Nome do Produto'}, inplace=True)
-            elif 'nome_produto' in df_ticket.columns:
-                df_ticket.rename(columns={'nome_produto': 'Nome do Produto'}, inplace=True)
-
-            names = df_ticket['Nome do Produto'].astype(str).values
-            vals = df_ticket['ticket_medio'].astype(float).values
-            y_pos = np.arange(len(names))
-
-            fig = plt.figure(figsize=FIGSIZE3)
-            _new_page(fig, title=f"Top {top_n_products} Produtos por Ticket Médio")
-
-            left, bottom, width, height = CONTENT_BOX['full']
-            ax_top = fig.add_axes([left, bottom + 0.33, width, 0.50]) # Gráfico ocupa mais espaço
-            ax_hist = fig.add_axes([left, bottom + 0.00, width, 0.25]) # Histograma abaixo
-
-            # BARRAS HORIZONTAIS (ticket médio)
-            ax_top.barh(y_pos, vals, align='center', color=COLOR_PRIMARY)
-            ax_top.invert_yaxis()
-            ax_top.set_yticks(y_pos)
-            ax_top.set_yticklabels(names, fontsize=LABEL_FONT, color=COLOR_TEXT)
-            ax_top.set_xlabel("Ticket Médio (R$)", fontsize=LABEL_FONT, color=COLOR_TEXT)
-            ax_top.xaxis.set_major_formatter(FuncFormatter(currency_fmt))
-            ax_top.tick_params(axis='x', colors=COLOR_TEXT)
-            ax_top.tick_params(axis='y', colors=COLOR_TEXT)
-            ax_top.spines['top'].set_visible(False)
-            ax_top.spines['right'].set_visible(False)
-            ax_top.spines['left'].set_color(COLOR_LIGHT_GRAY)
-            ax_top.spines['bottom'].set_color(COLOR_LIGHT_GRAY)
-            ax_top.grid(axis='x', linestyle='--', alpha=0.7, color=COLOR_LIGHT_GRAY)
-
-            if len(vals) > 0:
-                ax_top.set_xlim(0, max(vals) * 2)
-            _annotate_barh(ax_top, y_pos, vals, fmt_func=currency_fmt, inside_threshold=0.12)
-            ax_top.set_title(f"Ticket Médio por Produto", fontsize=SUBTITLE_FONT, color=COLOR_TEXT)
-
-            # HISTOGRAMA (distribuição)
-            ax_hist.hist(resumo['valor_total'].dropna(), bins=30, color=COLOR_SECONDARY, edgecolor='white')
-            ax_hist.set_title("Distribuição de Valor por Transação", fontsize=SUBTITLE_FONT, color=COLOR_TEXT)
-            ax_hist.set_xlabel("Valor Total (R$)", fontsize=LABEL_FONT, color=COLOR_TEXT)
-            ax_hist.set_ylabel("Frequência", fontsize=LABEL_FONT, color=COLOR_TEXT)
-            ax_hist.xaxis.set_major_formatter(FuncFormatter(currency_fmt))
-            ax_hist.tick_params(axis='x', rotation=0, colors=COLOR_TEXT)
-            ax_hist.tick_params(axis='y', colors=COLOR_TEXT)
-            ax_hist.spines['top'].set_visible(False)
-            ax_hist.spines['right'].set_visible(False)
-            ax_hist.spines['left'].set_color(COLOR_LIGHT_GRAY)
-            ax_hist.spines['bottom'].set_color(COLOR_LIGHT_GRAY)
-            ax_hist.grid(axis='y', linestyle='--', alpha=0.7, color=COLOR_LIGHT_GRAY)
-
-            _page_footer(fig, page)
-            pdf.savefig(fig)
-            plt.close(fig)
-            page += 1
-
-        # --- PAGE 4: Vendas por categoria (padronizado) ---
-        if not vendas_por_categoria.empty:
-            vc = vendas_por_categoria.sort_values('valor_total', ascending=False) 
-            if 'categoria' in vc.columns: # Verifica se a coluna existe
-                vc.rename(columns={'categoria': 'Categoria'}, inplace=True)
-            if 'valor_total' in vc.columns: 
-                vc.rename(columns={'valor_total': 'Valor Total'}, inplace=True)
-
-            fig = plt.figure(figsize=FIGSIZE)
-            _new_page(fig, title="Vendas por Categoria de Produto")
-
-            left, bottom, width, height = CONTENT_BOX['full']
-            ax1 = fig.add_axes([left, bottom + 0.15, width * 0.60, 0.70]) # Gráfico de barras maior
-            ax2 = fig.add_axes([left + width * 0.65, bottom + 0.25, width * 0.30, 0.50]) # Gráfico de pizza menor
-
-            ax1.bar(vc['Categoria'].astype(str), vc['Valor Total'], color=COLOR_PRIMARY)
-            ax1.set_xticklabels(vc['Categoria'].astype(str), rotation=45, ha='right', fontsize=LABEL_FONT, color=COLOR_TEXT)
-            ax1.set_ylabel("Valor (R$)", fontsize=LABEL_FONT, color=COLOR_TEXT)
-            ax1.yaxis.set_major_formatter(FuncFormatter(currency_fmt))
-            ax1.tick_params(axis='x', colors=COLOR_TEXT)
-            ax1.tick_params(axis='y', colors=COLOR_TEXT)
-            ax1.spines['top'].set_visible(False)
-            ax1.spines['right'].set_visible(False)
-            ax1.spines['left'].set_color(COLOR_LIGHT_GRAY)
-            ax1.spines['bottom'].set_color(COLOR_LIGHT_GRAY)
-            ax1.grid(axis='y', linestyle='--', alpha=0.7, color=COLOR_LIGHT_GRAY)
-            #ax1.set_title("Total de Vendas por Categoria", fontsize=SUBTITLE_FONT, color=COLOR_TEXT)
-
-            # Gráfico de pizza
-            wedges, texts, autotexts = ax2.pie(vc['Valor Total'], labels=vc['Categoria'], autopct='%1.1f%%', startangle=90, 
-                                            textprops={'fontsize': LABEL_FONT, 'color': COLOR_TEXT}, 
-                                            colors=plt.cm.Paired.colors) # Usando um colormap diferente
-            for autotext in autotexts:
-                autotext.set_color('white') # Cor do texto dentro das fatias
-            ax2.set_title("Participação de Vendas por Categoria", fontsize=SUBTITLE_FONT, color=COLOR_TEXT)
-
-            _page_footer(fig, page)
-            pdf.savefig(fig)
-            plt.close(fig)
-            page += 1
-
-        # --- PAGE 5: Série temporal (padronizado) ---
-        if 'data' in resumo.columns:
-            tmp = resumo.copy()
-            tmp['data'] = pd.to_datetime(tmp['data'], errors='coerce')
-            tmp = tmp.dropna(subset=['data'])
-            if not tmp.empty:
-                series = tmp.set_index('data').resample('M')['valor_total'].sum() 
-                fig = plt.figure(figsize=FIGSIZE)
-                _new_page(fig, title="Evolução Mensal das Vendas")
-
-                left, bottom, width, height = CONTENT_BOX['full']
-                ax = fig.add_axes([left, bottom + 0.15, width, 0.70])
-                ax.plot(series.index, series.values, marker='o', linewidth=2, color=COLOR_PRIMARY, markersize=5)
-                ax.set_xlabel("Mês", fontsize=LABEL_FONT, color=COLOR_TEXT)
-                ax.set_ylabel("Valor Total (R$)", fontsize=LABEL_FONT, color=COLOR_TEXT)
-                ax.yaxis.set_major_formatter(FuncFormatter(currency_fmt))
-                ax.tick_params(axis='x', colors=COLOR_TEXT)
-                ax.tick_params(axis='y', colors=COLOR_TEXT)
-                ax.spines['top'].set_visible(False)
-                ax.spines['right'].set_visible(False)
-                ax.spines['left'].set_color(COLOR_LIGHT_GRAY)
-                ax.spines['bottom'].set_color(COLOR_LIGHT_GRAY)
-                ax.grid(True, linestyle='--', alpha=0.7, color=COLOR_LIGHT_GRAY)
-
-                _page_footer(fig, page)
+    # Plano do relatório: (função da página, dados), na ordem final; a numeração sai daqui
+    plano = [(_pagina_capa, (kpis,))]
+    if not total_por_func.empty:
+        plano.append((_pagina_funcionarios, (total_por_func, top_n_employees)))
+    if not ticket_por_prod.empty:
+        plano.append((_pagina_produtos, (ticket_por_prod, histograma, top_n_products)))
+    if not vendas_por_categoria.empty:
+        plano.append((_pagina_categorias, (vendas_por_categoria,)))
+    if not serie_mensal.empty:
+        plano.append((_pagina_serie, (serie_mensal,)))
+    plano.append((_pagina_qualidade, (quality, kpis, nulos_por_coluna)))
+    if not amostra.empty:
+        plano.append((_pagina_amostra, (amostra,)))
+    tarefas = [(func, (page,) + args) for page, (func, args) in enumerate(plano, start=1)]
+
+    if workers > 1:
+        import pypdfium2 as pdfium
+
+        documento = pdfium.PdfDocument.new()
+        # map devolve na ordem das tarefas, mesmo que as páginas terminem fora de ordem
+        with ProcessPoolExecutor(max_workers=min(workers, len(tarefas))) as pool:
+            for dados in pool.map(_render_pagina, tarefas):
+                documento.import_pages(pdfium.PdfDocument(dados))
+        documento.save(output_pdf_path)
+    else:
+        with PdfPages(output_pdf_path) as pdf:
+            for func, args in tarefas:
+                fig = func(*args)
                 pdf.savefig(fig)
                 plt.close(fig)
-                page += 1
-
-        # --- PAGE 6: Qualidade dos dados (texto formatado e sem sobreposição) ---
-        fig = plt.figure(figsize=FIGSIZE)
-        _new_page(fig, title="Qualidade dos Dados - Resumo")
-        left, bottom, width, height = CONTENT_BOX['full']
-        ax_text = fig.add_axes([left + 0.01, bottom + 0.02, width - 0.02, height - 0.15])
-        ax_text.axis('off')
-
-        lines = []
-        lines.append("**Métricas de Qualidade dos Dados:**\n")
-        if quality:
-            for k,v in quality.items():
-                lines.append(f"- **{k}:** {v:,}" if isinstance(v, int) else f"- **{k}:** {v}")
-        else:
-            if not resumo.empty:
-                missing = {c: int(resumo[c].isna().sum()) for c in resumo.columns}
-                dup_v = int(resumo.duplicated().sum())
-                lines.append(f"- **Total de registros no resumo:** {len(resumo):,}")
-                lines.append(f"- **Registros duplicados (resumo):** {dup_v:,}")
-                lines.append("\n**Contagem de Valores Ausentes por Coluna (Top 12):**")
-                nonzero = [(c,n) for c,n in missing.items() if n>0]
-                if nonzero:
-                    for c,n in nonzero[:12]:
-                        lines.append(f"  - **{c}:** {n:,}")
-                else:
-                    for c,n in list(missing.items())[:12]:
-                        lines.append(f"  - **{c}:** {n:,}")
-            else:
-                lines.append("- Não há dados no resumo para análise de qualidade.")
-        
-        # Usar text_wrap para quebrar linhas automaticamente
-        text_content = "\n".join(lines).replace(",", ".") # Substitui vírgula por ponto para números grandes
-        ax_text.text(0, 1, text_content, fontsize=TEXT_FONT, family='monospace', va='top', wrap=True, color=COLOR_TEXT)
-        
-        _page_footer(fig, page)
-        pdf.savefig(fig)
-        plt.close(fig)
-        page += 1
-
-        # --- PAGE 7: Amostra registros (tabela) ---
-        if not resumo.empty:
-            sample = resumo.head(12).copy()
-            cols_priority = ['id_venda','data','id_produto','id_empregado','quantidade','valor_unitario','valor_total','nome_emp','nome_prod','categoria'] 
-            cols = [c for c in cols_priority if c in sample.columns]
-            sample = sample[cols]
-            
-            # Formatação de valores monetários e datas
-            for col in ['valor_unitario','valor_total']:
-                if col in sample.columns:
-                    sample[col] = sample[col].apply(lambda x: currency_fmt(x) if pd.notna(x) else "")
-            if 'quantidade' in sample.columns:
-                sample['quantidade'] = sample['quantidade'].apply(lambda x: f"{int(x):,}".replace(",", ".") if pd.notna(x) else "")
-            if 'data' in sample.columns:
-                sample['data'] = pd.to_datetime(sample['data'], errors='coerce').dt.strftime('%d/%m/%Y').fillna('')
-
-            fig = plt.figure(figsize=FIGSIZE)
-            _new_page(fig, title="Amostra de Registros (Dados Transformados)")
-            left, bottom, width, height = CONTENT_BOX['full']
-            ax_table = fig.add_axes([left, bottom, width, height])
-            ax_table.axis('off')
-            
-            # Ajustes para a tabela
-            table = ax_table.table(cellText=sample.values, colLabels=sample.columns, cellLoc='center', loc='center', bbox=[0, 0, 1, 1])
-            table.auto_set_font_size(False)
-            table.set_fontsize(TABLE_FONT)
-            table.scale(1, 1.5) # Aumenta altura das células
-            
-            for (row, col), cell in table.get_celld().items():
-                cell.set_height(0.15) # Ajusta altura da célula
-                cell.set_text_props(color=COLOR_TEXT)
-                cell.set_edgecolor(COLOR_LIGHT_GRAY)
-                if row == 0: # Cabeçalho
-                    cell.set_facecolor(COLOR_PRIMARY)
-                    cell.set_text_props(weight='bold', color='white')
-                else:
-                    cell.set_facecolor('white')
-
-            _page_footer(fig, page)
-            pdf.savefig(fig)
-            plt.close(fig)
-            page += 1
 
     print(f"PDF gerado: {output_pdf_path}")
@@ -0,0 +1,99 @@
+# src/schema.py
+import pandas as pd
+from pandas.api.types import is_datetime64_any_dtype
+
+# Schema declarado dos CSVs brutos.
+# - textos repetitivos (nomes, cargo, categoria) viram 'category'
+# - ids e quantidades usam inteiros de 32 bits anuláveis ('Int32'): os CSVs trazem
+#   ids/quantidades ausentes e o transform precisa enxergar esses NA
+# - valores monetários ficam em float64: float32 não representa centavos com exatidão
+#   e os totais somados divergiriam dos atuais
+# - datas são convertidas uma única vez, aqui na extração
+# - 'chave': id único das dimensões (carga por diferença de hash, ver dimensoes.py)
+SCHEMAS = {
+    'empregados': {
+        'arquivo': 'empregados.csv',
+        'chave': 'id_empregado',
+        'colunas': {
+            'id_empregado': 'Int32',
+            'nome': 'category',
+            'cargo': 'category',
+            'idade': 'Int8',
+        },
+    },
+    'produtos': {
+        'arquivo': 'produtos.csv',
+        'chave': 'id_produto',
+        'colunas': {
+            'id_produto': 'Int32',
+            'nome': 'category',
+            'preco': 'float64',
+            'categoria': 'category',
+        },
+    },
+    'vendas': {
+        'arquivo': 'vendas.csv',
+        'colunas': {
+            'id_venda': 'Int32',
+            'data': 'datetime64[ns]',
+            'id_produto': 'Int32',
+            'id_empregado': 'Int32',
+            'quantidade': 'Int32',
+            'valor_unitario': 'float64',
+            'valor_total': 'float64',
+        },
+    },
+}
+
+# Procedência de cada venda, acrescentada pela extração (extract.ler_vendas), não vem do CSV:
+# arquivo de origem (relativo à pasta dos CSVs) e linha dentro dele. O transform descarta as
+# duas antes de deduplicar, para a mesma venda em arquivos diferentes continuar duplicada.
+COLUNAS_ORIGEM = {
+    'arquivo_origem': 'category',
+    'linha_origem': 'int32',
+}
+
+
+def _dtypes_leitura(nome):
+    """Dtypes que podem ir direto para o read_csv (texto -> category) sem risco de erro."""
+    return {c: t for c, t in SCHEMAS[nome]['colunas'].items() if t == 'category'}
+
+
+def aplicar_schema(df, nome):
+    """
+    Converte as colunas de `df` para os tipos declarados em SCHEMAS[nome].
+    Numéricos inválidos viram NA (em vez de quebrar a leitura) e datas inválidas viram NaT.
+    Colunas já no tipo correto não são convertidas de novo.
+    """
+    df.columns = df.columns.str.strip()
+    for col, tipo in SCHEMAS[nome]['colunas'].items():
+        if col not in df.columns or str(df[col].dtype) == tipo:
+            continue
+        if tipo == 'category':
+            df[col] = df[col].astype('category')
+        elif tipo.startswith('datetime'):
+            if not is_datetime64_any_dtype(df[col]):
+                df[col] = pd.to_datetime(df[col], errors='coerce')
+        else:
+            valores = pd.to_numeric(df[col], errors='coerce')
+            if tipo.startswith('Int'):
+                # '49.0' -> 49; valores com parte fracionária viram NA
+                inteiros = valores.round()
+                valores = valores.where(inteiros == valores)
+            df[col] = valores.astype(tipo)
+    return df
+
+
+def read_csv_tipado(path, nome, engine=None, chunksize=None):
+    """
+    Lê um CSV bruto aplicando o schema declarado.
+    engine='pyarrow' usa o parser multithread do pyarrow (não suporta chunksize;
+    nesse caso o parser padrão é usado).
+    Com chunksize retorna um iterador de DataFrames já tipados.
+    """
+    kwargs = {'dtype': _dtypes_leitura(nome)}
+    if engine and not chunksize:
+        kwargs['engine'] = engine
+    if chunksize:
+        return (aplicar_schema(chunk, nome) for chunk in pd.read_csv(path, chunksize=chunksize, **kwargs))
+    return aplicar_schema(pd.read_csv(path, **kwargs), nome)
@@ -1,46 +1,29 @@
 # src/transform.py
-import pandas as pd
+import logging
 
-def transform_data(emp, prod, vendas):
-    """
-    Transformações específicas para os CSVs fornecidos:
-    - emp: empregados.csv (id_empregado, nome, cargo, idade)
-    - prod: produtos.csv (id_produto, nome, preco, categoria)
-    - vendas: vendas.csv (id_venda, data, id_produto, id_empregado, quantidade, valor_unitario, valor_total)
-    Retorna um dict com DataFrames: resumo, total_por_func, ticket_por_prod, vendas_por_categoria, top5
-    """
+import numpy as np
+import pandas as pd
+from pandas.api.extensions import take
+from pandas.api.types import is_datetime64_any_dtype, is_integer_dtype
 
-    # dentro transform_data, após limpeza e antes do return
-    quality_metrics = {
-    'vendas_original_rows': len(vendas),
-    'vendas_after_dedup': len(vendas.drop_duplicates()),
-    'vendas_missing_id_empregado': int(vendas['id_empregado'].isna().sum()) if 'id_empregado' in vendas.columns else 0,
-    'vendas_missing_id_produto': int(vendas['id_produto'].isna().sum()) if 'id_produto' in vendas.columns else 0,
-    'vendas_negative_qty': int((vendas['quantidade'] < 0).sum()),
-    'vendas_negative_price': int((vendas['valor_unitario'] < 0).sum())
-}
-    # no return, incluir 'quality_metrics': quality_metrics
+from schema import COLUNAS_ORIGEM
+from sketch import QuantilSketch
+from validacao import validar_vendas, contar_falhas, somar_contagens, quarentena
 
 
+def _preparar_dimensoes(emp, prod):
+    """Limpa as dimensões (empregados/produtos) e padroniza chaves e nomes de colunas."""
     # Trabalhar em cópias para evitar SettingWithCopyWarning
     emp = emp.copy()
     prod = prod.copy()
-    vendas = vendas.copy()
 
     # Normalizar nomes (remover espaços)
     emp.columns = emp.columns.str.strip()
     prod.columns = prod.columns.str.strip()
-    vendas.columns = vendas.columns.str.strip()
 
     # Limpar duplicados
     emp = emp.drop_duplicates().reset_index(drop=True)
     prod = prod.drop_duplicates().reset_index(drop=True)
-    vendas = vendas.drop_duplicates().reset_index(drop=True)
-
-    # Garantir tipos numéricos nas colunas críticas
-    vendas['quantidade'] = pd.to_numeric(vendas['quantidade'], errors='coerce').fillna(0)
-    vendas['valor_unitario'] = pd.to_numeric(vendas['valor_unitario'], errors='coerce').fillna(0)
-    vendas['valor_total'] = pd.to_numeric(vendas['valor_total'], errors='coerce').fillna(0)
 
     # Padronizar chaves para merge: vamos usar id_empregado, id_produto nas vendas
     # Nos datasets emp/prod, renomear colunas id para 'id_empregado' / 'id_produto' se necessário
@@ -61,42 +44,564 @@ def transform_data(emp, prod, vendas):
     # para evitar colisões após merge
     emp = emp.rename(columns={col:('nome_emp' if col.lower()=='nome' else col) for col in emp.columns})
     prod = prod.rename(columns={col:('nome_prod' if col.lower()=='nome' else col) for col in prod.columns})
+    return emp, prod
 
-    # Merge das tabelas
-    # vendas.id_empregado -> emp.id_empregado
-    df = vendas.merge(emp, left_on='id_empregado', right_on='id_empregado', how='left', suffixes=('','_emp'))
-    df = df.merge(prod, left_on='id_produto', right_on='id_produto', how='left', suffixes=('','_prod'))
+
+def _sem_origem(vendas):
+    """Vendas sem as colunas de procedência da extração (a mesma venda em dois arquivos é duplicada)."""
+    origem = [c for c in COLUNAS_ORIGEM if c in vendas.columns]
+    return vendas.drop(columns=origem) if origem else vendas
+
+
+def _origem(vendas):
+    """Só as colunas de procedência (para a quarentena), ou None se as vendas não as tiverem."""
+    origem = [c for c in COLUNAS_ORIGEM if c in vendas.columns]
+    return vendas[origem] if origem else None
+
+
+def _coagir_numericos(vendas, coagidos=None):
+    """
+    Garante tipos numéricos nas colunas críticas (valores inválidos viram 0).
+    coagidos: colunas já convertidas pela validação (validar_vendas), alinhadas a `vendas`.
+    """
+    coagidos = coagidos or {}
+    for col in ['quantidade', 'valor_unitario', 'valor_total']:
+        valores = coagidos[col] if col in coagidos else pd.to_numeric(vendas[col], errors='coerce')
+        valores = valores.fillna(0)
+        # sem NA após o fillna: volta do tipo anulável (ex.: Int32) para o numpy equivalente
+        if isinstance(valores.dtype, pd.api.extensions.ExtensionDtype):
+            valores = valores.astype(valores.dtype.numpy_dtype)
+        vendas[col] = valores
+    return vendas
+
+
+class IndiceDimensao:
+    """
+    Índice de uma dimensão (empregados ou produtos) pela chave inteira, para enriquecer
+    vendas sem merge: cada id da venda vira uma posição na dimensão e cada atributo é
+    copiado com um único take posicional.
+    Ids pequenos (o caso normal: 1..n) usam uma tabela densa id -> posição; ids esparsos
+    ou negativos usam a busca do pd.Index. Ids sem correspondência na dimensão recebem
+    atributos nulos (como no merge left) e são somados em n_desconhecidos.
+    """
+
+    # tabela densa enquanto o maior id for até DENSO_FATOR vezes o tamanho da dimensão
+    DENSO_FATOR = 16
+
+    def __init__(self, dim, chave):
+        self.chave = chave
+        self.colunas = [c for c in dim.columns if c != chave]
+        # arrays dos atributos (extensões como Categorical/Int8 mantêm o dtype no take)
+        self.valores = {c: dim[c].array if isinstance(dim[c].dtype, pd.api.extensions.ExtensionDtype) else dim[c].to_numpy()
+                        for c in self.colunas}
+        self.n_desconhecidos = 0
+        ids = dim[chave].to_numpy(dtype='int64')
+        self.tabela = self.indice = None
+        if len(ids) and ids.min() >= 0 and ids.max() < self.DENSO_FATOR * len(ids) + 1024:
+            self.tabela = np.full(ids.max() + 1, -1, dtype=np.intp)
+            self.tabela[ids] = np.arange(len(ids))
+        else:
+            self.indice = pd.Index(ids)
+
+    @classmethod
+    def criar(cls, dim, chave):
+        """Índice da dimensão, ou None se a chave não for inteira, única e sem nulos (aí usa-se o merge)."""
+        if chave not in dim.columns:
+            return None
+        ids = dim[chave]
+        if not is_integer_dtype(ids.dtype) or ids.isna().any() or not ids.is_unique:
+            return None
+        return cls(dim, chave)
+
+    def posicoes(self, ids, contar=True):
+        """Posição de cada id na dimensão (-1 para id nulo ou inexistente); contar=False não soma n_desconhecidos."""
+        if is_integer_dtype(ids.dtype):
+            presentes = ids.notna().to_numpy()
+            validos = presentes
+            chaves = ids.to_numpy(dtype='int64', na_value=-1)
+        else:
+            v = pd.to_numeric(ids, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+            presentes = ~np.isnan(v)
+            # só valores inteiros finitos podem casar com a chave (NaN/inf/fracionários ficam de fora)
+            validos = np.isfinite(v) & (v == np.floor(v))
+            chaves = np.where(validos, v, -1).astype('int64')
+        if self.tabela is not None:
+            dentro = validos & (chaves >= 0) & (chaves < len(self.tabela))
+            pos = np.where(dentro, self.tabela[np.clip(chaves, 0, len(self.tabela) - 1)], -1)
+        else:
+            pos = np.full(len(chaves), -1, dtype=np.intp)
+            pos[validos] = self.indice.get_indexer(chaves[validos])
+        if contar:
+            self.n_desconhecidos += int((presentes & (pos < 0)).sum())
+        return pos
+
+    def atributos(self, ids, colunas=None):
+        """Dict coluna -> array do atributo alinhado aos `ids` (só as `colunas` pedidas; padrão: todas)."""
+        pos = self.posicoes(ids)
+        faltando = bool((pos < 0).any())
+        return {c: take(self.valores[c], pos, allow_fill=faltando) for c in (colunas or self.colunas)}
+
+
+def _indices_dimensoes(emp, prod):
+    """Índices (empregados, produtos) para _enriquecer, ou None se alguma chave não permitir."""
+    idx_emp = IndiceDimensao.criar(emp, 'id_empregado')
+    idx_prod = IndiceDimensao.criar(prod, 'id_produto')
+    if idx_emp is None or idx_prod is None:
+        return None
+    return idx_emp, idx_prod
+
+
+def _orfaos(vendas, emp, prod, indices=None):
+    """Máscaras produto_orfao/empregado_orfao (id nulo ou fora da dimensão) para validar_vendas."""
+    if indices is not None:
+        idx_emp, idx_prod = indices
+        return {'empregado_orfao': idx_emp.posicoes(vendas['id_empregado'], contar=False) < 0,
+                'produto_orfao': idx_prod.posicoes(vendas['id_produto'], contar=False) < 0}
+    return {'empregado_orfao': ~vendas['id_empregado'].isin(emp['id_empregado'].dropna()).to_numpy(),
+            'produto_orfao': ~vendas['id_produto'].isin(prod['id_produto'].dropna()).to_numpy()}
+
+
+def _avisar_desconhecidos(indices):
+    """Loga as vendas cujos ids não existem nas dimensões (ficam com atributos nulos)."""
+    if indices is None:
+        return
+    for idx, dim in zip(indices, ('empregados', 'produtos')):
+        if idx.n_desconhecidos:
+            logging.warning(f"{idx.n_desconhecidos} vendas com {idx.chave} inexistente em {dim}.")
+
+
+def _enriquecer(vendas, emp, prod, indices=None):
+    """
+    Junta as vendas com as dimensões e completa valor_total quando ausente.
+    Com `indices` (ver _indices_dimensoes) os atributos são copiados por posição, sem merge
+    e sem copiar as colunas das vendas; o resultado é o mesmo do merge left.
+    """
+    if indices is not None:
+        df = vendas.copy(deep=False)
+        df.index = pd.RangeIndex(len(df))
+        for idx, sufixo in zip(indices, ('_emp', '_prod')):
+            for c, valores in idx.atributos(df[idx.chave]).items():
+                # mesmos sufixos do merge em caso de colisão de nomes
+                df[c + sufixo if c in df.columns else c] = valores
+    else:
+        # Merge das tabelas
+        # vendas.id_empregado -> emp.id_empregado
+        df = vendas.merge(emp, left_on='id_empregado', right_on='id_empregado', how='left', suffixes=('','_emp'))
+        df = df.merge(prod, left_on='id_produto', right_on='id_produto', how='left', suffixes=('','_prod'))
 
     # Se valor_total não existir ou estiver zerado, calcula a partir de quantidade * valor_unitario
     if 'valor_total' not in df.columns or df['valor_total'].isna().all() or (df['valor_total']==0).all():
         df['valor_total'] = df['quantidade'] * df['valor_unitario']
+    return df
 
-    # KPI: total de vendas por funcionário
+
+def _agregar_parcial(df):
+    """
+    Calcula as somas parciais dos KPIs sobre um bloco de vendas enriquecidas.
+    As parciais de vários blocos são fundidas em _somar_parciais e combinadas em _combinar_parciais.
+    """
     # usar 'nome_emp' se existir, senão usar coluna 'nome' que pode existir
     nome_emp_col = 'nome_emp' if 'nome_emp' in df.columns else next((c for c in df.columns if 'nome' in c.lower()), None)
-    total_por_func = df.groupby(['id_empregado', nome_emp_col])['valor_total'].sum().reset_index().rename(columns={'valor_total':'total_vendas', nome_emp_col:'nome_emp'})
+    parciais = {
+        'func': df.groupby(['id_empregado', nome_emp_col], observed=True)['valor_total'].sum().reset_index().rename(columns={'valor_total':'total_vendas', nome_emp_col:'nome_emp'}),
+        'prod_valor': df.groupby(['id_produto', 'nome_prod'], observed=True)['valor_total'].sum().reset_index(),
+        'prod_qt': df.groupby('id_produto', observed=True)['quantidade'].sum().reset_index().rename(columns={'quantidade':'total_qt'}),
+    }
+    if 'categoria' in df.columns:
+        parciais['categoria'] = df.groupby('categoria', observed=True)['valor_total'].sum().reset_index()
+    return parciais
+
+
+# Chaves e valor somado de cada parcial de _agregar_parcial
+_CHAVES_PARCIAIS = {
+    'func': (['id_empregado', 'nome_emp'], 'total_vendas'),
+    'prod_valor': (['id_produto', 'nome_prod'], 'valor_total'),
+    'prod_qt': (['id_produto'], 'total_qt'),
+    'categoria': (['categoria'], 'valor_total'),
+}
+
+
+def _somar_parciais(acumulado, parciais):
+    """Funde as `parciais` de um bloco no `acumulado` (mesmo formato, uma linha por chave)."""
+    if acumulado is None:
+        return parciais
+    soma = {}
+    for chave in acumulado.keys() | parciais.keys():
+        partes = [p[chave] for p in (acumulado, parciais) if chave in p]
+        chaves, valor = _CHAVES_PARCIAIS[chave]
+        soma[chave] = pd.concat(partes, ignore_index=True).groupby(chaves, observed=True)[valor].sum().reset_index()
+    return soma
+
+
+def _combinar_parciais(lista_parciais):
+    """Soma as parciais de todos os blocos e monta os DataFrames finais de KPIs."""
+    def _juntar(chave):
+        partes = [p[chave] for p in lista_parciais if chave in p]
+        return pd.concat(partes, ignore_index=True) if partes else None
+
+    func = _juntar('func')
+    # KPI: total de vendas por funcionário
+    total_por_func = func.groupby(['id_empregado', 'nome_emp'], observed=True)['total_vendas'].sum().reset_index()
 
     # Ticket médio por produto = total_venda_por_produto / total_quantidade_vendida
-    ticket_sum = df.groupby(['id_produto', 'nome_prod'])['valor_total'].sum().reset_index()
-    vendas_qt = df.groupby('id_produto')['quantidade'].sum().reset_index().rename(columns={'quantidade':'total_qt'})
+    ticket_sum = _juntar('prod_valor').groupby(['id_produto', 'nome_prod'], observed=True)['valor_total'].sum().reset_index()
+    vendas_qt = _juntar('prod_qt').groupby('id_produto', observed=True)['total_qt'].sum().reset_index()
     ticket_por_prod = ticket_sum.merge(vendas_qt, on='id_produto')
     ticket_por_prod['ticket_medio'] = ticket_por_prod['valor_total'] / ticket_por_prod['total_qt'].replace({0:1})
 
     # Vendas por categoria (produtos tem coluna 'categoria')
-    if 'categoria' in df.columns:
-        vendas_por_categoria = df.groupby('categoria')['valor_total'].sum().reset_index().rename(columns={'valor_total':'valor_total'})
+    categoria = _juntar('categoria')
+    if categoria is not None:
+        vendas_por_categoria = categoria.groupby('categoria', observed=True)['valor_total'].sum().reset_index()
     else:
         vendas_por_categoria = pd.DataFrame(columns=['categoria','valor_total'])
 
     # Top 5 funcionários por volume de vendas
     top5 = total_por_func.sort_values('total_vendas', ascending=False).head(5)
 
-    # Resumo granular (linhas de vendas enriquecidas)
-    resumo = df.copy()
+    return {
+        'total_por_func': total_por_func,
+        'ticket_por_prod': ticket_por_prod,
+        'vendas_por_categoria': vendas_por_categoria,
+        'top5': top5
+    }
+
+
+def _agrega_por_id(emp, prod):
+    """
+    True se os KPIs podem ser agregados só pelas chaves inteiras (caminho rápido):
+    ids únicos e sem nulos nas dimensões, então nome/categoria dependem só do id.
+    """
+    return ('nome_emp' in emp.columns and 'nome_prod' in prod.columns
+            and emp['id_empregado'].notna().all() and emp['id_empregado'].is_unique
+            and prod['id_produto'].notna().all() and prod['id_produto'].is_unique)
+
+
+def _agregar_parcial_por_id(df):
+    """
+    Caminho rápido de _agregar_parcial: uma única passada agrupada por chave inteira
+    (funcionário e produto), com agregação nomeada. Nomes e categorias são anexados
+    depois, nas poucas linhas agregadas (ver _combinar_parciais_por_id).
+    """
+    return {
+        'func': df.groupby('id_empregado', observed=True).agg(total_vendas=('valor_total', 'sum')),
+        # total_qt em int64: a soma de muitos blocos não pode estourar o int32 de quantidade
+        'prod': df.groupby('id_produto', observed=True).agg(valor_total=('valor_total', 'sum'), total_qt=('quantidade', 'sum')).astype({'total_qt': 'int64'}),
+    }
+
+
+def _somar_parciais_por_id(acumulado, parciais):
+    """Funde as parciais do caminho rápido de um bloco no `acumulado` (somas por id)."""
+    if acumulado is None:
+        return parciais
+    return {chave: pd.concat([acumulado[chave], parciais[chave]]).groupby(level=0).sum() for chave in ('func', 'prod')}
+
+
+def _combinar_parciais_por_id(lista_parciais, emp, prod):
+    """Soma as parciais do caminho rápido e anexa os atributos das dimensões (mesmas saídas de _combinar_parciais)."""
+    func = pd.concat([p['func'] for p in lista_parciais]).groupby(level=0).sum()
+    por_prod = pd.concat([p['prod'] for p in lista_parciais]).groupby(level=0).sum()
+
+    # KPI: total de vendas por funcionário (sem nome -> fora, como no groupby por nome)
+    nomes_emp = emp.set_index('id_empregado')['nome_emp']
+    total_por_func = func.join(nomes_emp, how='inner').dropna(subset=['nome_emp'])
+    total_por_func = total_por_func.rename_axis('id_empregado').reset_index()[['id_empregado', 'nome_emp', 'total_vendas']]
+
+    # Ticket médio por produto = total_venda_por_produto / total_quantidade_vendida
+    dim_prod = prod.set_index('id_produto')
+    ticket_por_prod = por_prod.join(dim_prod[['nome_prod']], how='inner').dropna(subset=['nome_prod'])
+    ticket_por_prod = ticket_por_prod.rename_axis('id_produto').reset_index()[['id_produto', 'nome_prod', 'valor_total', 'total_qt']]
+    ticket_por_prod['ticket_medio'] = ticket_por_prod['valor_total'] / ticket_por_prod['total_qt'].replace({0:1})
+
+    # Vendas por categoria: categoria depende só do produto, então soma-se o total por produto
+    if 'categoria' in dim_prod.columns:
+        cat = por_prod[['valor_total']].join(dim_prod[['categoria']], how='inner')
+        vendas_por_categoria = cat.groupby('categoria', observed=True)['valor_total'].sum().reset_index()
+    else:
+        vendas_por_categoria = pd.DataFrame(columns=['categoria','valor_total'])
+
+    # Top 5 funcionários por volume de vendas (seleção parcial, sem ordenar tudo)
+    top5 = total_por_func.nlargest(5, 'total_vendas')
+
+    return {
+        'total_por_func': total_por_func,
+        'ticket_por_prod': ticket_por_prod,
+        'vendas_por_categoria': vendas_por_categoria,
+        'top5': top5
+    }
+
+
+def mesclar_kpis(atual, delta):
+    """
+    Soma as tabelas de KPIs de `delta` (vendas novas de uma carga incremental) às de `atual`
+    (as mesmas tabelas já carregadas, ex.: lidas do DW), sem reprocessar o histórico.
+    Totais são somados por chave; ticket_medio e top5 são recalculados. Nome do funcionário
+    e do produto vêm do delta quando a chave aparece nos dois (dimensão mais recente).
+    """
+    def _somar(chave, id_col, somas, atributos=()):
+        partes = [t[chave] for t in (atual, delta) if t.get(chave) is not None and len(t[chave])]
+        if len(partes) < 2:
+            return partes[0] if partes else delta[chave]
+        # categorias de frames diferentes não concatenam como category: agrupa como texto
+        juntas = pd.concat([p[[id_col, *atributos, *somas]] for p in partes], ignore_index=True)
+        juntas = juntas.astype({c: object for c in (id_col, *atributos) if isinstance(juntas[c].dtype, pd.CategoricalDtype)})
+        grupos = juntas.groupby(id_col, sort=True)
+        resultado = grupos[list(somas)].sum()
+        if atributos:
+            resultado = resultado.join(grupos[list(atributos)].last())
+        return resultado.reset_index()[[id_col, *atributos, *somas]]
+
+    total_por_func = _somar('total_por_func', 'id_empregado', ['total_vendas'], ['nome_emp'])
+    ticket_por_prod = _somar('ticket_por_prod', 'id_produto', ['valor_total', 'total_qt'], ['nome_prod'])
+    ticket_por_prod = ticket_por_prod.assign(ticket_medio=ticket_por_prod['valor_total'] / ticket_por_prod['total_qt'].replace({0:1}))
+    return {
+        'total_por_func': total_por_func,
+        'ticket_por_prod': ticket_por_prod,
+        'vendas_por_categoria': _somar('vendas_por_categoria', 'categoria', ['valor_total']),
+        'top5': total_por_func.nlargest(5, 'total_vendas')
+    }
+
+
+# Faixas do histograma de valor_total no relatório
+HIST_BINS = 30
+# Erro relativo máximo da mediana/histograma aproximados (sketch de quantis, ver sketch.py)
+ERRO_QUANTIL = 0.005
+
+
+class EstadoKPIs:
+    """
+    Estado mesclável da camada de KPIs do relatório: calculado por bloco, arquivo ou partição
+    (de_bloco) e combinado com mesclar(), em qualquer ordem e em processos diferentes
+    (o estado é picklável). A memória não depende do número de linhas:
+    - somas e contagens: exatas
+    - produtos/funcionários distintos: conjuntos de ids, exatos (tamanho das dimensões)
+    - mediana e histograma de valor_total: QuantilSketch com erro relativo <= ERRO_QUANTIL
+      (exatos se os valores completos forem passados a resultado())
+    - soma mensal e nulos por coluna: exatos; duplicados: contados dentro de cada bloco
+    """
+
+    def __init__(self):
+        self.n_linhas = 0
+        self.soma = 0.0
+        self.n_valores = 0
+        self.produtos = np.empty(0, dtype='int64')
+        self.funcionarios = np.empty(0, dtype='int64')
+        self.nulos = pd.Series(dtype='int64')
+        self.duplicados = 0
+        self.mensal = pd.Series(dtype='float64')
+        self.valores = QuantilSketch(ERRO_QUANTIL)
+
+    @staticmethod
+    def _ids(df, coluna):
+        if coluna not in df.columns:
+            return np.empty(0, dtype='int64')
+        return np.unique(df[coluna].dropna().to_numpy(dtype='int64'))
+
+    @classmethod
+    def de_bloco(cls, df):
+        """Estado de um bloco do resumo granular (já enriquecido)."""
+        estado = cls()
+        valores = df['valor_total'] if 'valor_total' in df.columns else pd.Series(dtype='float64')
+        estado.n_linhas = len(df)
+        estado.soma = float(valores.sum())
+        estado.n_valores = int(valores.notna().sum())
+        estado.produtos = cls._ids(df, 'id_produto')
+        estado.funcionarios = cls._ids(df, 'id_empregado')
+        estado.nulos = df.isna().sum().astype('int64')
+        estado.duplicados = int(df.duplicated().sum())
+        if 'data' in df.columns and 'valor_total' in df.columns:
+            validas = df['data'].notna()
+            estado.mensal = valores[validas].groupby(df.loc[validas, 'data'].dt.to_period('M')).sum()
+        estado.valores.adicionar(valores)
+        return estado
+
+    def mesclar(self, outro):
+        """Acumula `outro` neste estado; retorna self."""
+        self.n_linhas += outro.n_linhas
+        self.soma += outro.soma
+        self.n_valores += outro.n_valores
+        self.produtos = np.union1d(self.produtos, outro.produtos)
+        self.funcionarios = np.union1d(self.funcionarios, outro.funcionarios)
+        self.nulos = self.nulos.add(outro.nulos, fill_value=0).astype('int64') if len(self.nulos) else outro.nulos
+        self.duplicados += outro.duplicados
+        if len(outro.mensal):
+            self.mensal = self.mensal.add(outro.mensal, fill_value=0) if len(self.mensal) else outro.mensal
+        self.valores.mesclar(outro.valores)
+        return self
+
+    def resultado(self, valores=None, amostra=None):
+        """
+        Camada de KPIs usada por report.build_pdf:
+          - 'kpis': 1 linha com os KPIs da capa, o total de duplicados e se a mediana é aproximada
+          - 'serie_mensal': mes (fim do mês), valor_total (meses sem venda com 0)
+          - 'histograma': bin_inicio, bin_fim, contagem (HIST_BINS faixas de valor_total)
+          - 'nulos_por_coluna': coluna, nulos
+          - 'amostra': primeiras linhas do resumo
+        Com `valores` (coluna valor_total completa) mediana e histograma são exatos; sem ela
+        vêm do sketch (ver EstadoKPIs).
+        """
+        aproximado = valores is None
+        if aproximado:
+            mediana = self.valores.quantil(0.5) if self.valores.n else 0.0
+            contagem, bordas = self.valores.histograma(HIST_BINS)
+        else:
+            validos = valores.dropna().to_numpy()
+            mediana = float(np.median(validos)) if len(validos) else 0.0
+            contagem, bordas = np.histogram(validos, bins=HIST_BINS) if len(validos) else (np.zeros(0), np.zeros(0))
+        if len(contagem):
+            histograma = pd.DataFrame({'bin_inicio': bordas[:-1], 'bin_fim': bordas[1:], 'contagem': contagem})
+        else:
+            histograma = pd.DataFrame(columns=['bin_inicio', 'bin_fim', 'contagem'])
+
+        kpis = pd.DataFrame([{
+            'total_vendas': self.soma if self.n_linhas else 0.0,
+            'n_transacoes': self.n_linhas,
+            'ticket_medio': self.soma / self.n_valores if self.n_valores else 0.0,
+            'ticket_mediano': mediana,
+            'n_produtos': len(self.produtos),
+            'n_funcionarios': len(self.funcionarios),
+            'registros_duplicados': self.duplicados,
+            'ticket_mediano_aproximado': aproximado,
+        }])
+
+        if len(self.mensal):
+            # mesmo formato do resample('M'): todos os meses do intervalo, rotulados no último dia
+            meses = pd.period_range(self.mensal.index.min(), self.mensal.index.max(), freq='M')
+            mensal = self.mensal.reindex(meses, fill_value=0)
+            serie_mensal = pd.DataFrame({'mes': meses.to_timestamp(how='end').normalize(), 'valor_total': mensal.to_numpy()})
+        else:
+            serie_mensal = pd.DataFrame(columns=['mes', 'valor_total'])
+
+        nulos_por_coluna = pd.DataFrame({'coluna': self.nulos.index.astype(str), 'nulos': self.nulos.to_numpy().astype('int64')})
+
+        return {
+            'kpis': kpis,
+            'serie_mensal': serie_mensal,
+            'histograma': histograma,
+            'nulos_por_coluna': nulos_por_coluna,
+            'amostra': amostra if amostra is not None else pd.DataFrame(),
+        }
+
+
+def kpi_cube(resumo):
+    """Camada de KPIs (ver EstadoKPIs.resultado) calculada a partir de um resumo granular completo."""
+    return EstadoKPIs.de_bloco(resumo).resultado(
+        valores=resumo['valor_total'] if 'valor_total' in resumo.columns else None,
+        amostra=resumo.head(12).reset_index(drop=True))
+
+
+def kpis_de_resumo(resumo):
+    """
+    KPIs de transform_data (total_por_func, ticket_por_prod, vendas_por_categoria, top5)
+    recalculados a partir de um resumo granular já enriquecido (ex.: uma fatia lida do Parquet).
+    """
+    return _combinar_parciais([_agregar_parcial(resumo)])
+
+
+class _DeduplicadorVendas:
+    """
+    Remove linhas de vendas repetidas entre blocos diferentes do CSV.
+    Guarda apenas o hash (uint64) de cada linha distinta já vista, em um array ordenado,
+    então a memória cresce 8 bytes por venda distinta em vez do tamanho da linha.
+    """
+
+    NUMERICAS = ['id_venda', 'id_produto', 'id_empregado', 'quantidade', 'valor_unitario', 'valor_total']
+
+    def __init__(self):
+        self.vistos = np.empty(0, dtype=np.uint64)
+
+    def __call__(self, chunk):
+        # hash calculado sobre valores numéricos em float, para que o mesmo registro
+        # tenha o mesmo hash mesmo se o pandas inferir dtypes diferentes em cada bloco
+        chave = _sem_origem(chunk).copy(deep=False)
+        for c in self.NUMERICAS:
+            if c in chave.columns:
+                chave[c] = pd.to_numeric(chave[c], errors='coerce').astype('float64')
+        hashes = pd.util.hash_pandas_object(chave, index=False).to_numpy()
+
+        novos = ~pd.Series(hashes).duplicated().to_numpy()
+        if len(self.vistos):
+            pos = np.searchsorted(self.vistos, hashes)
+            ja_visto = self.vistos[np.minimum(pos, len(self.vistos) - 1)] == hashes
+            novos &= ~ja_visto
+        if novos.any():
+            h = np.sort(hashes[novos])
+            self.vistos = np.insert(self.vistos, np.searchsorted(self.vistos, h), h)
+        # take em vez de máscara: sem a marca de "fatia" do pandas nas atribuições seguintes
+        return chunk if novos.all() else chunk.take(np.flatnonzero(novos))
+
+
+def _validar(vendas, emp, prod, indices, origem, remover):
+    """
+    Valida as vendas (ver validacao.py) antes da coerção numérica.
+    Retorna (vendas, contagens por regra, quarentena, colunas coagidas): com remover=True as
+    linhas reprovadas saem das vendas; caso contrário só são copiadas para a quarentena.
+    As colunas de texto convertidas na validação voltam para _coagir_numericos.
+    """
+    coagidos = {}
+    falhas = validar_vendas(vendas, **_orfaos(vendas, emp, prod, indices), coagidos=coagidos)
+    contagens = contar_falhas(falhas)
+    reprovadas = quarentena(vendas, falhas, origem)
+    if remover and contagens['vendas_em_quarentena']:
+        manter = np.flatnonzero(falhas == 0)
+        vendas = vendas.take(manter)
+        vendas.index = pd.RangeIndex(len(vendas))
+        coagidos = {c: pd.Series(v.to_numpy()[manter]) for c, v in coagidos.items()}
+    return vendas, contagens, reprovadas, coagidos
+
+
+def transform_data(emp, prod, vendas, remover_reprovadas=False):
+    """
+    Transformações específicas para os CSVs fornecidos:
+    - emp: empregados.csv (id_empregado, nome, cargo, idade)
+    - prod: produtos.csv (id_produto, nome, preco, categoria)
+    - vendas: vendas.csv (id_venda, data, id_produto, id_empregado, quantidade, valor_unitario, valor_total)
+    Retorna um dict com DataFrames: resumo, total_por_func, ticket_por_prod, vendas_por_categoria, top5,
+    a camada de KPIs do relatório (kpis, serie_mensal, histograma, nulos_por_coluna, amostra),
+    'quarentena' (vendas reprovadas na validação, com as regras violadas) e 'quality_metrics'
+    (dict: linhas lidas, após deduplicação, em quarentena e reprovadas por regra).
+    Com remover_reprovadas=True as vendas em quarentena ficam fora do resumo e dos KPIs.
+    """
+    n_lidas = len(vendas)
+    # procedência (arquivo/linha da extração) fica de fora da deduplicação e do resumo; só vai para a quarentena
+    origem = _origem(vendas)
+    vendas = _sem_origem(vendas)
+    # marca de duplicados calculada uma vez: usada na métrica e na limpeza
+    duplicadas = vendas.duplicated()
+
+    emp, prod = _preparar_dimensoes(emp, prod)
+
+    # Sem duplicadas não há o que filtrar: cópia rasa (colunas compartilhadas com o frame do
+    # chamador, que não é alterado: colunas novas só substituem referências neste frame)
+    if duplicadas.any():
+        manter = np.flatnonzero(~duplicadas.to_numpy())
+        vendas = vendas.take(manter)
+        origem = origem.take(manter) if origem is not None else None
+    else:
+        vendas = vendas.copy(deep=False)
+    vendas.index = pd.RangeIndex(len(vendas))
+    vendas.columns = vendas.columns.str.strip()
+
+    indices = _indices_dimensoes(emp, prod)
+    n_dedup = len(vendas)
+    vendas, contagens, reprovadas, coagidos = _validar(vendas, emp, prod, indices, origem, remover_reprovadas)
+    quality_metrics = {'vendas_original_rows': n_lidas, 'vendas_after_dedup': n_dedup, **contagens}
+    vendas = _coagir_numericos(vendas, coagidos)
+    del coagidos
+
+    df = _enriquecer(vendas, emp, prod, indices)
+    _avisar_desconhecidos(indices)
+    if _agrega_por_id(emp, prod):
+        kpis = _combinar_parciais_por_id([_agregar_parcial_por_id(df)], emp, prod)
+    else:
+        kpis = _combinar_parciais([_agregar_parcial(df)])
+
+    # Resumo granular (linhas de vendas enriquecidas); df não é usado depois, então sem cópia
+    resumo = df
 
     # Garantir tipos e limpar colunas que podem conter objetos complexos antes de escrever parquet/db
-    # (converter datas)
-    if 'data' in resumo.columns:
+    # (converter datas; com read_raw a coluna já chega como datetime e nada é refeito)
+    if 'data' in resumo.columns and not is_datetime64_any_dtype(resumo['data']):
         try:
             resumo['data'] = pd.to_datetime(resumo['data'], errors='coerce')
         except Exception:
@@ -107,8 +612,79 @@ def transform_data(emp, prod, vendas):
         'dFuncionarios': emp,
         'fVendas': vendas,
         'resumo': resumo,
-        'total_por_func': total_por_func,
-        'ticket_por_prod': ticket_por_prod,
-        'vendas_por_categoria': vendas_por_categoria,
-        'top5': top5
+        'quarentena': reprovadas,
+        'quality_metrics': quality_metrics,
+        **kpis,
+        **kpi_cube(resumo)
+    }
+
+
+def transform_data_stream(emp, prod, vendas_chunks, on_chunk=None, on_quarentena=None, remover_reprovadas=False):
+    """
+    Versão em streaming de transform_data para vendas que não cabem em memória.
+    - vendas_chunks: iterável de DataFrames (ex.: read_raw(folder, chunksize=...))
+    - on_chunk: callback opcional chamado com cada bloco do resumo granular já enriquecido
+      (ex.: para gravar o parquet incrementalmente)
+    - on_quarentena: callback opcional com as vendas reprovadas de cada bloco (se houver)
+    Cada bloco é limpo, enriquecido contra as dimensões (pequenas, mantidas em memória) e
+    reduzido a somas parciais, fundidas a cada bloco em um acumulado (uma linha por
+    funcionário/produto/categoria, como o EstadoKPIs). O pico de memória fica limitado pelo
+    tamanho do bloco e das dimensões, não do arquivo.
+    Retorna o mesmo dict de transform_data, sem as chaves granulares 'fVendas', 'resumo' e 'quarentena'.
+    Obs.: a regra de recalcular valor_total (coluna toda zerada/ausente) é avaliada por bloco;
+    na camada de KPIs a mediana e o histograma são aproximados (EstadoKPIs, erro relativo
+    <= ERRO_QUANTIL) e os duplicados são contados dentro de cada bloco.
+    """
+    emp, prod = _preparar_dimensoes(emp, prod)
+    por_id = _agrega_por_id(emp, prod)
+    agregar = _agregar_parcial_por_id if por_id else _agregar_parcial
+    somar = _somar_parciais_por_id if por_id else _somar_parciais
+    # índices das dimensões criados uma vez e reaproveitados em todos os blocos
+    indices = _indices_dimensoes(emp, prod)
+    dedup = _DeduplicadorVendas()
+    parciais = None
+    estado = EstadoKPIs()
+    amostra = None
+    contagens = contar_falhas(np.zeros(0, dtype=np.uint16))
+    n_lidas = n_dedup = 0
+
+    for chunk in vendas_chunks:
+        chunk.columns = chunk.columns.str.strip()
+        n_lidas += len(chunk)
+        chunk = dedup(chunk)
+        chunk.index = pd.RangeIndex(len(chunk))
+        if chunk.empty:
+            continue
+        n_dedup += len(chunk)
+        origem = _origem(chunk)
+        chunk, contagens_bloco, reprovadas, coagidos = _validar(_sem_origem(chunk), emp, prod, indices, origem, remover_reprovadas)
+        contagens = somar_contagens(contagens, contagens_bloco)
+        if on_quarentena is not None and len(reprovadas):
+            on_quarentena(reprovadas)
+        if chunk.empty:
+            continue
+        chunk = _coagir_numericos(chunk, coagidos)
+        df = _enriquecer(chunk, emp, prod, indices)
+        if 'data' in df.columns and not is_datetime64_any_dtype(df['data']):
+            df['data'] = pd.to_datetime(df['data'], errors='coerce')
+        parciais = somar(parciais, agregar(df))
+        estado.mesclar(EstadoKPIs.de_bloco(df))
+        if amostra is None:
+            amostra = df.head(12).reset_index(drop=True)
+
+        if on_chunk is not None:
+            on_chunk(df)
+
+    if parciais is None:
+        # nenhum dado: combina um bloco vazio para manter o formato das saídas
+        vazio = _enriquecer(_coagir_numericos(pd.DataFrame(columns=['id_venda', 'data', 'id_produto', 'id_empregado', 'quantidade', 'valor_unitario', 'valor_total'])), emp, prod)
+        parciais = agregar(vazio)
+    _avisar_desconhecidos(indices)
+
+    return {
+        'dProdutos': prod,
+        'dFuncionarios': emp,
+        'quality_metrics': {'vendas_original_rows': n_lidas, 'vendas_after_dedup': n_dedup, **contagens},
+        **(_combinar_parciais_por_id([parciais], emp, prod) if por_id else _combinar_parciais([parciais])),
+        **estado.resultado(amostra=amostra)
     }
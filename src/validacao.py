@@ -0,0 +1,165 @@
+# src/validacao.py
+"""
+Validação vetorizada das vendas: cada regra é uma expressão sobre colunas inteiras (numpy)
+e o resultado é uma máscara de bits por linha (uint16, bit i = REGRAS[i]; 0 = linha válida).
+As regras rodam uma coluna por vez e ligam os bits no próprio array de falhas; as que
+precisam de float (fração, divergência de valor_total) em blocos, para os temporários não
+crescerem com o arquivo. Colunas de texto são convertidas uma vez só e reaproveitadas pela
+coerção do transform.
+
+    falhas = validar_vendas(vendas, produto_orfao=..., empregado_orfao=...)
+    contar_falhas(falhas)               # {'regra_quantidade_negativa': 12, ...}
+    quarentena(vendas, falhas, origem)  # linhas reprovadas + coluna 'regras'
+
+Roda antes da coerção do transform (que troca valores inválidos por 0), para que ausentes e
+textos inválidos ainda apareçam como NA.
+"""
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_integer_dtype, is_numeric_dtype
+
+# Regras na ordem dos bits da máscara (no máximo 16)
+REGRAS = (
+    'id_venda_invalido',        # id_venda ausente ou não numérico
+    'data_invalida',            # data ausente ou fora do formato
+    'quantidade_invalida',      # quantidade ausente, não numérica ou fracionária
+    'valor_unitario_invalido',  # valor_unitario ausente ou não numérico
+    'valor_total_invalido',     # valor_total ausente ou não numérico
+    'quantidade_negativa',
+    'valor_unitario_negativo',
+    'produto_orfao',            # id_produto nulo ou inexistente em produtos
+    'empregado_orfao',          # id_empregado nulo ou inexistente em empregados
+    'valor_total_divergente',   # |valor_total - quantidade * valor_unitario| > tolerância
+)
+# Tolerância de valor_total_divergente: 1 centavo + erro relativo de arredondamento
+TOLERANCIA_ABS = 0.01
+TOLERANCIA_REL = 1e-9
+
+
+# Linhas por bloco nas regras que precisam de float (limita os arrays temporários)
+BLOCO = 65536
+
+
+def _coluna(vendas, coluna, coagidos):
+    """
+    Coluna como Series numérica (None se não existir). Texto é convertido com to_numeric uma
+    vez só e guardado em `coagidos`, para a coerção do transform reaproveitar.
+    """
+    if coluna not in vendas.columns:
+        return None
+    serie = vendas[coluna]
+    if not is_numeric_dtype(serie.dtype):
+        serie = coagidos[coluna] = pd.to_numeric(serie, errors='coerce')
+    return serie
+
+
+def _mascara(resultado):
+    """Comparação de Series como array booleano (NA conta como False)."""
+    return resultado.to_numpy(dtype=bool, na_value=False)
+
+
+def _float(serie, inicio, fim):
+    return serie.iloc[inicio:fim].to_numpy(dtype='float64', na_value=np.nan)
+
+
+def _marcar(falhas, regra, mascara, inicio=0):
+    """Liga o bit de `regra` nas linhas de `mascara` (a partir de `inicio`), sem arrays temporários."""
+    alvo = falhas[inicio:inicio + len(mascara)]
+    np.bitwise_or(alvo, np.uint16(1 << REGRAS.index(regra)), out=alvo, where=mascara)
+
+
+def validar_vendas(vendas, produto_orfao=None, empregado_orfao=None, coagidos=None):
+    """
+    Máscara de falhas (uint16 por linha) das REGRAS sobre `vendas` antes da coerção numérica.
+    produto_orfao / empregado_orfao: arrays booleanos já calculados contra as dimensões
+    (ver transform._orfaos); sem eles as duas regras não são avaliadas.
+    Regras que não se aplicam ficam com o bit zerado (ex.: valor_total recalculado).
+    As regras são avaliadas uma coluna por vez e as que precisam de float (fração,
+    divergência) em blocos de BLOCO linhas. coagidos: dict que recebe as colunas de texto
+    convertidas com to_numeric (ver _coluna).
+    """
+    coagidos = {} if coagidos is None else coagidos
+    n = len(vendas)
+    falhas = np.zeros(n, dtype=np.uint16)
+    todas = np.ones(n, dtype=bool)
+
+    id_venda = _coluna(vendas, 'id_venda', coagidos)
+    _marcar(falhas, 'id_venda_invalido', todas if id_venda is None else id_venda.isna().to_numpy())
+    del id_venda
+    if 'data' in vendas.columns:
+        data = vendas['data']
+        _marcar(falhas, 'data_invalida', (data.isna() if pd.api.types.is_datetime64_any_dtype(data.dtype)
+                                          else pd.to_datetime(data, errors='coerce').isna()).to_numpy())
+    else:
+        _marcar(falhas, 'data_invalida', todas)
+
+    qt = _coluna(vendas, 'quantidade', coagidos)
+    vu = _coluna(vendas, 'valor_unitario', coagidos)
+    vt = _coluna(vendas, 'valor_total', coagidos)
+    for regra, serie in (('quantidade_invalida', qt), ('valor_unitario_invalido', vu)):
+        _marcar(falhas, regra, todas if serie is None else serie.isna().to_numpy())
+    if qt is not None:
+        _marcar(falhas, 'quantidade_negativa', _mascara(qt < 0))
+    if vu is not None:
+        _marcar(falhas, 'valor_unitario_negativo', _mascara(vu < 0))
+    for regra, orfao in (('produto_orfao', produto_orfao), ('empregado_orfao', empregado_orfao)):
+        if orfao is not None:
+            _marcar(falhas, regra, np.asarray(orfao, dtype=bool))
+
+    # valor_total toda ausente/zerada é recalculada no transform (quantidade * valor_unitario):
+    # nesse caso as regras de valor_total não se aplicam
+    recalculado = vt is None or not _mascara(vt.notna() & (vt != 0)).any()
+    if not recalculado:
+        _marcar(falhas, 'valor_total_invalido', vt.isna().to_numpy())
+    fracionaria = qt is not None and not is_integer_dtype(qt.dtype)
+    if not fracionaria and recalculado:
+        return falhas
+    for inicio in range(0, n, BLOCO):
+        fim = min(inicio + BLOCO, n)
+        q = _float(qt, inicio, fim) if qt is not None else np.full(fim - inicio, np.nan)
+        with np.errstate(invalid='ignore'):
+            if fracionaria:
+                _marcar(falhas, 'quantidade_invalida', q != np.round(q), inicio)
+            if not recalculado:
+                # NaN em qualquer lado dá False: a ausência já é contada nas regras *_invalido
+                esperado = q * (_float(vu, inicio, fim) if vu is not None else np.nan)
+                diferenca = np.abs(_float(vt, inicio, fim) - esperado)
+                _marcar(falhas, 'valor_total_divergente', diferenca > TOLERANCIA_ABS + TOLERANCIA_REL * np.abs(esperado), inicio)
+    return falhas
+
+
+def contar_falhas(falhas):
+    """Linhas reprovadas por regra ({'regra_<nome>': n}, todas as regras) e no total."""
+    contagens = {f'regra_{regra}': int(np.count_nonzero(falhas & (1 << bit))) for bit, regra in enumerate(REGRAS)}
+    contagens['vendas_em_quarentena'] = int(np.count_nonzero(falhas))
+    return contagens
+
+
+def somar_contagens(a, b):
+    return {k: a.get(k, 0) + b.get(k, 0) for k in {**a, **b}}
+
+
+def nomes_regras(falhas):
+    """
+    Nomes das regras de cada máscara, separados por ';' (para as linhas em quarentena).
+    Um texto por combinação de regras, compartilhado pelas linhas que a têm.
+    """
+    unicas, posicoes = np.unique(falhas, return_inverse=True)
+    rotulos = np.array([';'.join(r for bit, r in enumerate(REGRAS) if m & (1 << bit)) for m in unicas], dtype=object)
+    return pd.Series(rotulos[posicoes], dtype=object)
+
+
+def quarentena(vendas, falhas, origem=None):
+    """
+    Linhas reprovadas com os valores como chegaram (antes da coerção), a procedência
+    (`origem`: arquivo_origem/linha_origem alinhados a `vendas`, se houver) e as regras violadas.
+    """
+    pos = np.flatnonzero(falhas)
+    partes = [] if origem is None else [origem.take(pos).reset_index(drop=True)]
+    ruins = vendas.take(pos).reset_index(drop=True)
+    # texto livre (ex.: 'n/a' em colunas numéricas de frames não tipados) vira string para o Parquet
+    for c in ruins.columns:
+        if ruins[c].dtype == object:
+            ruins[c] = ruins[c].astype('string')
+    partes += [ruins, pd.DataFrame({'regras': nomes_regras(falhas[pos]), 'falhas': falhas[pos]})]
+    return pd.concat(partes, axis=1)